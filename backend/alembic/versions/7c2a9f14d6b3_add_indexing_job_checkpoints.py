@@ -0,0 +1,28 @@
+"""add attempts and heartbeat to indexing jobs for resumable runs
+
+Revision ID: 7c2a9f14d6b3
+Revises: e4d081b933f7
+Create Date: 2026-10-19 14:05:31.902417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2a9f14d6b3'
+down_revision: Union[str, None] = 'e4d081b933f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('indexing_jobs', sa.Column('attempts', sa.Integer(), nullable=True))
+    op.add_column('indexing_jobs', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('indexing_jobs', 'updated_at')
+    op.drop_column('indexing_jobs', 'attempts')
@@ -0,0 +1,57 @@
+"""add usage counter tables for the dashboard
+
+Revision ID: b5e7c3a19f42
+Revises: 7c2a9f14d6b3
+Create Date: 2026-10-19 16:12:08.513204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e7c3a19f42'
+down_revision: Union[str, None] = '7c2a9f14d6b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('chatbot_usage',
+    sa.Column('chatbot_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('sessions', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('messages', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('chatbot_id')
+    )
+    op.create_table('user_usage',
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('documents', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('storage_bytes', sa.BigInteger(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from the existing rows
+    op.execute("""
+        INSERT INTO chatbot_usage (chatbot_id, sessions, messages)
+        SELECT c.id,
+               (SELECT count(*) FROM chat_sessions s WHERE s.chatbot_id = c.id),
+               (SELECT count(*) FROM chat_messages m JOIN chat_sessions s ON s.id = m.session_id
+                WHERE s.chatbot_id = c.id)
+        FROM chatbots c
+    """)
+    op.execute("""
+        INSERT INTO user_usage (user_id, documents, storage_bytes)
+        SELECT u.id, count(d.id), coalesce(sum(d.file_size), 0)
+        FROM users u LEFT JOIN documents d ON d.user_id = u.id
+        GROUP BY u.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_usage')
+    op.drop_table('chatbot_usage')
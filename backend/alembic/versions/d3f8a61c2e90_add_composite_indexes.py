@@ -0,0 +1,42 @@
+"""add composite indexes for chat, document, chatbot and evaluation queries
+
+Revision ID: d3f8a61c2e90
+Revises: b5e7c3a19f42
+Create Date: 2026-10-19 17:40:52.118630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a61c2e90'
+down_revision: Union[str, None] = 'b5e7c3a19f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns); matches __table_args__ in app/models.py
+INDEXES = [
+    ('ix_chat_messages_session_created', 'chat_messages', ['session_id', 'created_at', 'id']),
+    ('ix_chat_sessions_chatbot_user_updated', 'chat_sessions', ['chatbot_id', 'user_id', 'updated_at', 'id']),
+    ('ix_chat_sessions_user_id', 'chat_sessions', ['user_id']),
+    ('ix_documents_user_id_created_at', 'documents', ['user_id', 'created_at']),
+    ('ix_chatbots_user_id_created_at', 'chatbots', ['user_id', 'created_at']),
+    ('ix_evaluations_chatbot_id_created_at', 'evaluations', ['chatbot_id', 'created_at']),
+    ('ix_evaluation_results_evaluation_question', 'evaluation_results', ['evaluation_id', 'question_index']),
+    ('ix_chatbot_documents_document_id', 'chatbot_documents', ['document_id']),
+]
+
+
+# Built CONCURRENTLY so large tables stay writable; that cannot run inside a transaction
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,69 @@
+"""add indexing jobs and per-document indexing progress
+
+Revision ID: e4d081b933f7
+Revises: 918b5b9ff283
+Create Date: 2026-10-19 11:40:12.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4d081b933f7'
+down_revision: Union[str, None] = '918b5b9ff283'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('indexing_jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('chatbot_id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('documents_total', sa.Integer(), nullable=True),
+    sa.Column('documents_done', sa.Integer(), nullable=True),
+    sa.Column('documents_failed', sa.Integer(), nullable=True),
+    sa.Column('pages_parsed', sa.Integer(), nullable=True),
+    sa.Column('chunks_total', sa.Integer(), nullable=True),
+    sa.Column('chunks_embedded', sa.Integer(), nullable=True),
+    sa.Column('chunks_upserted', sa.Integer(), nullable=True),
+    sa.Column('bytes_total', sa.Integer(), nullable=True),
+    sa.Column('bytes_processed', sa.Integer(), nullable=True),
+    sa.Column('stage_timings', sa.Text(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['chatbot_id'], ['chatbots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_indexing_jobs_chatbot_id'), 'indexing_jobs', ['chatbot_id'], unique=False)
+    op.create_table('indexing_job_documents',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('job_id', sa.UUID(), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('pages_parsed', sa.Integer(), nullable=True),
+    sa.Column('chunks_total', sa.Integer(), nullable=True),
+    sa.Column('chunks_embedded', sa.Integer(), nullable=True),
+    sa.Column('chunks_upserted', sa.Integer(), nullable=True),
+    sa.Column('bytes_total', sa.Integer(), nullable=True),
+    sa.Column('bytes_processed', sa.Integer(), nullable=True),
+    sa.Column('stage_timings', sa.Text(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['job_id'], ['indexing_jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_indexing_job_documents_job_id'), 'indexing_job_documents', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_indexing_job_documents_job_id'), table_name='indexing_job_documents')
+    op.drop_table('indexing_job_documents')
+    op.drop_index(op.f('ix_indexing_jobs_chatbot_id'), table_name='indexing_jobs')
+    op.drop_table('indexing_jobs')
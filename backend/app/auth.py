@@ -1,31 +1,44 @@
 # Authentication middleware
 import logging
+import time
 
-from fastapi import Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User
+from app.services.user_cache import cache_user, get_cached_user
 
 logger = logging.getLogger(__name__)
 
 
 # Get current user from X-User-Id header
-# NextAuth sends this header after validating the session
-def get_current_user(
+# NextAuth sends this header after validating the session.
+# Async so the lookup does not take a threadpool slot; sync routes can depend on it too.
+# The session is shared with the route, so its transaction is ended after the lookup rather
+# than holding a connection until the response is sent.
+async def get_current_user(
+    request: Request,
     x_user_id: str = Header(..., alias="X-User-Id"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> User:
+    started = time.perf_counter()
     try:
         user_id = UUID(x_user_id)
     except ValueError:
         logger.warning(f"Auth failed: invalid user ID format — {x_user_id}")
         raise HTTPException(401, "Invalid user ID")
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        logger.warning(f"Auth failed: user not found — {x_user_id}")
-        raise HTTPException(401, "User not found")
+    user = await get_cached_user(user_id)
+    if user is None:
+        user = await db.get(User, user_id)
+        await db.commit()
+        if not user:
+            logger.warning(f"Auth failed: user not found — {x_user_id}")
+            raise HTTPException(401, "User not found")
+        await cache_user(user)
 
+    # Picked up by chat handlers for their per-stage timings
+    request.state.auth_seconds = time.perf_counter() - started
     return user
\ No newline at end of file
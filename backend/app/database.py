@@ -1,11 +1,209 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from uuid import uuid4
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.config import settings
+from app.metrics import DB_POOL_IN_USE, DB_POOL_TIMEOUTS, DB_POOL_WAIT, DB_READS, DB_REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection."""
+
+    label = "default"  # the pool label on the pool metrics
+
+    # Subclass carrying a metrics label; a class attribute survives the pool being recreated on dispose
+    @classmethod
+    def labeled(cls, label: str) -> type:
+        return type(cls.__name__, (cls,), {"label": label})
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.label).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.label).observe(time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool for the async engine."""
+
+
+# Engine keyword arguments for a database URL, from the db_* settings.
+# SQLite keeps its default pool; the statement timeout only applies to PostgreSQL.
+def engine_options(url: str) -> dict:
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    # pgbouncer in transaction mode rejects startup options; the timeout is set per transaction instead
+    if settings.db_statement_timeout_ms and not settings.db_pgbouncer:
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
+
+
+def _instrument(engine, label: str) -> None:
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    @event.listens_for(pool, "checkin")
+    def _track_in_use(*args):
+        DB_POOL_IN_USE.labels(label).set(pool.checkedout())
+
+    if settings.db_pgbouncer and settings.db_statement_timeout_ms and engine.dialect.name == "postgresql":
+        @event.listens_for(engine, "begin")
+        def _set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {settings.db_statement_timeout_ms}")
 
-engine = create_engine(settings.database_url)
+
+# pool names the engine's pool in the pool metrics: primary or replica-N, suffixed _sync or _async
+def make_engine(url: str, pool: str = "primary_sync"):
+    options = engine_options(url)
+    if options:
+        options["poolclass"] = options["poolclass"].labeled(pool)
+    engine = create_engine(url, **options)
+    if isinstance(engine.pool, QueuePool):
+        _instrument(engine, pool)
+    return engine
+
+
+# Same database through an asyncio driver: asyncpg for PostgreSQL, aiosqlite for SQLite
+def async_database_url(url: str) -> str:
+    url = make_url(url)
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[url.get_backend_name()]
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+# asyncpg takes the statement timeout as a server setting, and caches prepared statements per
+# connection; pgbouncer can hand a transaction any server connection, so the caches are turned off
+def async_engine_options(url: str) -> dict:
+    options = engine_options(url)
+    if not options:
+        return {}
+    options["poolclass"] = TimedAsyncQueuePool
+    connect_args = {}
+    if settings.db_statement_timeout_ms and not settings.db_pgbouncer:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+    if settings.db_pgbouncer:
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    options["connect_args"] = connect_args
+    return options
+
+
+def make_async_engine(url: str, pool: str = "primary_async"):
+    options = async_engine_options(url)
+    if options:
+        options["poolclass"] = options["poolclass"].labeled(pool)
+    engine = create_async_engine(async_database_url(url), **options)
+    if isinstance(engine.sync_engine.pool, QueuePool):
+        _instrument(engine.sync_engine, pool)
+    return engine
+
+
+engine = make_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async routes use these; objects stay readable after commit since there is no lazy loading in async code
+async_engine = make_async_engine(settings.database_url)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+
+class Replica:
+    """A read replica with its own engines, and the replication lag last measured on it."""
+
+    def __init__(self, url: str, number: int = 1):
+        self.name = make_url(url).host or make_url(url).database
+        self.engine = make_engine(url, pool=f"replica-{number}_sync")
+        self.async_engine = make_async_engine(url, pool=f"replica-{number}_async")
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.AsyncSession = async_sessionmaker(
+            self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+        )
+        self.lag: float | None = None  # seconds; None until measured, or while unreachable
+
+
+def make_replicas(urls: str) -> list[Replica]:
+    urls = [url.strip() for url in urls.split(",") if url.strip()]
+    return [Replica(url, number) for number, url in enumerate(urls, start=1)]
+
+
+replicas = make_replicas(settings.db_replica_urls)
+_next_replica = itertools.count()
+
+# Seconds of replay lag; 0 when everything received has been replayed, so a quiet primary
+# (no new transactions to replay) does not read as a lagging replica
+_REPLICA_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def measure_lag(replica: Replica) -> float | None:
+    try:
+        with replica.engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                return 0.0
+            return float(conn.execute(_REPLICA_LAG).scalar())
+    except Exception as e:
+        logger.warning(f"Replica {replica.name} lag check failed: {e}")
+        return None
+
+
+def check_replicas() -> None:
+    for replica in replicas:
+        replica.lag = measure_lag(replica)
+        DB_REPLICA_LAG.labels(replica.name).set(-1 if replica.lag is None else replica.lag)
+
+
+# Round-robin over replicas that are reachable and within db_replica_max_lag_seconds;
+# None means the read goes to the primary
+def pick_replica() -> Replica | None:
+    usable = [r for r in replicas if r.lag is not None and r.lag <= settings.db_replica_max_lag_seconds]
+    if not usable:
+        return None
+    return usable[next(_next_replica) % len(usable)]
+
+
+def _monitor_replicas(stop: threading.Event) -> None:
+    while True:
+        check_replicas()
+        if stop.wait(settings.db_replica_check_interval_seconds):
+            return
+
+
+# Start the replica lag checks; set the returned event to stop them.
+# Until a replica has been checked once, reads keep going to the primary.
+def start_replica_monitor() -> threading.Event:
+    stop = threading.Event()
+    if replicas:
+        threading.Thread(target=_monitor_replicas, args=(stop,), name="replica-monitor", daemon=True).start()
+    return stop
+
+
 Base = declarative_base()
 
 
@@ -14,4 +212,28 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Read-only sessions for endpoints that never write; served by a replica when one is in sync.
+# A replica may be a few seconds behind, so don't use these right after writing what you read back.
+def get_read_db():
+    replica = pick_replica()
+    DB_READS.labels("replica" if replica else "primary").inc()
+    db = (replica.Session if replica else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    replica = pick_replica()
+    DB_READS.labels("replica" if replica else "primary").inc()
+    async with (replica.AsyncSession if replica else AsyncSessionLocal)() as db:
+        yield db
@@ -1,15 +1,57 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from app.routers import auth, documents, chatbots, chat, sessions, public, dashboard, health,evaluation
+from app.routers import auth, documents, chatbots, chat, sessions, public, dashboard, health,evaluation, metrics
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from app.routers.public import limiter
 from app.logging_config import setup_logging
+from app.metrics import MetricsMiddleware
+from app.tracing import TracingMiddleware, setup_tracing
+from app.database import async_engine, engine, replicas, start_replica_monitor
 from app.config import settings
+from app.services.cache import start_cache_workers
+from app.services.indexing import start_index_workers
+from app.services import message_writer
+from app.services.usage import start_usage_workers
 from fastapi.staticfiles import StaticFiles
 
 setup_logging()
+setup_tracing(
+    engine,
+    async_engine.sync_engine,
+    *(e for replica in replicas for e in (replica.engine, replica.async_engine.sync_engine)),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep this worker's in-process cache in sync with other workers and flush its cache stats
+    stop_cache_workers = start_cache_workers()
+    # Garbage-collect replaced index versions and vectors whose chatbot or document is gone
+    stop_index_workers = start_index_workers()
+    # Repair any drift in the usage counters
+    stop_usage_workers = start_usage_workers()
+    # Track replica lag so read-only endpoints only use replicas that are caught up
+    stop_replica_monitor = start_replica_monitor()
+    # Write buffered chat messages in batches
+    stop_message_writer = message_writer.start_message_writer()
+    yield
+    stop_cache_workers.set()
+    stop_index_workers.set()
+    stop_usage_workers.set()
+    stop_replica_monitor.set()
+    # Write whatever chat messages are still buffered before the engines go away
+    stop_message_writer.set()
+    await run_in_threadpool(message_writer.drain)
+    # Async connections must be closed while the event loop is still running
+    await async_engine.dispose()
+    for replica in replicas:
+        await replica.async_engine.dispose()
+
 
 app = FastAPI(
     title="Bouldy API",
@@ -34,6 +76,7 @@ All authenticated endpoints require an `X-User-Id` header with a valid user UUID
 Public endpoints (`/api/public/*`) require no authentication.
     """,
     version="1.0.0",
+    lifespan=lifespan,
     contact={
         "name": "Mobin Rajaei",
         "url": "https://github.com/itsdiy0/Bouldy",
@@ -74,6 +117,10 @@ Public endpoints (`/api/public/*`) require no authentication.
             "name": "health",
             "description": "Liveness and readiness probes for Kubernetes and monitoring",
         },
+        {
+            "name": "metrics",
+            "description": "Prometheus metrics — request latencies and per-stage chat timings",
+        },
     ],
 )
 
@@ -85,6 +132,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -97,5 +147,6 @@ app.include_router(public.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
 app.include_router(health.router, prefix="/api")
 app.include_router(evaluation.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Prometheus metrics for Bouldy.
+Per-route request counts and latencies, plus per-stage timings of chat requests.
+Set PROMETHEUS_MULTIPROC_DIR when running several workers so /api/metrics aggregates them.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter(
+    "bouldy_http_requests_total",
+    "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "bouldy_http_request_duration_seconds",
+    "HTTP request duration by route template, including streamed bodies",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_STAGE_LATENCY = Histogram(
+    "bouldy_chat_stage_duration_seconds",
+    "Duration of each stage of a chat request",
+    ["endpoint", "stage", "provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "bouldy_cache_lookups_total",
+    "Semantic cache lookups by result (local, exact, semantic or miss)",
+    ["result"],
+)
+USER_CACHE_LOOKUPS = Counter(
+    "bouldy_user_cache_lookups_total",
+    "Authenticated user lookups by result (local, redis or miss)",
+    ["result"],
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "bouldy_password_hash_queue_depth",
+    "Password hashes queued or running on the bcrypt executor",
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "bouldy_db_pool_wait_seconds",
+    "Time spent waiting for a connection from the database pool",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "bouldy_db_pool_timeouts_total",
+    "Connection requests that gave up after db_pool_timeout",
+    ["pool"],
+)
+DB_POOL_IN_USE = Gauge(
+    "bouldy_db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+DB_REPLICA_LAG = Gauge(
+    "bouldy_db_replica_lag_seconds",
+    "Replication lag last measured on each read replica; -1 when it could not be reached",
+    ["replica"],
+    multiprocess_mode="livemax",
+)
+DB_READS = Counter(
+    "bouldy_db_reads_total",
+    "Read-only sessions handed out, by where they were routed (replica or primary)",
+    ["target"],
+)
+CHAT_WRITE_BUFFER = Gauge(
+    "bouldy_chat_write_buffer_messages",
+    "Chat messages buffered for the next write-behind flush",
+    multiprocess_mode="livesum",
+)
+CHAT_WRITE_FLUSHES = Counter(
+    "bouldy_chat_write_flushes_total",
+    "Write-behind flushes of buffered chat messages, by result (ok or error)",
+    ["result"],
+)
+CHAT_WRITE_DIRECT = Counter(
+    "bouldy_chat_write_direct_total",
+    "Chat messages written on the request path because the write-behind buffer was full",
+)
+CHAT_WRITE_DROPPED = Counter(
+    "bouldy_chat_write_dropped_messages_total",
+    "Buffered chat messages dropped because the database rejected them",
+)
+CHAT_WRITE_FLUSH_SECONDS = Histogram(
+    "bouldy_chat_write_flush_seconds",
+    "Time taken to write one batch of buffered chat messages",
+    buckets=LATENCY_BUCKETS,
+)
+
+def render_metrics() -> bytes:
+    """Serialize all metrics in the Prometheus text format."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by template (/api/chat/{chatbot_id}), never the raw path
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.labels(scope["method"], path, str(status)).inc()
+            HTTP_LATENCY.labels(scope["method"], path).observe(time.perf_counter() - started)
+
+
+class ChatTimings:
+    """
+    Collects stage durations for one chat request.
+    Provider and model are only known once the chatbot is loaded,
+    so stages are buffered and observed together at the end.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.provider = "unknown"
+        self.model = "unknown"
+        self.stages: dict[str, float] = {}
+
+    def label(self, provider: str | None, model: str | None):
+        self.provider = provider or "unknown"
+        self.model = model or "unknown"
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def observe(self):
+        for stage, seconds in self.stages.items():
+            CHAT_STAGE_LATENCY.labels(self.endpoint, stage, self.provider, self.model).observe(seconds)
+        self.stages.clear()
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Table, Integer, Text,Float
+from sqlalchemy import BigInteger, Column, String, DateTime, ForeignKey, Index, Table, Integer, Text,Float
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -14,6 +14,8 @@ chatbot_documents = Table(
     Base.metadata,
     Column("chatbot_id", UUID(as_uuid=True), ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True),
     Column("document_id", UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key covers lookups by chatbot; this one covers lookups by document
+    Index("ix_chatbot_documents_document_id", "document_id"),
 )
 
 
@@ -32,6 +34,9 @@ class User(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -53,6 +58,9 @@ class Document(Base):
 
 class Chatbot(Base):
     __tablename__ = "chatbots"
+    __table_args__ = (
+        Index("ix_chatbots_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -85,6 +93,11 @@ class Chatbot(Base):
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # Session listing: one user's sessions of a chatbot, keyset-ordered by (updated_at, id)
+        Index("ix_chat_sessions_chatbot_user_updated", "chatbot_id", "user_id", "updated_at", "id"),
+        Index("ix_chat_sessions_user_id", "user_id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     chatbot_id = Column(UUID(as_uuid=True), ForeignKey("chatbots.id", ondelete="CASCADE"), nullable=False)
@@ -102,6 +115,10 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Chat history, message paging and per-session counts
+        Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
@@ -116,6 +133,9 @@ class ChatMessage(Base):
 
 class Evaluation(Base):
     __tablename__ = "evaluations"
+    __table_args__ = (
+        Index("ix_evaluations_chatbot_id_created_at", "chatbot_id", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     chatbot_id = Column(UUID(as_uuid=True), ForeignKey("chatbots.id", ondelete="CASCADE"), nullable=False)
@@ -138,6 +158,9 @@ class Evaluation(Base):
 
 class EvaluationResult(Base):
     __tablename__ = "evaluation_results"
+    __table_args__ = (
+        Index("ix_evaluation_results_evaluation_question", "evaluation_id", "question_index"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     evaluation_id = Column(UUID(as_uuid=True), ForeignKey("evaluations.id", ondelete="CASCADE"), nullable=False)
@@ -155,4 +178,70 @@ class EvaluationResult(Base):
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    evaluation = relationship("Evaluation", back_populates="results")
\ No newline at end of file
+    evaluation = relationship("Evaluation", back_populates="results")
+
+class IndexingJob(Base):
+    __tablename__ = "indexing_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    chatbot_id = Column(UUID(as_uuid=True), ForeignKey("chatbots.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    status = Column(String(20), default="queued")  # queued, running, completed, failed
+    documents_total = Column(Integer, default=0)
+    documents_done = Column(Integer, default=0)  # ready or failed
+    documents_failed = Column(Integer, default=0)
+    pages_parsed = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)  # chunks produced so far
+    chunks_embedded = Column(Integer, default=0)
+    chunks_upserted = Column(Integer, default=0)
+    bytes_total = Column(Integer, default=0)
+    bytes_processed = Column(Integer, default=0)
+    stage_timings = Column(Text)  # JSON: seconds per stage (download, parse, chunk, embed, upsert)
+    error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)  # runs of this job; later runs resume from its checkpoints
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)  # last progress write, to spot runs that died
+    completed_at = Column(DateTime, nullable=True)
+
+    documents = relationship("IndexingJobDocument", back_populates="job", cascade="all, delete-orphan")
+
+
+class IndexingJobDocument(Base):
+    __tablename__ = "indexing_job_documents"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("indexing_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+
+    status = Column(String(20), default="pending")  # pending, processing, ready, failed
+    pages_parsed = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    chunks_upserted = Column(Integer, default=0)
+    bytes_total = Column(Integer, default=0)
+    bytes_processed = Column(Integer, default=0)
+    stage_timings = Column(Text)  # JSON, as on IndexingJob
+    error_message = Column(Text, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    job = relationship("IndexingJob", back_populates="documents")
+
+
+# Usage counters, maintained in the same transaction as the rows they count (see app/services/usage.py)
+class ChatbotUsage(Base):
+    __tablename__ = "chatbot_usage"
+
+    chatbot_id = Column(UUID(as_uuid=True), ForeignKey("chatbots.id", ondelete="CASCADE"), primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    messages = Column(Integer, nullable=False, default=0)
+
+
+class UserUsage(Base):
+    __tablename__ = "user_usage"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    documents = Column(Integer, nullable=False, default=0)
+    storage_bytes = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,43 @@
+# Keyset (cursor) pagination helpers
+# A cursor is the (timestamp, id) of the last row of a page, base64-encoded so clients treat it as opaque.
+# Pages are read with WHERE (ts, id) < (cursor) ORDER BY ts DESC, id DESC LIMIT n, so the cost of a page
+# does not depend on how deep into the listing it is.
+import base64
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(ts: datetime, row_id: UUID) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), UUID(row_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+
+# Restrict a select() to the newest-first page after cursor.
+# One extra row is fetched so next_page can tell whether another page exists.
+def keyset_page(statement, ts_column, id_column, cursor: str | None, limit: int):
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        statement = statement.where(or_(ts_column < ts, and_(ts_column == ts, id_column < row_id)))
+    return statement.order_by(ts_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+# Trim the rows of a keyset_page query to the page; returns (rows, next_cursor)
+def next_page(rows: list, ts_column, id_column, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, ts_column.key), getattr(last, id_column.key))
@@ -1,25 +1,17 @@
-import bcrypt
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr, Field
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User
+from app.services.passwords import HashQueueFull, hash_password_async, needs_rehash, verify_password_async
 
-router = APIRouter(prefix="/auth", tags=["auth"])
-
-
-def hash_password(password: str) -> str:
-    pwd_bytes = password.encode("utf-8")[:72]
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(pwd_bytes, salt).decode("utf-8")
-
-
-def verify_password(password: str, hashed: str) -> bool:
-    pwd_bytes = password.encode("utf-8")[:72]
-    hashed_bytes = hashed.encode("utf-8")
-    return bcrypt.checkpw(pwd_bytes, hashed_bytes)
+logger = logging.getLogger(__name__)
 
+router = APIRouter(prefix="/auth", tags=["auth"])
 
 class RegisterRequest(BaseModel):
     email: EmailStr
@@ -41,29 +33,50 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+# The bcrypt executor is saturated; ask the client to back off rather than queue without bound
+def _hash_queue_full() -> HTTPException:
+    return HTTPException(503, "Too many login attempts in progress, try again shortly", headers={"Retry-After": "1"})
+
+
 @router.post("/register", response_model=UserResponse)
-def register(data: RegisterRequest, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == data.email).first()
+async def register(data: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User.id).where(User.email == data.email))
     if existing:
         raise HTTPException(400, "Email already registered")
-    
+
+    try:
+        password_hash = await hash_password_async(data.password)
+    except HashQueueFull:
+        raise _hash_queue_full()
+
     user = User(
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=password_hash,
         name=data.name,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
-    
+    await db.commit()
+
     return UserResponse(id=str(user.id), email=user.email, name=user.name)
 
 
 @router.post("/login", response_model=UserResponse)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    
-    if not user or not verify_password(data.password, user.password_hash):
-        raise HTTPException(401, "Invalid email or password")
-    
-    return UserResponse(id=str(user.id), email=user.email, name=user.name)
\ No newline at end of file
+async def login(data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == data.email))
+
+    try:
+        if not user or not await verify_password_async(data.password, user.password_hash):
+            raise HTTPException(401, "Invalid email or password")
+    except HashQueueFull:
+        raise _hash_queue_full()
+
+    # The work factor changed since this hash was made; upgrade it while we have the plain password.
+    # Best effort: under load the upgrade waits for a later login rather than failing this one.
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = await hash_password_async(data.password)
+            await db.commit()
+        except HashQueueFull:
+            logger.info(f"Password rehash for user {user.id} skipped, hash queue is full")
+
+    return UserResponse(id=str(user.id), email=user.email, name=user.name)
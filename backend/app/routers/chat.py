@@ -2,28 +2,42 @@
 Chat endpoint for Bouldy.
 Handles: user question → retrieve from Qdrant → stream LLM response
 Supports: session persistence, optional conversation memory
+Handlers are async: database reads go through the async session, while the blocking
+Qdrant, embedding, LLM and Redis calls run in the threadpool. Messages are written
+behind the response by app/services/message_writer.py.
 """
 import json
 import logging
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-from llama_index.core import VectorStoreIndex, Settings as LISettings
+from llama_index.core import VectorStoreIndex, QueryBundle, Settings as LISettings
 from llama_index.core.llms import ChatMessage as LIChatMessage, MessageRole
 from llama_index.vector_stores.qdrant import QdrantVectorStore
+from opentelemetry import context as otel_context, trace
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Chatbot, ChatSession, ChatMessage, User
 from app.auth import get_current_user
-from app.services.indexing import get_qdrant_client, get_embed_model, get_collection_name
+from app.metrics import ChatTimings
+from app.tracing import tracer, detached_span
+from app.services.indexing import get_qdrant_client, get_embed_model, get_collection_name, get_live_collection
 from app.services.llm_provider import get_llm
-from app.services.cache import get_cached_response, cache_response
+from app.services.cache import (
+    INVALIDATION_CHANNEL, get_cached_response, cache_response, get_cache_generation, register_invalidation_handler,
+)
 from app.services.encryption import decrypt
+from app.services.usage import add_chatbot_usage
+from app.services import message_writer
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +45,7 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 
 RELEVANCE_THRESHOLD = 0.25
 MEMORY_MESSAGE_LIMIT = 10
+MAX_INDEX_HANDLES = 256  # loaded chatbot indexes each worker keeps
 
 
 class ChatRequest(BaseModel):
@@ -73,112 +88,180 @@ def extract_sources(source_nodes: list) -> list[dict]:
     return sources
 
 
-def load_chatbot_index(chatbot_id: UUID) -> VectorStoreIndex:
-    client = get_qdrant_client()
-    collection_name = get_collection_name(chatbot_id)
-    collections = [c.name for c in client.get_collections().collections]
-    if collection_name not in collections:
-        raise ValueError("Chatbot index not found. Documents may still be processing.")
-    vector_store = QdrantVectorStore(client=client, collection_name=collection_name)
-    LISettings.embed_model = get_embed_model()
-    return VectorStoreIndex.from_vector_store(vector_store)
+# Loaded index handles per chatbot, reused until the chatbot's cache generation changes.
+# An LRU of at most MAX_INDEX_HANDLES chatbots; a chatbot's handle is dropped when its cache is invalidated.
+_index_handles: OrderedDict[UUID, tuple[int, VectorStoreIndex]] = OrderedDict()
+_index_handles_lock = threading.Lock()
 
 
-def get_or_create_session(
-    chatbot_id: UUID, user_id: UUID, session_id: str | None, db: Session
+def _drop_index_handle(data: bytes) -> None:
+    chatbot_id = data.decode().partition(":")[0]
+    with _index_handles_lock:
+        _index_handles.pop(UUID(chatbot_id), None)
+
+
+def _clear_index_handles() -> None:
+    with _index_handles_lock:
+        _index_handles.clear()
+
+
+register_invalidation_handler(INVALIDATION_CHANNEL, _drop_index_handle, _clear_index_handles)
+
+
+def load_chatbot_index(chatbot_id: UUID, generation: int | None = None) -> VectorStoreIndex:
+    with tracer.start_as_current_span("qdrant.load_index", attributes={"chatbot.id": str(chatbot_id)}) as span:
+        if generation is not None:
+            with _index_handles_lock:
+                handle = _index_handles.get(chatbot_id)
+                if handle and handle[0] == generation:
+                    _index_handles.move_to_end(chatbot_id)
+                    span.set_attribute("index.reused", True)
+                    return handle[1]
+
+        client = get_qdrant_client()
+        if get_live_collection(client, chatbot_id) is None:
+            raise ValueError("Chatbot index not found. Documents may still be processing.")
+        # Reads go through the alias, so a handle keeps working across reindexes
+        vector_store = QdrantVectorStore(client=client, collection_name=get_collection_name(chatbot_id))
+        LISettings.embed_model = get_embed_model()
+        index = VectorStoreIndex.from_vector_store(vector_store)
+
+        span.set_attribute("index.reused", False)
+        if generation is not None:
+            with _index_handles_lock:
+                _index_handles[chatbot_id] = (generation, index)
+                _index_handles.move_to_end(chatbot_id)
+                while len(_index_handles) > MAX_INDEX_HANDLES:
+                    _index_handles.popitem(last=False)
+        return index
+
+
+def retrieve(query_engine, message: str, timings: ChatTimings) -> tuple[QueryBundle, list]:
+    """Embed the query and search Qdrant as separate, timed steps."""
+    with tracer.start_as_current_span("chat.retrieve") as span:
+        with timings.stage("query_embedding"), tracer.start_as_current_span("embedding.query"):
+            embedding = get_embed_model().get_query_embedding(message)
+        query_bundle = QueryBundle(message, embedding=embedding)
+        with timings.stage("qdrant_search"), tracer.start_as_current_span("qdrant.search"):
+            nodes = query_engine.retrieve(query_bundle)
+        span.set_attribute("retrieve.nodes", len(nodes))
+    return query_bundle, nodes
+
+
+async def get_user_chatbot(chatbot_id: UUID, user_id: UUID, db: AsyncSession) -> Chatbot:
+    """The user's chatbot, checked to have an LLM configured."""
+    chatbot = await db.scalar(select(Chatbot).where(
+        Chatbot.id == chatbot_id,
+        Chatbot.user_id == user_id,
+    ))
+    if not chatbot:
+        raise HTTPException(404, "Chatbot not found")
+    if not chatbot.llm_provider or not chatbot.llm_model:
+        raise HTTPException(400, "Chatbot LLM not configured")
+    return chatbot
+
+
+async def get_or_create_session(
+    chatbot_id: UUID, user_id: UUID, session_id: str | None, db: AsyncSession
 ) -> ChatSession:
     """Get existing session or create a new one."""
     if session_id:
-        session = db.query(ChatSession).filter(
+        session = await db.scalar(select(ChatSession).where(
             ChatSession.id == session_id,
             ChatSession.chatbot_id == chatbot_id,
             ChatSession.user_id == user_id,
-        ).first()
+        ))
         if not session:
             raise ValueError("Session not found")
         return session
 
-    # Create new session
+    # Create new session; written right away so a follow-up turn on any worker can find it
     session = ChatSession(
         chatbot_id=chatbot_id,
         user_id=user_id,
         title="New Chat",
     )
     db.add(session)
-    db.flush()  # get the ID without committing
+    await db.run_sync(add_chatbot_usage, chatbot_id, sessions=1)
+    await db.commit()
     return session
 
 
 def auto_title_session(session: ChatSession, first_message: str):
-    """Auto-generate session title from the first user message."""
+    """Auto-generate session title from the first user message (written with the messages)."""
     if session.title == "New Chat":
         title = first_message[:60].strip()
         if len(first_message) > 60:
             title += "..."
-        session.title = title
+        message_writer.set_title(session.id, title)
 
 
-def get_chat_history(session: ChatSession, db: Session) -> list[LIChatMessage]:
-    """Get recent messages for memory context."""
-    messages = db.query(ChatMessage).filter(
+async def get_chat_history(session: ChatSession, db: AsyncSession) -> list[LIChatMessage]:
+    """Get recent messages for memory context, including ones not yet written."""
+    rows = await db.execute(select(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at).where(
         ChatMessage.session_id == session.id,
-    ).order_by(ChatMessage.created_at.desc()).limit(MEMORY_MESSAGE_LIMIT).all()
+    ).order_by(ChatMessage.created_at.desc()).limit(MEMORY_MESSAGE_LIMIT))
+    messages = [row._asdict() for row in rows]
+
+    written = {msg["id"] for msg in messages}
+    messages += [msg for msg in message_writer.pending_messages(session.id) if msg["id"] not in written]
 
-    # Reverse to chronological order
-    messages = list(reversed(messages))
+    # Chronological order, keeping the most recent
+    messages = sorted(messages, key=lambda msg: msg["created_at"])[-MEMORY_MESSAGE_LIMIT:]
 
     history = []
     for msg in messages:
-        role = MessageRole.USER if msg.role == "user" else MessageRole.ASSISTANT
-        history.append(LIChatMessage(role=role, content=msg.content))
+        role = MessageRole.USER if msg["role"] == "user" else MessageRole.ASSISTANT
+        history.append(LIChatMessage(role=role, content=msg["content"]))
 
     return history
 
 
-def save_message(session_id: UUID, role: str, content: str, sources: list | None, db: Session):
-    """Save a chat message to the database."""
-    msg = ChatMessage(
-        session_id=session_id,
-        role=role,
-        content=content,
-        sources=json.dumps(sources) if sources else None,
-    )
-    db.add(msg)
+async def save_message(chatbot_id: UUID, session_id: UUID, role: str, content: str, sources: list | None):
+    """Queue a chat message, and the session's activity, for the next batched write.
+
+    When the write buffer is full the database is falling behind, so the message is written
+    directly instead, which slows this request down rather than growing the buffer.
+    """
+    if not message_writer.enqueue_message(chatbot_id, session_id, role, content, sources):
+        await run_in_threadpool(message_writer.write_message, chatbot_id, session_id, role, content, sources)
 
 
 # Non-streaming chat
 @router.post("/{chatbot_id}", response_model=ChatResponse)
-def chat(
+async def chat(
     chatbot_id: UUID,
     req: ChatRequest,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    chatbot = db.query(Chatbot).filter(
-        Chatbot.id == chatbot_id,
-        Chatbot.user_id == current_user.id,
-    ).first()
+    timings = ChatTimings("chat")
+    timings.record("auth", getattr(request.state, "auth_seconds", 0.0))
 
-    if not chatbot:
-        raise HTTPException(404, "Chatbot not found")
-    if not chatbot.llm_provider or not chatbot.llm_model:
-        raise HTTPException(400, "Chatbot LLM not configured")
+    with timings.stage("session_load"):
+        chatbot = await get_user_chatbot(chatbot_id, current_user.id, db)
+        timings.label(chatbot.llm_provider, chatbot.llm_model)
 
-    # Get or create session
-    try:
-        session = get_or_create_session(chatbot_id, current_user.id, req.session_id, db)
-    except ValueError as e:
-        raise HTTPException(404, str(e))
+        # Get or create session
+        try:
+            session = await get_or_create_session(chatbot_id, current_user.id, req.session_id, db)
+        except ValueError as e:
+            raise HTTPException(404, str(e))
 
     auto_title_session(session, req.message)
 
+    # Pin the index generation for this request so a concurrent reindex can't mix results
+    generation = await run_in_threadpool(get_cache_generation, str(chatbot_id))
+
     # Check cache
-    cached = get_cached_response(str(chatbot_id), req.message)
+    with timings.stage("cache_lookup"):
+        cached = await run_in_threadpool(get_cached_response, str(chatbot_id), req.message, generation)
     if cached:
-        save_message(session.id, "user", req.message, None, db)
-        save_message(session.id, "assistant", cached["response"], cached["sources"], db)
-        session.updated_at = datetime.utcnow()
-        db.commit()
+        with timings.stage("db_persist"):
+            await save_message(chatbot_id, session.id, "user", req.message, None)
+            await save_message(chatbot_id, session.id, "assistant", cached["response"], cached["sources"])
+        timings.observe()
         return ChatResponse(
             response=cached["response"],
             sources=cached["sources"],
@@ -187,7 +270,7 @@ def chat(
 
     # Load index and LLM
     try:
-        index = load_chatbot_index(chatbot_id)
+        index = await run_in_threadpool(load_chatbot_index, chatbot_id, generation)
     except ValueError as e:
         raise HTTPException(400, str(e))
 
@@ -195,32 +278,42 @@ def chat(
     llm = get_llm(chatbot.llm_provider, chatbot.llm_model, api_key)
 
     # Build query with optional memory
-    if chatbot.memory_enabled == "true":
-        chat_history = get_chat_history(session, db)
-        chat_engine = index.as_chat_engine(
-            llm=llm,
-            similarity_top_k=3,
-            chat_history=chat_history,
-            chat_mode="condense_plus_context",
-        )
-        response = chat_engine.chat(req.message)
-        source_nodes = response.source_nodes if hasattr(response, "source_nodes") else []
-    else:
+    chat_history = await get_chat_history(session, db) if chatbot.memory_enabled == "true" else None
+    # End the read transaction so no connection is held across the LLM call
+    await db.commit()
+
+    def answer():
+        if chat_history is not None:
+            chat_engine = index.as_chat_engine(
+                llm=llm,
+                similarity_top_k=3,
+                chat_history=chat_history,
+                chat_mode="condense_plus_context",
+            )
+            # Condense, retrieval and generation all happen inside the chat engine
+            with timings.stage("generation"), tracer.start_as_current_span("llm.chat"):
+                response = chat_engine.chat(req.message)
+            return response, response.source_nodes if hasattr(response, "source_nodes") else []
         query_engine = index.as_query_engine(llm=llm, similarity_top_k=3)
-        response = query_engine.query(req.message)
-        source_nodes = response.source_nodes
+        query_bundle, nodes = retrieve(query_engine, req.message, timings)
+        with timings.stage("generation"), tracer.start_as_current_span("llm.synthesize"):
+            response = query_engine.synthesize(query_bundle, nodes)
+        return response, response.source_nodes
 
+    response, source_nodes = await run_in_threadpool(answer)
     sources = extract_sources(source_nodes)
 
     # Save messages
-    save_message(session.id, "user", req.message, None, db)
-    save_message(session.id, "assistant", str(response), sources, db)
-    session.updated_at = datetime.utcnow()
+    with timings.stage("db_persist"):
+        await save_message(chatbot_id, session.id, "user", req.message, None)
+        await save_message(chatbot_id, session.id, "assistant", str(response), sources)
 
     # Cache the response
-    cache_response(str(chatbot_id), req.message, str(response), sources)
+    if generation is not None:
+        with timings.stage("cache_store"):
+            await run_in_threadpool(cache_response, str(chatbot_id), req.message, str(response), sources, generation)
 
-    db.commit()
+    timings.observe()
 
     return ChatResponse(
         response=str(response),
@@ -230,48 +323,51 @@ def chat(
 
 # Streaming chat
 @router.post("/{chatbot_id}/stream")
-def chat_stream(
+async def chat_stream(
     chatbot_id: UUID,
     req: ChatRequest,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    chatbot = db.query(Chatbot).filter(
-        Chatbot.id == chatbot_id,
-        Chatbot.user_id == current_user.id,
-    ).first()
+    timings = ChatTimings("chat_stream")
+    timings.record("auth", getattr(request.state, "auth_seconds", 0.0))
 
-    if not chatbot:
-        raise HTTPException(404, "Chatbot not found")
-    if not chatbot.llm_provider or not chatbot.llm_model:
-        raise HTTPException(400, "Chatbot LLM not configured")
+    with timings.stage("session_load"):
+        chatbot = await get_user_chatbot(chatbot_id, current_user.id, db)
+        timings.label(chatbot.llm_provider, chatbot.llm_model)
 
-    # Get or create session
-    try:
-        session = get_or_create_session(chatbot_id, current_user.id, req.session_id, db)
-    except ValueError as e:
-        raise HTTPException(404, str(e))
+        # Get or create session
+        try:
+            session = await get_or_create_session(chatbot_id, current_user.id, req.session_id, db)
+        except ValueError as e:
+            raise HTTPException(404, str(e))
 
     auto_title_session(session, req.message)
 
-    # Save user message immediately
-    save_message(session.id, "user", req.message, None, db)
+    # Pin the index generation for this request so a concurrent reindex can't mix results
+    generation = await run_in_threadpool(get_cache_generation, str(chatbot_id))
 
     # Check cache (return as non-streamed if cached)
-    cached = get_cached_response(str(chatbot_id), req.message)
+    with timings.stage("cache_lookup"):
+        cached = await run_in_threadpool(get_cached_response, str(chatbot_id), req.message, generation)
     if cached:
-        save_message(session.id, "assistant", cached["response"], cached["sources"], db)
-        session.updated_at = datetime.utcnow()
-        db.commit()
+        session_id = str(session.id)
+        with timings.stage("db_persist"):
+            await save_message(chatbot_id, session.id, "user", req.message, None)
+            await save_message(chatbot_id, session.id, "assistant", cached["response"], cached["sources"])
+        timings.observe()
+
+        # The request's DB session is closed by the time this runs, so only plain values are captured
         def cached_generate():
             yield cached["response"]
             yield f"\n\n__SOURCES__{json.dumps(cached['sources'])}"
-            yield f"\n__SESSION__{str(session.id)}"
+            yield f"\n__SESSION__{session_id}"
         return StreamingResponse(cached_generate(), media_type="text/plain")
 
     # Load index and LLM
     try:
-        index = load_chatbot_index(chatbot_id)
+        index = await run_in_threadpool(load_chatbot_index, chatbot_id, generation)
     except ValueError as e:
         raise HTTPException(400, str(e))
 
@@ -279,51 +375,70 @@ def chat_stream(
     llm = get_llm(chatbot.llm_provider, chatbot.llm_model, api_key)
 
     # Build query with optional memory
-    use_memory = chatbot.memory_enabled == "true"
-
-    if use_memory:
-        chat_history = get_chat_history(session, db)
-        chat_engine = index.as_chat_engine(
-            llm=llm,
-            similarity_top_k=3,
-            chat_history=chat_history,
-            chat_mode="condense_plus_context",
-            streaming=True,
-        )
-        streaming_response = chat_engine.stream_chat(req.message)
-    else:
+    chat_history = await get_chat_history(session, db) if chatbot.memory_enabled == "true" else None
+    # End the read transaction so no connection is held across the LLM call
+    await db.commit()
+
+    # Queue the user message before streaming so it is kept even if the stream fails
+    with timings.stage("db_persist"):
+        await save_message(chatbot_id, session.id, "user", req.message, None)
+
+    def start_stream():
+        if chat_history is not None:
+            chat_engine = index.as_chat_engine(
+                llm=llm,
+                similarity_top_k=3,
+                chat_history=chat_history,
+                chat_mode="condense_plus_context",
+                streaming=True,
+            )
+            # Condense and retrieval run before the stream is returned
+            with timings.stage("condense_and_retrieve"), tracer.start_as_current_span("llm.condense_and_retrieve"):
+                return chat_engine.stream_chat(req.message)
         query_engine = index.as_query_engine(
             llm=llm, similarity_top_k=3, streaming=True,
         )
-        streaming_response = query_engine.query(req.message)
-
-    session_id = str(session.id)
-    db.commit()  # commit session + user message before streaming
+        query_bundle, nodes = retrieve(query_engine, req.message, timings)
+        return query_engine.synthesize(query_bundle, nodes)
 
-    def generate():
-        full_response = ""
-        for text in streaming_response.response_gen:
-            full_response += text
-            yield text
+    streaming_response = await run_in_threadpool(start_stream)
 
-        # Extract sources
-        source_nodes = streaming_response.source_nodes if hasattr(streaming_response, "source_nodes") else []
-        sources = extract_sources(source_nodes)
+    session_id = str(session.id)
 
-        # Save assistant message after streaming completes
-        from app.database import SessionLocal
-        save_db = SessionLocal()
-        try:
-            save_message(UUID(session_id), "assistant", full_response, sources, save_db)
-            cache_response(str(chatbot_id), req.message, full_response, sources)
-            save_session = save_db.query(ChatSession).filter(ChatSession.id == session_id).first()
-            if save_session:
-                save_session.updated_at = datetime.utcnow()
-            save_db.commit()
-        finally:
-            save_db.close()
-
-        yield f"\n\n__SOURCES__{json.dumps(sources)}"
-        yield f"\n__SESSION__{session_id}"
-
-    return StreamingResponse(generate(), media_type="text/plain")
\ No newline at end of file
+    # The generator runs after this handler returns, so its span is parented explicitly
+    request_context = otel_context.get_current()
+
+    async def generate():
+        with detached_span("chat.stream", request_context, {"chatbot.id": str(chatbot_id)}) as span:
+            full_response = ""
+            first_token = True
+            generation_started = time.perf_counter()
+            # The LLM stream is a blocking iterator, so each token is pulled in the threadpool
+            async for text in iterate_in_threadpool(streaming_response.response_gen):
+                if first_token:
+                    timings.record("llm_first_token", time.perf_counter() - generation_started)
+                    span.add_event("first_token")
+                    first_token = False
+                full_response += text
+                yield text
+            timings.record("generation", time.perf_counter() - generation_started)
+            span.set_attribute("chat.response_chars", len(full_response))
+
+            # Extract sources
+            source_nodes = streaming_response.source_nodes if hasattr(streaming_response, "source_nodes") else []
+            sources = extract_sources(source_nodes)
+
+            # Save assistant message after streaming completes
+            with timings.stage("db_persist"):
+                await save_message(chatbot_id, UUID(session_id), "assistant", full_response, sources)
+            if generation is not None:
+                with trace.use_span(span), timings.stage("cache_store"):
+                    await run_in_threadpool(
+                        cache_response, str(chatbot_id), req.message, full_response, sources, generation,
+                    )
+            timings.observe()
+
+            yield f"\n\n__SOURCES__{json.dumps(sources)}"
+            yield f"\n__SESSION__{session_id}"
+
+    return StreamingResponse(generate(), media_type="text/plain")
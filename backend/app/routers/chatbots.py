@@ -3,17 +3,26 @@ import secrets
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks,UploadFile,File
-from sqlalchemy.orm import Session
-
-from app.database import get_db
-from app.models import Chatbot, Document, User
-from app.schemas import ChatbotCreate, ChatbotUpdate, ChatbotResponse, ChatbotDetailResponse, ChatbotListResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.database import get_async_db, get_db
+from app.models import Chatbot, Document, IndexingJob, User
+from app.schemas import (
+    ChatbotCreate, ChatbotUpdate, ChatbotResponse, ChatbotDetailResponse, ChatbotListResponse,
+    CacheStatsResponse, IndexingJobResponse,
+)
 from app.auth import get_current_user
 from app.services.indexing import index_chatbot_documents, delete_chatbot_index
+from app.services.indexing_progress import (
+    create_indexing_job, get_latest_job, is_resumable, job_to_response, subscribe_progress, stream_progress_events,
+)
+from app.tracing import inject_trace_context
 from app.storage import upload_file
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from app.storage import get_file as get_s3_file
-from app.services.cache import clear_chatbot_cache
+from app.services.cache import clear_chatbot_cache, get_cache_stats
 from pydantic import BaseModel
 from app.services.encryption import encrypt
 
@@ -98,7 +107,10 @@ def create_chatbot(
 
     # Trigger indexing in background if documents were assigned
     if docs:
-        background_tasks.add_task(index_chatbot_documents, chatbot.id, docs)
+        job = create_indexing_job(chatbot.id, docs, db)
+        background_tasks.add_task(
+            index_chatbot_documents, chatbot.id, docs, job_id=job.id, trace_context=inject_trace_context(),
+        )
         logger.info(f"Queued indexing for chatbot {chatbot.id} with {len(docs)} docs")
     
     return chatbot_to_response(chatbot)
@@ -195,10 +207,14 @@ def update_chatbot(
     # Re-index if documents changed
     if needs_reindex:
         if chatbot.documents:
-            background_tasks.add_task(index_chatbot_documents, chatbot.id, chatbot.documents)
+            job = create_indexing_job(chatbot.id, chatbot.documents, db)
+            background_tasks.add_task(
+                index_chatbot_documents, chatbot.id, chatbot.documents,
+                job_id=job.id, trace_context=inject_trace_context(),
+            )
             logger.info(f"Queued re-indexing for chatbot {chatbot.id}")
         else:
-            background_tasks.add_task(delete_chatbot_index, chatbot.id)
+            background_tasks.add_task(delete_chatbot_index, chatbot.id, trace_context=inject_trace_context())
             logger.info(f"Queued index deletion for chatbot {chatbot.id} (no docs)")
         # Clear cache for this chatbot
         clear_chatbot_cache(str(chatbot_id))
@@ -224,11 +240,11 @@ def delete_chatbot(
         raise HTTPException(404, "Chatbot not found")
     
     # Clean up Qdrant collection in background
-    background_tasks.add_task(delete_chatbot_index, chatbot_id)
+    background_tasks.add_task(delete_chatbot_index, chatbot_id, trace_context=inject_trace_context())
  
     # Clean up cache and Qdrant collection
     clear_chatbot_cache(str(chatbot_id))
-    background_tasks.add_task(delete_chatbot_index, chatbot_id)
+    background_tasks.add_task(delete_chatbot_index, chatbot_id, trace_context=inject_trace_context())
 
     db.delete(chatbot)
     db.commit()
@@ -297,6 +313,112 @@ def toggle_publish(
         "public_token": chatbot.public_token,
     }
 
+# Semantic cache stats for a chatbot (hit rate, latency, similarity distribution, savings)
+@router.get("/{chatbot_id}/cache-stats", response_model=CacheStatsResponse)
+def get_chatbot_cache_stats(
+    chatbot_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    chatbot = db.query(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.user_id == current_user.id,
+    ).first()
+
+    if not chatbot:
+        raise HTTPException(404, "Chatbot not found")
+
+    stats = get_cache_stats([str(chatbot_id)])[str(chatbot_id)]
+    return CacheStatsResponse(chatbot_id=chatbot_id, **stats)
+
+# Progress of the chatbot's latest indexing job, per chatbot and per document
+@router.get("/{chatbot_id}/indexing", response_model=IndexingJobResponse)
+def get_indexing_progress(
+    chatbot_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    chatbot = db.query(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.user_id == current_user.id,
+    ).first()
+
+    if not chatbot:
+        raise HTTPException(404, "Chatbot not found")
+
+    job = get_latest_job(chatbot_id, db)
+    if not job:
+        raise HTTPException(404, "No indexing job for this chatbot")
+    return job_to_response(job)
+
+
+# Resume the latest indexing job from its checkpoints after it failed or its worker died
+# Documents and chunks it already upserted are not processed again
+@router.post("/{chatbot_id}/indexing/resume", response_model=IndexingJobResponse)
+def resume_indexing(
+    chatbot_id: UUID,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    chatbot = db.query(Chatbot).filter(
+        Chatbot.id == chatbot_id,
+        Chatbot.user_id == current_user.id,
+    ).first()
+
+    if not chatbot:
+        raise HTTPException(404, "Chatbot not found")
+
+    job = get_latest_job(chatbot_id, db)
+    if not job:
+        raise HTTPException(404, "No indexing job for this chatbot")
+    if not is_resumable(job):
+        raise HTTPException(409, f"Indexing job is {job.status} and cannot be resumed")
+
+    docs = db.query(Document).filter(Document.id.in_([d.document_id for d in job.documents])).all()
+    job.status = "queued"
+    db.commit()
+    background_tasks.add_task(
+        index_chatbot_documents, chatbot.id, docs, job_id=job.id, trace_context=inject_trace_context(),
+    )
+    logger.info(f"Queued resume of indexing job {job.id} for chatbot {chatbot.id}")
+    return job_to_response(job)
+
+
+# Server-sent events for the latest indexing job: a snapshot, then updates until it finishes.
+# Async end to end, so open streams don't hold threadpool threads.
+@router.get("/{chatbot_id}/indexing/events")
+async def stream_indexing_progress(
+    chatbot_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    chatbot = await db.scalar(select(Chatbot.id).where(
+        Chatbot.id == chatbot_id,
+        Chatbot.user_id == current_user.id,
+    ))
+
+    if not chatbot:
+        raise HTTPException(404, "Chatbot not found")
+
+    # Subscribe before reading the snapshot; the request's DB session is closed before streaming starts
+    pubsub = await subscribe_progress(chatbot_id)
+    job = await db.scalar(select(IndexingJob).options(selectinload(IndexingJob.documents)).where(
+        IndexingJob.chatbot_id == chatbot_id,
+    ).order_by(IndexingJob.created_at.desc()).limit(1))
+    if not job:
+        if pubsub is not None:
+            await pubsub.aclose()
+        raise HTTPException(404, "No indexing job for this chatbot")
+
+    snapshot = job_to_response(job)
+    await db.commit()
+    return StreamingResponse(
+        stream_progress_events(chatbot_id, snapshot, pubsub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 class ValidateKeyRequest(BaseModel):
     provider: str
     model: str
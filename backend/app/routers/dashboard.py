@@ -2,11 +2,12 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 
-from app.database import get_db
-from app.models import Chatbot, Document, ChatSession, ChatMessage, User
+from app.database import get_read_db
+from app.models import Chatbot, ChatbotUsage, ChatSession, ChatMessage, User, UserUsage, chatbot_documents
 from app.auth import get_current_user
+from app.services.cache import get_cache_stats
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -20,85 +21,88 @@ class DashboardStats(BaseModel):
     storage_bytes: int
     recent_activity: list[dict]
     chatbot_overview: list[dict]
+    cache: dict = {}
 
 
+# Session, message and storage totals come from the usage counter rows (app/services/usage.py),
+# so the cost of this endpoint does not grow with the number of sessions or messages.
+# Read-only, so it is served from a replica when one is caught up.
 @router.get("", response_model=DashboardStats)
 def get_dashboard(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     uid = current_user.id
 
-    total_chatbots = db.query(func.count(Chatbot.id)).filter(Chatbot.user_id == uid).scalar() or 0
-    total_documents = db.query(func.count(Document.id)).filter(Document.user_id == uid).scalar() or 0
-    published_chatbots = db.query(func.count(Chatbot.id)).filter(
-        Chatbot.user_id == uid, Chatbot.is_public == "true"
-    ).scalar() or 0
+    documents = select(
+        chatbot_documents.c.chatbot_id, func.count(chatbot_documents.c.document_id).label("n"),
+    ).join(Chatbot, Chatbot.id == chatbot_documents.c.chatbot_id).where(
+        Chatbot.user_id == uid,
+    ).group_by(chatbot_documents.c.chatbot_id).subquery()
+    chatbots = db.query(
+        Chatbot.id, Chatbot.name, Chatbot.llm_provider, Chatbot.is_public, Chatbot.accent_primary,
+        func.coalesce(ChatbotUsage.sessions, 0).label("session_count"),
+        func.coalesce(ChatbotUsage.messages, 0).label("message_count"),
+        func.coalesce(documents.c.n, 0).label("document_count"),
+    ).outerjoin(ChatbotUsage, ChatbotUsage.chatbot_id == Chatbot.id).outerjoin(
+        documents, documents.c.chatbot_id == Chatbot.id,
+    ).filter(Chatbot.user_id == uid).order_by(Chatbot.created_at.desc()).all()
 
-    # Total sessions across all user's chatbots
-    chatbot_ids = [c.id for c in db.query(Chatbot.id).filter(Chatbot.user_id == uid).all()]
-    total_sessions = 0
-    total_messages = 0
-    session_ids = []
-    if chatbot_ids:
-        total_sessions = db.query(func.count(ChatSession.id)).filter(
-            ChatSession.chatbot_id.in_(chatbot_ids)
-        ).scalar() or 0
-        session_ids = [s.id for s in db.query(ChatSession.id).filter(
-            ChatSession.chatbot_id.in_(chatbot_ids)
-        ).all()]
-        if session_ids:
-            total_messages = db.query(func.count(ChatMessage.id)).filter(
-                ChatMessage.session_id.in_(session_ids)
-            ).scalar() or 0
+    usage = db.get(UserUsage, uid)
+    total_documents = usage.documents if usage else 0
+    storage_bytes = usage.storage_bytes if usage else 0
 
-    # Storage usage
-    storage_bytes = db.query(func.sum(Document.file_size)).filter(
-        Document.user_id == uid
-    ).scalar() or 0
-
-    # Recent activity — last 10 messages across all chatbots
-    recent_activity = []
-    if session_ids:
-        recent_msgs = db.query(ChatMessage).filter(
-            ChatMessage.session_id.in_(session_ids),
-            ChatMessage.role == "user",
-        ).order_by(ChatMessage.created_at.desc()).limit(8).all()
-
-        for msg in recent_msgs:
-            session = db.query(ChatSession).filter(ChatSession.id == msg.session_id).first()
-            chatbot = db.query(Chatbot).filter(Chatbot.id == session.chatbot_id).first() if session else None
-            recent_activity.append({
-                "message": msg.content[:80] + ("..." if len(msg.content) > 80 else ""),
-                "chatbot_name": chatbot.name if chatbot else "Unknown",
-                "chatbot_id": str(chatbot.id) if chatbot else None,
-                "created_at": msg.created_at.isoformat(),
-            })
+    # Recent activity — last 8 user messages across all chatbots
+    recent_msgs = db.query(ChatMessage.content, ChatMessage.created_at, Chatbot.id, Chatbot.name).join(
+        ChatSession, ChatSession.id == ChatMessage.session_id,
+    ).join(Chatbot, Chatbot.id == ChatSession.chatbot_id).filter(
+        Chatbot.user_id == uid,
+        ChatMessage.role == "user",
+    ).order_by(ChatMessage.created_at.desc()).limit(8).all()
+    recent_activity = [
+        {
+            "message": msg.content[:80] + ("..." if len(msg.content) > 80 else ""),
+            "chatbot_name": msg.name,
+            "chatbot_id": str(msg.id),
+            "created_at": msg.created_at.isoformat(),
+        }
+        for msg in recent_msgs
+    ]
 
     # Chatbot overview
-    chatbot_overview = []
-    chatbots = db.query(Chatbot).filter(Chatbot.user_id == uid).order_by(Chatbot.created_at.desc()).limit(6).all()
-    for bot in chatbots:
-        bot_sessions = db.query(func.count(ChatSession.id)).filter(
-            ChatSession.chatbot_id == bot.id
-        ).scalar() or 0
-        chatbot_overview.append({
+    chatbot_overview = [
+        {
             "id": str(bot.id),
             "name": bot.name,
             "llm_provider": bot.llm_provider,
-            "document_count": len(bot.documents),
-            "session_count": bot_sessions,
+            "document_count": bot.document_count,
+            "session_count": bot.session_count,
             "is_public": bot.is_public,
             "accent_primary": bot.accent_primary or "#715A5A",
-        })
+        }
+        for bot in chatbots[:6]
+    ]
+
+    # Semantic cache summary across all chatbots
+    chatbot_ids = [bot.id for bot in chatbots]
+    cache_stats = list(get_cache_stats([str(cid) for cid in chatbot_ids]).values()) if chatbot_ids else []
+    cache_hits = sum(sum(s["hits"].values()) for s in cache_stats)
+    cache_lookups = sum(s["lookups"] for s in cache_stats)
+    cache = {
+        "lookups": cache_lookups,
+        "hits": cache_hits,
+        "hit_rate": round(cache_hits / cache_lookups, 4) if cache_lookups else 0.0,
+        "tokens_saved": sum(s["tokens_saved"] for s in cache_stats),
+    }
 
     return DashboardStats(
-        total_chatbots=total_chatbots,
+        total_chatbots=len(chatbots),
         total_documents=total_documents,
-        total_sessions=total_sessions,
-        total_messages=total_messages,
-        published_chatbots=published_chatbots,
+        total_sessions=sum(bot.session_count for bot in chatbots),
+        total_messages=sum(bot.message_count for bot in chatbots),
+        published_chatbots=sum(bot.is_public == "true" for bot in chatbots),
         storage_bytes=storage_bytes,
         recent_activity=recent_activity,
         chatbot_overview=chatbot_overview,
-    )
\ No newline at end of file
+        cache=cache,
+    )
@@ -1,7 +1,7 @@
 import uuid
 import logging
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -9,6 +9,9 @@ from app.models import Document, User
 from app.schemas import DocumentResponse, DocumentListResponse
 from app.storage import upload_file, delete_file
 from app.auth import get_current_user
+from app.services.indexing import delete_document_vectors
+from app.services.usage import add_user_usage
+from app.tracing import inject_trace_context
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +57,7 @@ async def upload_document(
         status="uploaded",
     )
     db.add(document)
+    add_user_usage(db, current_user.id, documents=1, storage_bytes=document.file_size)
     db.commit()
     db.refresh(document)
 
@@ -75,6 +79,7 @@ def list_documents(
 @router.delete("/{document_id}")
 def delete_document(
     document_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -86,9 +91,17 @@ def delete_document(
     if not document:
         raise HTTPException(404, "Document not found")
 
+    chatbot_ids = [chatbot.id for chatbot in document.chatbots]
     delete_file(document.s3_key)
     db.delete(document)
+    add_user_usage(db, current_user.id, documents=-1, storage_bytes=-(document.file_size or 0))
     db.commit()
 
+    # Drop the document's chunks from the chatbots that used it, then their cached answers
+    if chatbot_ids:
+        background_tasks.add_task(
+            delete_document_vectors, document_id, chatbot_ids, trace_context=inject_trace_context(),
+        )
+
     logger.info(f"Document deleted: {document.original_filename} ({document_id}) by user {current_user.id}")
     return {"message": "Document deleted"}
\ No newline at end of file
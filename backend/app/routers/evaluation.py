@@ -20,7 +20,7 @@ from ragas.dataset_schema import SingleTurnSample, EvaluationDataset
 
 from llama_index.llms.openai import OpenAI
 
-from app.database import get_db, SessionLocal
+from app.database import get_db, get_read_db, SessionLocal
 from app.models import Chatbot, Evaluation, EvaluationResult, User
 from app.config import settings
 from app.auth import get_current_user
@@ -239,10 +239,10 @@ def start_evaluation(
 @router.get("")
 def list_evaluations(
     chatbot_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List evaluation runs for a chatbot (most recent first)."""
+    """List evaluation runs for a chatbot (most recent first). Served from a replica when one is caught up."""
     chatbot = db.query(Chatbot).filter(
         Chatbot.id == chatbot_id,
         Chatbot.user_id == current_user.id,
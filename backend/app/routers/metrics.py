@@ -0,0 +1,16 @@
+"""
+Prometheus scrape endpoint for Bouldy.
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def metrics():
+    """Request counts, route latencies and chat stage timings in Prometheus format."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
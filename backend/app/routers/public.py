@@ -5,20 +5,27 @@ Rate limited to prevent abuse.
 """
 import json
 import logging
+import time
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from opentelemetry import context as otel_context
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
 
-from app.database import get_db
+from app.database import get_async_db, get_async_read_db
 from app.models import Chatbot
+from app.metrics import ChatTimings
+from app.tracing import detached_span
 from app.services.llm_provider import get_llm
+from app.services.cache import get_cache_generation
 from app.routers.chat import (
-    load_chatbot_index, extract_sources,
+    load_chatbot_index, extract_sources, retrieve,
 )
 
 logger = logging.getLogger(__name__)
@@ -41,16 +48,20 @@ class PublicChatbotInfo(BaseModel):
     has_avatar: bool
 
 
-# Get public chatbot info (for rendering the chat page)
+async def get_published_chatbot(token: str, db: AsyncSession) -> Chatbot | None:
+    return await db.scalar(select(Chatbot).where(
+        Chatbot.public_token == token,
+        Chatbot.is_public == "true",
+    ))
+
+
+# Get public chatbot info (for rendering the chat page); served from a replica when one is caught up
 @router.get("/{token}")
-def get_public_chatbot(
+async def get_public_chatbot(
     token: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    chatbot = db.query(Chatbot).filter(
-        Chatbot.public_token == token,
-        Chatbot.is_public == "true",
-    ).first()
+    chatbot = await get_published_chatbot(token, db)
 
     if not chatbot:
         raise HTTPException(404, "Chatbot not found or not published")
@@ -68,27 +79,31 @@ def get_public_chatbot(
 # Public streaming chat
 @router.post("/{token}/chat")
 @limiter.limit("20/minute")
-def public_chat(
+async def public_chat(
     request: Request,
     token: str,
     req: PublicChatRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    timings = ChatTimings("public_chat")
+
     # 1. Find chatbot by token
-    chatbot = db.query(Chatbot).filter(
-        Chatbot.public_token == token,
-        Chatbot.is_public == "true",
-    ).first()
+    with timings.stage("session_load"):
+        chatbot = await get_published_chatbot(token, db)
 
     if not chatbot:
         raise HTTPException(404, "Chatbot not found or not published")
 
     if not chatbot.llm_provider or not chatbot.llm_model:
         raise HTTPException(400, "Chatbot LLM not configured")
+    timings.label(chatbot.llm_provider, chatbot.llm_model)
+    # End the read transaction so no connection is held across the LLM call
+    await db.commit()
 
-    # 2. Load index
+    # 2. Load index (Redis and Qdrant calls block, so they run in the threadpool)
     try:
-        index = load_chatbot_index(chatbot.id)
+        generation = await run_in_threadpool(get_cache_generation, str(chatbot.id))
+        index = await run_in_threadpool(load_chatbot_index, chatbot.id, generation)
     except ValueError as e:
         raise HTTPException(400, str(e))
 
@@ -102,17 +117,34 @@ def public_chat(
         streaming=True,
     )
 
-    streaming_response = query_engine.query(req.message)
-
-    def generate():
-        full_response = ""
-        for text in streaming_response.response_gen:
-            full_response += text
-            yield text
-
-        source_nodes = streaming_response.source_nodes if hasattr(streaming_response, "source_nodes") else []
-        sources = extract_sources(source_nodes)
-
-        yield f"\n\n__SOURCES__{json.dumps(sources)}"
-
-    return StreamingResponse(generate(), media_type="text/plain")
\ No newline at end of file
+    def start_stream():
+        query_bundle, nodes = retrieve(query_engine, req.message, timings)
+        return query_engine.synthesize(query_bundle, nodes)
+
+    streaming_response = await run_in_threadpool(start_stream)
+
+    # The generator runs after this handler returns, so its span is parented explicitly
+    request_context = otel_context.get_current()
+
+    async def generate():
+        with detached_span("chat.stream", request_context, {"chatbot.id": str(chatbot.id)}) as span:
+            full_response = ""
+            first_token = True
+            generation_started = time.perf_counter()
+            async for text in iterate_in_threadpool(streaming_response.response_gen):
+                if first_token:
+                    timings.record("llm_first_token", time.perf_counter() - generation_started)
+                    span.add_event("first_token")
+                    first_token = False
+                full_response += text
+                yield text
+            timings.record("generation", time.perf_counter() - generation_started)
+            timings.observe()
+            span.set_attribute("chat.response_chars", len(full_response))
+
+            source_nodes = streaming_response.source_nodes if hasattr(streaming_response, "source_nodes") else []
+            sources = extract_sources(source_nodes)
+
+            yield f"\n\n__SOURCES__{json.dumps(sources)}"
+
+    return StreamingResponse(generate(), media_type="text/plain")
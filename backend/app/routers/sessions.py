@@ -1,73 +1,120 @@
 # Chat session endpoints for Bouldy
 # Handles: session CRUD, message history retrieval
+# Async end to end: these are pure database routes on the chat UI's hot path.
 import logging
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.database import get_db
-from app.models import Chatbot, ChatSession, User
+from app.database import get_async_db
+from app.models import Chatbot, ChatMessage, ChatSession, User
 from app.schemas import (
-    ChatSessionResponse, ChatSessionDetailResponse,
-    ChatSessionListResponse, ChatSessionUpdate,
+    ChatMessageListResponse, ChatMessageResponse, ChatSessionResponse,
+    ChatSessionDetailResponse, ChatSessionListResponse, ChatSessionUpdate,
 )
 from app.auth import get_current_user
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, next_page
+from app.services import message_writer
+from app.services.usage import add_chatbot_usage
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chatbots/{chatbot_id}/sessions", tags=["sessions"])
 
 
-def session_to_response(session: ChatSession) -> ChatSessionResponse:
+# Message count as a correlated subquery, so counting never loads the messages
+_message_count = select(func.count(ChatMessage.id)).where(
+    ChatMessage.session_id == ChatSession.id,
+).correlate(ChatSession).scalar_subquery().label("message_count")
+
+
+def session_to_response(session: ChatSession, message_count: int) -> ChatSessionResponse:
     return ChatSessionResponse(
         id=session.id,
         chatbot_id=session.chatbot_id,
         title=session.title,
         created_at=session.created_at,
         updated_at=session.updated_at,
-        message_count=len(session.messages),
+        message_count=message_count,
     )
 
 
-def verify_chatbot_access(chatbot_id: UUID, user: User, db: Session) -> Chatbot:
-    chatbot = db.query(Chatbot).filter(
+async def count_messages(session_id: UUID, db: AsyncSession) -> int:
+    return await db.scalar(select(func.count(ChatMessage.id)).where(ChatMessage.session_id == session_id))
+
+
+# Write this worker's buffered chat messages for the chatbot (or one session) before reading,
+# so message counts, pages and last activity include them
+async def write_pending(chatbot_id: UUID, session_id: UUID | None = None) -> None:
+    if message_writer.has_pending(chatbot_id, session_id):
+        await run_in_threadpool(message_writer.flush)
+
+
+async def verify_chatbot_access(chatbot_id: UUID, user: User, db: AsyncSession) -> Chatbot:
+    chatbot = await db.scalar(select(Chatbot).where(
         Chatbot.id == chatbot_id,
         Chatbot.user_id == user.id,
-    ).first()
+    ))
     if not chatbot:
         raise HTTPException(404, "Chatbot not found")
     return chatbot
 
 
-# List all sessions for a chatbot
+async def get_user_session(chatbot_id: UUID, session_id: UUID, user: User, db: AsyncSession) -> ChatSession:
+    session = await db.scalar(select(ChatSession).where(
+        ChatSession.id == session_id,
+        ChatSession.chatbot_id == chatbot_id,
+        ChatSession.user_id == user.id,
+    ))
+    if not session:
+        raise HTTPException(404, "Session not found")
+    return session
+
+
+# List sessions for a chatbot, most recently active first.
+# Pass next_cursor back as cursor to get the following page. Read from the primary, not a replica:
+# the UI lists sessions right after a chat creates one, and a lagging replica would not show it yet.
 @router.get("", response_model=ChatSessionListResponse)
-def list_sessions(
+async def list_sessions(
     chatbot_id: UUID,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    verify_chatbot_access(chatbot_id, current_user, db)
-
-    sessions = db.query(ChatSession).filter(
-        ChatSession.chatbot_id == chatbot_id,
-        ChatSession.user_id == current_user.id,
-    ).order_by(ChatSession.updated_at.desc()).all()
+    await verify_chatbot_access(chatbot_id, current_user, db)
+    await write_pending(chatbot_id)
+
+    filters = (ChatSession.chatbot_id == chatbot_id, ChatSession.user_id == current_user.id)
+    page = keyset_page(
+        select(
+            ChatSession.id, ChatSession.chatbot_id, ChatSession.title,
+            ChatSession.created_at, ChatSession.updated_at, _message_count,
+        ).where(*filters),
+        ChatSession.updated_at, ChatSession.id, cursor, limit,
+    )
+    rows, next_cursor = next_page((await db.execute(page)).all(), ChatSession.updated_at, ChatSession.id, limit)
+    # Counting is proportional to the listing, so only the first page pays for it
+    total = None if cursor else await db.scalar(select(func.count(ChatSession.id)).where(*filters))
 
     return ChatSessionListResponse(
-        sessions=[session_to_response(s) for s in sessions],
-        total=len(sessions),
+        sessions=[ChatSessionResponse.model_validate(row) for row in rows],
+        total=total,
+        next_cursor=next_cursor,
     )
 
 
 # Create a new session
 @router.post("", response_model=ChatSessionResponse)
-def create_session(
+async def create_session(
     chatbot_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    verify_chatbot_access(chatbot_id, current_user, db)
+    await verify_chatbot_access(chatbot_id, current_user, db)
 
     session = ChatSession(
         chatbot_id=chatbot_id,
@@ -75,94 +122,100 @@ def create_session(
         title="New Chat",
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.run_sync(add_chatbot_usage, chatbot_id, sessions=1)
+    await db.commit()
+    await db.refresh(session)
 
     logger.info(f"Session created: {session.id} for chatbot {chatbot_id}")
-    return session_to_response(session)
+    return session_to_response(session, 0)
+
+
+# Newest page of a session's messages, returned oldest first for display
+async def message_page(session_id: UUID, cursor: str | None, limit: int, db: AsyncSession):
+    page = keyset_page(
+        select(ChatMessage).where(ChatMessage.session_id == session_id),
+        ChatMessage.created_at, ChatMessage.id, cursor, limit,
+    )
+    messages, next_cursor = next_page(list(await db.scalars(page)), ChatMessage.created_at, ChatMessage.id, limit)
+    return [ChatMessageResponse.model_validate(m) for m in reversed(messages)], next_cursor
 
 
-# Get a session with all messages
+# Get a session with its most recent messages
 @router.get("/{session_id}", response_model=ChatSessionDetailResponse)
-def get_session(
+async def get_session(
     chatbot_id: UUID,
     session_id: UUID,
-    db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    verify_chatbot_access(chatbot_id, current_user, db)
-
-    session = db.query(ChatSession).filter(
-        ChatSession.id == session_id,
-        ChatSession.chatbot_id == chatbot_id,
-        ChatSession.user_id == current_user.id,
-    ).first()
-
-    if not session:
-        raise HTTPException(404, "Session not found")
+    await verify_chatbot_access(chatbot_id, current_user, db)
+    await write_pending(chatbot_id, session_id)
+    session = await get_user_session(chatbot_id, session_id, current_user, db)
+    messages, next_cursor = await message_page(session.id, None, limit, db)
 
     return ChatSessionDetailResponse(
-        id=session.id,
-        chatbot_id=session.chatbot_id,
-        title=session.title,
-        created_at=session.created_at,
-        updated_at=session.updated_at,
-        message_count=len(session.messages),
-        messages=session.messages,
+        **session_to_response(session, await count_messages(session.id, db)).model_dump(),
+        messages=messages,
+        next_cursor=next_cursor,
     )
 
 
+# Page backwards through a session's message history
+@router.get("/{session_id}/messages", response_model=ChatMessageListResponse)
+async def list_messages(
+    chatbot_id: UUID,
+    session_id: UUID,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    await verify_chatbot_access(chatbot_id, current_user, db)
+    await write_pending(chatbot_id, session_id)
+    session = await get_user_session(chatbot_id, session_id, current_user, db)
+    messages, next_cursor = await message_page(session.id, cursor, limit, db)
+    return ChatMessageListResponse(messages=messages, next_cursor=next_cursor)
+
+
 # Update session title
 @router.patch("/{session_id}", response_model=ChatSessionResponse)
-def update_session(
+async def update_session(
     chatbot_id: UUID,
     session_id: UUID,
     data: ChatSessionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    verify_chatbot_access(chatbot_id, current_user, db)
-
-    session = db.query(ChatSession).filter(
-        ChatSession.id == session_id,
-        ChatSession.chatbot_id == chatbot_id,
-        ChatSession.user_id == current_user.id,
-    ).first()
-
-    if not session:
-        raise HTTPException(404, "Session not found")
+    await verify_chatbot_access(chatbot_id, current_user, db)
+    session = await get_user_session(chatbot_id, session_id, current_user, db)
 
     if data.title is not None:
         session.title = data.title
         logger.info(f"Session {session_id} renamed to: {data.title}")
 
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
 
-    return session_to_response(session)
+    return session_to_response(session, await count_messages(session.id, db))
 
 
 # Delete a session
 @router.delete("/{session_id}")
-def delete_session(
+async def delete_session(
     chatbot_id: UUID,
     session_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    verify_chatbot_access(chatbot_id, current_user, db)
-
-    session = db.query(ChatSession).filter(
-        ChatSession.id == session_id,
-        ChatSession.chatbot_id == chatbot_id,
-        ChatSession.user_id == current_user.id,
-    ).first()
-
-    if not session:
-        raise HTTPException(404, "Session not found")
+    await verify_chatbot_access(chatbot_id, current_user, db)
+    session = await get_user_session(chatbot_id, session_id, current_user, db)
 
-    db.delete(session)
-    db.commit()
+    # Messages are removed in one statement rather than loaded for the ORM cascade
+    deleted = await db.execute(delete(ChatMessage).where(ChatMessage.session_id == session.id))
+    await db.delete(session)
+    await db.run_sync(add_chatbot_usage, chatbot_id, sessions=-1, messages=-deleted.rowcount)
+    await db.commit()
 
     logger.info(f"Session deleted: {session_id} from chatbot {chatbot_id}")
-    return {"message": "Session deleted"}
\ No newline at end of file
+    return {"message": "Session deleted"}
@@ -95,14 +95,80 @@ class ChatSessionResponse(BaseModel):
         from_attributes = True
 
 
+# Detail carries the newest page of messages; next_cursor fetches older ones
 class ChatSessionDetailResponse(ChatSessionResponse):
     messages: list[ChatMessageResponse] = []
+    next_cursor: str | None = None
 
 
 class ChatSessionListResponse(BaseModel):
     sessions: list[ChatSessionResponse]
-    total: int
+    total: int | None = None  # only counted on the first page
+    next_cursor: str | None = None
+
+
+class ChatMessageListResponse(BaseModel):
+    messages: list[ChatMessageResponse]
+    next_cursor: str | None = None
 
 
 class ChatSessionUpdate(BaseModel):
-    title: str | None = None
\ No newline at end of file
+    title: str | None = None
+
+
+# Cache
+class CacheLatencyStats(BaseModel):
+    avg: float
+    buckets: dict[str, int]
+
+
+class CacheStatsResponse(BaseModel):
+    chatbot_id: UUID
+    lookups: int
+    hits: dict[str, int]  # per tier: local, exact, semantic
+    misses: int
+    hit_rate: float
+    latency_ms: CacheLatencyStats
+    similarity: dict[str, int]  # best similarity per semantic scan, bucketed by upper bound
+    stores: int
+    bytes_stored: int
+    tokens_saved: int  # estimated LLM output tokens not generated thanks to hits
+    entries: int  # live entries in the current generation
+    bytes: int
+
+
+# Indexing progress
+class IndexingDocumentProgress(BaseModel):
+    document_id: UUID
+    status: str  # pending, processing, ready, failed
+    pages_parsed: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_upserted: int
+    bytes_total: int
+    bytes_processed: int
+    stage_timings: dict[str, float]  # seconds per stage
+    error_message: str | None = None
+
+
+class IndexingJobResponse(BaseModel):
+    id: UUID
+    chatbot_id: UUID
+    status: str  # queued, running, completed, failed
+    documents_total: int
+    documents_done: int
+    documents_failed: int
+    pages_parsed: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_upserted: int
+    bytes_total: int
+    bytes_processed: int
+    stage_timings: dict[str, float]
+    error_message: str | None = None
+    attempts: int
+    created_at: datetime
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
+    completed_at: datetime | None = None
+    documents: list[IndexingDocumentProgress] = []
@@ -1,23 +1,113 @@
 # Redis-based semantic query cache for Bouldy
 # Caches chat responses to avoid redundant LLM calls
+import asyncio
 import json
 import hashlib
 import logging
+import struct
+import threading
+import time
+from collections import OrderedDict
+
 import numpy as np
+import zstandard
 
 import redis
+import redis.asyncio
 from app.config import settings
+from app.services import cache_metrics
 from app.services.indexing import get_embed_model
+from app.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 CACHE_TTL = 3600  # 1 hour
 SIMILARITY_THRESHOLD = 0.95  # cosine similarity threshold for cache hits
+L1_MAX_BYTES = 8 * 1024 * 1024  # per-worker in-process cache budget
+L1_TTL = 60  # seconds — bounds staleness if an invalidation message is missed
+L1_MAX_GENERATIONS = 10_000  # chatbots whose generation each worker remembers
+INVALIDATION_CHANNEL = "cache:invalidate"
+STATS_FLUSH_INTERVAL = 10  # seconds between pushes of local cache stats to Redis
+
+# Entry encoding — v1 is the legacy JSON document, v2 is a packed binary record:
+#   header (version, dtype code, embedding dim) | raw embedding | zstd-compressed JSON payload
+# Readers accept both; set CACHE_FORMAT_VERSION = 1 to write JSON again during a rollback.
+CACHE_FORMAT_VERSION = 2
+EMBEDDING_DTYPE = np.float32  # np.float16 halves entry size at a small precision cost
+ZSTD_LEVEL = 3
+_HEADER = struct.Struct(">BBH")
+_DTYPE_CODES = {np.dtype(np.float32): 0, np.dtype(np.float16): 1}
+_CODE_DTYPES = {code: dtype for dtype, code in _DTYPE_CODES.items()}
 
 
-# Redis client
+# Redis client (binary — cache entries are packed bytes)
 def get_redis_client() -> redis.Redis:
-    return redis.from_url(settings.redis_url, decode_responses=True)
+    return redis.from_url(settings.redis_url)
+
+
+_async_client: tuple | None = None  # (event loop, client)
+
+
+# One async Redis client per event loop; a client can't be shared across loops
+def get_async_redis_client() -> redis.asyncio.Redis:
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client[0] is not loop:
+        _async_client = (loop, redis.asyncio.from_url(settings.redis_url))
+    return _async_client[1]
+
+
+class LocalCache:
+    """Per-worker LRU of hot cache hits, bounded by payload size in bytes."""
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict) -> None:
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._size += size
+            # Evict least recently used entries until back under budget
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+local_cache = LocalCache(L1_MAX_BYTES, L1_TTL)
 
 
 # Generate embedding for a query
@@ -26,6 +116,47 @@ def get_query_embedding(query: str) -> list[float]:
     return embed_model.get_query_embedding(query)
 
 
+# Serialize a cache entry in the configured format
+def encode_entry(query: str, embedding: list[float], response: str, sources: list) -> bytes:
+    if CACHE_FORMAT_VERSION == 1:
+        return json.dumps({
+            "query": query,
+            "embedding": embedding,
+            "response": response,
+            "sources": sources,
+        }).encode()
+
+    vector = np.asarray(embedding, dtype=EMBEDDING_DTYPE)
+    header = _HEADER.pack(CACHE_FORMAT_VERSION, _DTYPE_CODES[vector.dtype], len(vector))
+    payload = json.dumps({"query": query, "response": response, "sources": sources}).encode()
+    return header + vector.tobytes() + zstandard.compress(payload, ZSTD_LEVEL)
+
+
+# Read just the embedding of a cache entry — the payload stays compressed
+def decode_embedding(raw: bytes) -> np.ndarray | None:
+    if raw[:1] == b"{":
+        embedding = json.loads(raw).get("embedding")
+        return np.asarray(embedding, dtype=np.float32) if embedding else None
+
+    version, dtype_code, dim = _HEADER.unpack_from(raw)
+    if version != 2 or dtype_code not in _CODE_DTYPES:
+        return None
+    return np.frombuffer(raw, dtype=_CODE_DTYPES[dtype_code], count=dim, offset=_HEADER.size)
+
+
+# Read the response and sources of a cache entry
+def decode_payload(raw: bytes) -> dict | None:
+    if raw[:1] == b"{":
+        data = json.loads(raw)
+    else:
+        version, dtype_code, dim = _HEADER.unpack_from(raw)
+        if version != 2 or dtype_code not in _CODE_DTYPES:
+            return None
+        offset = _HEADER.size + dim * _CODE_DTYPES[dtype_code].itemsize
+        data = json.loads(zstandard.decompress(raw[offset:]))
+    return {"response": data["response"], "sources": data["sources"]}
+
+
 # Cosine similarity between two vectors
 def cosine_similarity(a: list[float], b: list[float]) -> float:
     a_arr = np.array(a)
@@ -38,76 +169,307 @@ def cache_prefix(chatbot_id: str) -> str:
     return f"cache:{chatbot_id}"
 
 
-# Try to find a cached response for a similar query
-def get_cached_response(chatbot_id: str, query: str) -> dict | None:
-    try:
-        r = get_redis_client()
-        prefix = cache_prefix(chatbot_id)
-        query_embedding = get_query_embedding(query)
+# Redis counter holding the chatbot's current index generation
+def generation_key(chatbot_id: str) -> str:
+    return f"{cache_prefix(chatbot_id)}:generation"
 
-        # Get all cache keys for this chatbot
-        keys = r.keys(f"{prefix}:*")
 
-        for key in keys:
-            cached = r.get(key)
-            if not cached:
-                continue
+# Redis hash with the entries and bytes stored in one generation, kept up to date on store so stats
+# never scan the keyspace. It expires with the generation's newest entry, so entries that expired
+# individually before then are still counted.
+def generation_size_key(chatbot_id: str, generation: int) -> str:
+    return f"{cache_prefix(chatbot_id)}:size:{generation}"
 
-            data = json.loads(cached)
-            cached_embedding = data.get("embedding")
-            if not cached_embedding:
-                continue
 
-            # Check similarity
-            similarity = cosine_similarity(query_embedding, cached_embedding)
-            if similarity >= SIMILARITY_THRESHOLD:
-                logger.info(f"Cache hit for chatbot {chatbot_id} (similarity: {similarity:.3f})")
-                return {
-                    "response": data["response"],
-                    "sources": data["sources"],
-                }
+# Worker-local view of each chatbot's generation: chatbot_id -> (expires_at, generation)
+# Refreshed by pub/sub on invalidation, and from Redis at most every L1_TTL seconds.
+# An LRU of at most L1_MAX_GENERATIONS chatbots; a forgotten one is read from Redis again.
+_generations: OrderedDict[str, tuple[float, int]] = OrderedDict()
+_generations_lock = threading.Lock()
 
-        logger.info(f"Cache miss for chatbot {chatbot_id}")
-        return None
 
+def _remember_generation(chatbot_id: str, generation: int) -> None:
+    with _generations_lock:
+        _generations[chatbot_id] = (time.monotonic() + L1_TTL, generation)
+        _generations.move_to_end(chatbot_id)
+        while len(_generations) > L1_MAX_GENERATIONS:
+            _generations.popitem(last=False)
+
+
+def _forget_generation(chatbot_id: str) -> None:
+    with _generations_lock:
+        _generations.pop(chatbot_id, None)
+
+
+def _known_generation(chatbot_id: str) -> int | None:
+    with _generations_lock:
+        known = _generations.get(chatbot_id)
+        if known and known[0] > time.monotonic():
+            _generations.move_to_end(chatbot_id)
+            return known[1]
+    return None
+
+
+# Current index generation for a chatbot, or None if Redis is unreachable
+def get_cache_generation(chatbot_id: str) -> int | None:
+    known = _known_generation(chatbot_id)
+    if known is not None:
+        return known
+    try:
+        raw = get_redis_client().get(generation_key(chatbot_id))
     except Exception as e:
-        logger.warning(f"Cache lookup failed: {e}")
+        logger.warning(f"Cache generation lookup failed: {e}")
         return None
+    generation = int(raw) if raw else 0
+    _remember_generation(chatbot_id, generation)
+    return generation
+
+
+# Current generations of several chatbots, reading the ones not known locally with one MGET.
+# Raises if Redis is unreachable.
+def get_cache_generations(r: redis.Redis, chatbot_ids: list[str]) -> dict[str, int]:
+    generations = {chatbot_id: _known_generation(chatbot_id) for chatbot_id in chatbot_ids}
+    missing = [chatbot_id for chatbot_id, generation in generations.items() if generation is None]
+    if missing:
+        for chatbot_id, raw in zip(missing, r.mget([generation_key(chatbot_id) for chatbot_id in missing])):
+            generations[chatbot_id] = int(raw) if raw else 0
+            _remember_generation(chatbot_id, generations[chatbot_id])
+    return generations
+
+
+# Case-fold and collapse whitespace so trivially different queries share a key
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+# Cache key for a query — hash of the normalized text, so it doubles as the exact-match key
+# Keys are scoped to a generation; bumping the generation orphans every older entry
+def cache_key(chatbot_id: str, generation: int, query: str) -> str:
+    query_hash = hashlib.md5(normalize_query(query).encode(), usedforsecurity=False).hexdigest()
+    return f"{cache_prefix(chatbot_id)}:{generation}:{query_hash}"
+
+
+# Try to find a cached response for the same or a similar query
+# Pass the generation captured at request start so lookup and store agree
+def get_cached_response(chatbot_id: str, query: str, generation: int | None = None) -> dict | None:
+    with tracer.start_as_current_span("cache.lookup", attributes={"chatbot.id": chatbot_id}) as span:
+        started = time.perf_counter()
+        try:
+            if generation is None:
+                generation = get_cache_generation(chatbot_id)
+                if generation is None:
+                    return None
+            hit, tier = _lookup(chatbot_id, generation, query)
+        except Exception as e:
+            logger.warning(f"Cache lookup failed: {e}")
+            span.set_attribute("cache.error", str(e))
+            return None
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        cache_metrics.record_lookup(chatbot_id, tier, latency_ms, hit["response"] if hit else None)
+        span.set_attributes({"cache.generation": generation, "cache.result": tier or "miss"})
+        return hit
+
+
+# Walk the cache tiers in cost order; returns (hit, tier) or (None, None)
+def _lookup(chatbot_id: str, generation: int, query: str) -> tuple[dict | None, str | None]:
+    key = cache_key(chatbot_id, generation, query)
+
+    # L1 tier — in-process, no network
+    hit = local_cache.get(key)
+    if hit:
+        logger.info(f"Cache hit for chatbot {chatbot_id} (local)")
+        return hit, "local"
+
+    r = get_redis_client()
+
+    # Exact-match tier — one GET, no embedding call
+    cached = r.get(key)
+    hit = decode_payload(cached) if cached else None
+    if hit:
+        logger.info(f"Cache hit for chatbot {chatbot_id} (exact match)")
+        local_cache.set(key, hit)
+        return hit, "exact"
+
+    # Semantic tier — only reached when the exact lookup misses
+    query_embedding = np.asarray(get_query_embedding(query), dtype=np.float32)
+
+    # Get all cache keys for this chatbot's current generation
+    keys = r.keys(f"{cache_prefix(chatbot_id)}:{generation}:*")
+
+    best_similarity = None
+    for entry_key in keys:
+        cached = r.get(entry_key)
+        if not cached:
+            continue
+
+        cached_embedding = decode_embedding(cached)
+        if cached_embedding is None:
+            continue
+
+        # Check similarity — the payload is only decompressed on a hit
+        similarity = cosine_similarity(query_embedding, cached_embedding)
+        if best_similarity is None or similarity > best_similarity:
+            best_similarity = similarity
+        if similarity >= SIMILARITY_THRESHOLD:
+            hit = decode_payload(cached)
+            if not hit:
+                continue
+            logger.info(f"Cache hit for chatbot {chatbot_id} (similarity: {similarity:.3f})")
+            cache_metrics.record_similarity(chatbot_id, similarity)
+            local_cache.set(key, hit)
+            return hit, "semantic"
+
+    # The closest miss is what tells us whether SIMILARITY_THRESHOLD is too strict
+    if best_similarity is not None:
+        cache_metrics.record_similarity(chatbot_id, best_similarity)
+    logger.info(f"Cache miss for chatbot {chatbot_id}")
+    return None, None
 
 
 # Store a response in cache
-def cache_response(chatbot_id: str, query: str, response: str, sources: list) -> None:
+# A response generated against an older generation lands under that generation and is never served
+def cache_response(
+    chatbot_id: str, query: str, response: str, sources: list, generation: int | None = None,
+) -> None:
+    with tracer.start_as_current_span("cache.store", attributes={"chatbot.id": chatbot_id}):
+        _store(chatbot_id, query, response, sources, generation)
+
+
+def _store(chatbot_id: str, query: str, response: str, sources: list, generation: int | None) -> None:
     try:
+        if generation is None:
+            generation = get_cache_generation(chatbot_id)
+            if generation is None:
+                return
         r = get_redis_client()
-        prefix = cache_prefix(chatbot_id)
         query_embedding = get_query_embedding(query)
+        key = cache_key(chatbot_id, generation, query)
 
-        # Use hash of query as key
-        query_hash = hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()[:12]
-        key = f"{prefix}:{query_hash}"
+        entry = encode_entry(query, query_embedding, response, sources)
+        replaced = int(r.strlen(key) or 0)  # an existing entry for the same query is overwritten
+        r.setex(key, CACHE_TTL, entry)
+        local_cache.set(key, {"response": response, "sources": sources})
+        cache_metrics.record_store(chatbot_id, len(entry))
 
-        data = {
-            "query": query,
-            "embedding": query_embedding,
-            "response": response,
-            "sources": sources,
-        }
-
-        r.setex(key, CACHE_TTL, json.dumps(data))
-        logger.info(f"Cached response for chatbot {chatbot_id} (key: {query_hash})")
+        size_key = generation_size_key(chatbot_id, generation)
+        pipe = r.pipeline(transaction=False)
+        pipe.hincrby(size_key, "entries", 0 if replaced else 1)
+        pipe.hincrby(size_key, "bytes", len(entry) - replaced)
+        pipe.expire(size_key, CACHE_TTL)
+        pipe.execute()
+        logger.info(f"Cached response for chatbot {chatbot_id} (key: {key})")
 
     except Exception as e:
         logger.warning(f"Cache store failed: {e}")
 
 
-# Clear cache for a chatbot (called when documents change)
+# Invalidate a chatbot's cache (called when documents change or an index is rebuilt)
+# One atomic INCR moves readers to a fresh generation; old entries expire via CACHE_TTL.
+# Other workers pick up the new generation from the pub/sub message.
 def clear_chatbot_cache(chatbot_id: str) -> None:
+    _forget_generation(chatbot_id)
+    local_cache.invalidate_prefix(f"{cache_prefix(chatbot_id)}:")
     try:
         r = get_redis_client()
-        prefix = cache_prefix(chatbot_id)
-        keys = r.keys(f"{prefix}:*")
-        if keys:
-            r.delete(*keys)
-            logger.info(f"Cleared {len(keys)} cache entries for chatbot {chatbot_id}")
+        generation = r.incr(generation_key(chatbot_id))
+        _remember_generation(chatbot_id, generation)
+        r.publish(INVALIDATION_CHANNEL, f"{chatbot_id}:{generation}")
+        logger.info(f"Cache for chatbot {chatbot_id} moved to generation {generation}")
     except Exception as e:
-        logger.warning(f"Cache clear failed: {e}")
\ No newline at end of file
+        logger.warning(f"Cache clear failed: {e}")
+
+
+# Apply an invalidation message ("<chatbot_id>:<generation>") from another worker
+def _apply_invalidation(data: bytes) -> None:
+    chatbot_id, _, generation = data.decode().partition(":")
+    local_cache.invalidate_prefix(f"{cache_prefix(chatbot_id)}:")
+    if generation:
+        _remember_generation(chatbot_id, int(generation))
+    else:
+        _forget_generation(chatbot_id)
+
+
+# Hit/miss stats for chatbots, plus the entries and bytes live in their current generation
+def get_cache_stats(chatbot_ids: list[str]) -> dict[str, dict]:
+    empty = cache_metrics.summarize({})
+    try:
+        r = get_redis_client()
+        stats = cache_metrics.read(r, chatbot_ids)
+        generations = get_cache_generations(r, chatbot_ids)
+        pipe = r.pipeline(transaction=False)
+        for chatbot_id in chatbot_ids:
+            pipe.hmget(generation_size_key(chatbot_id, generations[chatbot_id]), "entries", "bytes")
+        for chatbot_id, (entries, size) in zip(chatbot_ids, pipe.execute()):
+            stats[chatbot_id]["entries"] = int(entries or 0)
+            stats[chatbot_id]["bytes"] = int(size or 0)
+        return stats
+    except Exception as e:
+        logger.warning(f"Cache stats lookup failed: {e}")
+        return {chatbot_id: {**empty, "entries": 0, "bytes": 0} for chatbot_id in chatbot_ids}
+
+
+# Background loop that pushes this worker's cache stats to Redis
+def _flush_stats_periodically(stop: threading.Event) -> None:
+    while not stop.wait(STATS_FLUSH_INTERVAL):
+        try:
+            cache_metrics.flush(get_redis_client())
+        except Exception as e:
+            logger.warning(f"Cache stats flush failed: {e}")
+    try:
+        cache_metrics.flush(get_redis_client())
+    except Exception as e:
+        logger.warning(f"Cache stats flush failed: {e}")
+
+
+# Invalidation channels the listener subscribes to: channel -> [(apply message, reset after a disconnect)]
+_invalidation_handlers: dict[str, list[tuple]] = {}
+
+
+# Let another per-worker cache receive invalidations over the same listener thread
+def register_invalidation_handler(channel: str, apply, reset) -> None:
+    _invalidation_handlers.setdefault(channel, []).append((apply, reset))
+
+
+def _reset_response_cache() -> None:
+    local_cache.clear()
+    with _generations_lock:
+        _generations.clear()
+
+
+register_invalidation_handler(INVALIDATION_CHANNEL, _apply_invalidation, _reset_response_cache)
+
+
+# Background loop that applies invalidations published by other workers
+def _listen_for_invalidations(stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*_invalidation_handlers)
+            try:
+                while not stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        channel = message["channel"]
+                        for apply, _ in _invalidation_handlers[channel.decode() if isinstance(channel, bytes) else channel]:
+                            apply(message["data"])
+            finally:
+                pubsub.close()
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener disconnected: {e}")
+            # Messages may have been missed while disconnected
+            for handlers in _invalidation_handlers.values():
+                for _, reset in handlers:
+                    reset()
+            stop.wait(5)
+
+
+# Start the invalidation listener and stats flusher threads; set the returned event to stop them
+def start_cache_workers() -> threading.Event:
+    stop = threading.Event()
+    for target, name in (
+        (_listen_for_invalidations, "cache-invalidation"),
+        (_flush_stats_periodically, "cache-stats"),
+    ):
+        threading.Thread(target=target, args=(stop,), name=name, daemon=True).start()
+    return stop
\ No newline at end of file
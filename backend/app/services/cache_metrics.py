@@ -0,0 +1,128 @@
+# Semantic cache instrumentation for Bouldy
+# Per-chatbot counters and histograms, aggregated in-process and flushed to Redis
+# so every worker contributes to the same totals
+import threading
+from collections import defaultdict
+
+import redis
+
+from app.metrics import CACHE_LOOKUPS
+
+TIERS = ("local", "exact", "semantic")
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+SIMILARITY_BUCKETS = (0.5, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99, 1.0)
+CHARS_PER_TOKEN = 4  # rough estimate for English text
+
+# chatbot_id -> field -> delta not yet flushed to Redis
+_pending: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+_lock = threading.Lock()
+
+
+# Redis hash holding a chatbot's aggregated cache stats
+def stats_key(chatbot_id: str) -> str:
+    return f"cache:{chatbot_id}:stats"
+
+
+# Histogram bucket label (upper bound) for a value
+def bucket_for(value: float, buckets: tuple) -> str:
+    for edge in buckets:
+        if value <= edge:
+            return str(edge)
+    return "+Inf"
+
+
+# Approximate LLM tokens in a piece of text
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _add(chatbot_id: str, **fields: float) -> None:
+    with _lock:
+        pending = _pending[chatbot_id]
+        for field, amount in fields.items():
+            pending[field] += amount
+
+
+# Record one lookup — tier is None for a miss
+def record_lookup(chatbot_id: str, tier: str | None, latency_ms: float, response: str | None = None) -> None:
+    fields = {
+        "lookups": 1,
+        "latency_ms_sum": latency_ms,
+        f"latency_ms:{bucket_for(latency_ms, LATENCY_BUCKETS_MS)}": 1,
+    }
+    if tier:
+        fields[f"hits:{tier}"] = 1
+        if response:
+            fields["tokens_saved"] = estimate_tokens(response)
+    else:
+        fields["misses"] = 1
+    _add(chatbot_id, **fields)
+    CACHE_LOOKUPS.labels(tier or "miss").inc()
+
+
+# Record the best similarity seen by a semantic scan, hit or miss
+def record_similarity(chatbot_id: str, similarity: float) -> None:
+    _add(chatbot_id, **{f"similarity:{bucket_for(similarity, SIMILARITY_BUCKETS)}": 1})
+
+
+# Record a stored entry and its encoded size
+def record_store(chatbot_id: str, size_bytes: int) -> None:
+    _add(chatbot_id, stores=1, bytes_stored=size_bytes)
+
+
+# Push pending deltas to Redis in one pipeline; deltas are dropped if Redis is unreachable
+def flush(r: redis.Redis) -> None:
+    global _pending
+    with _lock:
+        pending, _pending = _pending, defaultdict(lambda: defaultdict(float))
+    if not pending:
+        return
+    pipe = r.pipeline(transaction=False)
+    for chatbot_id, fields in pending.items():
+        for field, amount in fields.items():
+            pipe.hincrbyfloat(stats_key(chatbot_id), field, amount)
+    pipe.execute()
+
+
+# Read aggregated stats for several chatbots, including this worker's unflushed deltas
+def read(r: redis.Redis, chatbot_ids: list[str]) -> dict[str, dict]:
+    pipe = r.pipeline(transaction=False)
+    for chatbot_id in chatbot_ids:
+        pipe.hgetall(stats_key(chatbot_id))
+    raw_stats = pipe.execute()
+
+    results = {}
+    for chatbot_id, raw in zip(chatbot_ids, raw_stats):
+        fields = defaultdict(float, {k.decode(): float(v) for k, v in raw.items()})
+        with _lock:
+            for field, amount in _pending.get(chatbot_id, {}).items():
+                fields[field] += amount
+        results[chatbot_id] = summarize(fields)
+    return results
+
+
+# Shape raw counter fields into the stats response
+def summarize(fields: dict[str, float]) -> dict:
+    hits = {tier: int(fields.get(f"hits:{tier}", 0)) for tier in TIERS}
+    total_hits = sum(hits.values())
+    misses = int(fields.get("misses", 0))
+    lookups = int(fields.get("lookups", 0))
+    return {
+        "lookups": lookups,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0,
+        "latency_ms": {
+            "avg": round(fields.get("latency_ms_sum", 0) / lookups, 3) if lookups else 0.0,
+            "buckets": _histogram(fields, "latency_ms", LATENCY_BUCKETS_MS),
+        },
+        "similarity": _histogram(fields, "similarity", SIMILARITY_BUCKETS),
+        "stores": int(fields.get("stores", 0)),
+        "bytes_stored": int(fields.get("bytes_stored", 0)),
+        "tokens_saved": int(fields.get("tokens_saved", 0)),
+    }
+
+
+def _histogram(fields: dict[str, float], name: str, buckets: tuple) -> dict[str, int]:
+    labels = [str(edge) for edge in buckets] + ["+Inf"]
+    return {label: int(fields.get(f"{name}:{label}", 0)) for label in labels}
@@ -1,23 +1,45 @@
 # Document processing pipeline for Bouldy
 # Handles: download from MinIO → parse → chunk → embed → store in Qdrant
+# Streams one document at a time and embeds in fixed-size batches, so memory does not grow with the corpus
+# Each job builds a versioned collection; chat reads through an alias that is switched to the new
+# version only when it is complete, and replaced versions are dropped after a grace period
 import io
 import logging
-from uuid import UUID
-
-from llama_index.core import Document as LIDocument, VectorStoreIndex, StorageContext, Settings as LISettings
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from uuid import UUID, uuid5
+
+from llama_index.core import Document as LIDocument
+from llama_index.core.embeddings import BaseEmbedding
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, MetadataMode
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
 from qdrant_client.http.exceptions import UnexpectedResponse
+from redis.exceptions import LockError
 
 from app.config import settings
-from app.storage import get_file
 from app.database import SessionLocal
-from app.models import Document as DocumentModel
+from app.models import Chatbot, IndexingJob, chatbot_documents
+from app.storage import get_file
+from app.services.indexing_progress import IndexingProgress, get_latest_job, is_resumable
+from app.tracing import tracer, extract_trace_context
 
 logger = logging.getLogger(__name__)
 
+# Chunking parameters for SentenceSplitter (tokens)
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+EMBED_BATCH_SIZE = 64  # chunks embedded and upserted together
+VERSION_GC_INTERVAL = 300  # seconds between sweeps for replaced index versions
+ORPHAN_SWEEP_INTERVAL = 3600  # seconds between reconciliations of Qdrant with the database
+DOC_ID_KEY = "doc_id"  # payload field with the source document's id, indexed by QdrantVectorStore
+
 
 # Qdrant client
 def get_qdrant_client() -> QdrantClient:
@@ -32,11 +54,28 @@ def get_embed_model() -> OpenAIEmbedding:
     )
 
 
-# Collection name per chatbot
+# Collection name per chatbot; an alias for its live index version
 def get_collection_name(chatbot_id: UUID) -> str:
     return f"chatbot_{str(chatbot_id)}"
 
 
+# Versioned collection built by one indexing job; a resumed job continues the same version
+def get_version_name(chatbot_id: UUID, job_id: UUID) -> str:
+    return f"{get_collection_name(chatbot_id)}__{job_id.hex}"
+
+
+# Collection the chatbot's alias points at, or None if the chatbot has no index
+def get_live_collection(client: QdrantClient, chatbot_id: UUID) -> str | None:
+    alias = get_collection_name(chatbot_id)
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    # Indexes built before versioning are plain collections under the alias name
+    if client.collection_exists(alias):
+        return alias
+    return None
+
+
 # Extract text from PDF bytes, per page
 def parse_pdf_pages(content: bytes) -> list[dict]:
     from pypdf import PdfReader
@@ -60,123 +99,409 @@ def parse_txt(content: bytes) -> str:
     return content.decode("utf-8", errors="ignore")
 
 
-# Update a document's status in the database
-def update_document_status(doc_id, status: str):
-    db = SessionLocal()
-    try:
-        doc = db.query(DocumentModel).filter(DocumentModel.id == doc_id).first()
-        if doc:
-            doc.status = status
-            db.commit()
-            logger.info(f"Document {doc_id} status → {status}")
-    except Exception as e:
-        logger.error(f"Failed to update document {doc_id} status: {e}")
-        db.rollback()
-    finally:
-        db.close()
+# Move the chatbot's query and index-handle caches to a new generation
+def invalidate_chatbot_caches(chatbot_id: UUID) -> None:
+    from app.services.cache import clear_chatbot_cache  # cache imports this module
+    clear_chatbot_cache(str(chatbot_id))
 
 
-# Full indexing pipeline for a chatbot
-# Downloads docs from MinIO, parses, chunks, embeds, stores in Qdrant
-def index_chatbot_documents(chatbot_id: UUID, documents: list) -> int:
-    collection_name = get_collection_name(chatbot_id)
-    client = get_qdrant_client()
+# Parse one downloaded document into LlamaIndex Documents (one per PDF page)
+# Every page carries the document's id, so chunks reference it and get stable ids
+def _parse_document(doc, content: bytes) -> list[LIDocument]:
+    base_metadata = {
+        "document_id": str(doc.id),
+        "filename": doc.original_filename,
+        "file_type": doc.file_type,
+    }
+    li_documents = []
 
-    # Delete existing collection if it exists (clean rebuild)
-    try:
-        client.delete_collection(collection_name)
-        logger.info(f"Deleted existing collection: {collection_name}")
-    except UnexpectedResponse:
-        pass
+    if doc.file_type == "pdf":
+        pages = parse_pdf_pages(content)
+        for page_data in pages:
+            li_documents.append(LIDocument(
+                id_=str(doc.id),
+                text=page_data["text"],
+                metadata={**base_metadata, "page": page_data["page"]},
+            ))
+        logger.info(f"Parsed PDF: {doc.original_filename} ({len(pages)} pages)")
 
-    # Download and parse all documents into LlamaIndex Documents
-    li_documents = []
-    for doc in documents:
-        update_document_status(doc.id, "processing")
-        try:
-            content = get_file(doc.s3_key)
-            base_metadata = {
-                "document_id": str(doc.id),
-                "filename": doc.original_filename,
-                "file_type": doc.file_type,
-            }
-
-            if doc.file_type == "pdf":
-                pages = parse_pdf_pages(content)
-                for page_data in pages:
-                    li_documents.append(LIDocument(
-                        text=page_data["text"],
-                        metadata={**base_metadata, "page": page_data["page"]},
-                    ))
-                logger.info(f"Parsed PDF: {doc.original_filename} ({len(pages)} pages)")
-
-            elif doc.file_type == "docx":
-                text = parse_docx(content)
-                if text.strip():
-                    li_documents.append(LIDocument(
-                        text=text,
-                        metadata={**base_metadata, "page": None},
-                    ))
-                    logger.info(f"Parsed DOCX: {doc.original_filename} ({len(text)} chars)")
-
-            elif doc.file_type == "txt":
-                text = parse_txt(content)
-                if text.strip():
-                    li_documents.append(LIDocument(
-                        text=text,
-                        metadata={**base_metadata, "page": None},
-                    ))
-                    logger.info(f"Parsed TXT: {doc.original_filename} ({len(text)} chars)")
-
-            else:
-                logger.warning(f"Unsupported file type: {doc.file_type}")
-                update_document_status(doc.id, "failed")
-                continue
+    elif doc.file_type == "docx":
+        text = parse_docx(content)
+        if text.strip():
+            li_documents.append(LIDocument(
+                id_=str(doc.id),
+                text=text,
+                metadata={**base_metadata, "page": None},
+            ))
+            logger.info(f"Parsed DOCX: {doc.original_filename} ({len(text)} chars)")
+
+    elif doc.file_type == "txt":
+        text = parse_txt(content)
+        if text.strip():
+            li_documents.append(LIDocument(
+                id_=str(doc.id),
+                text=text,
+                metadata={**base_metadata, "page": None},
+            ))
+            logger.info(f"Parsed TXT: {doc.original_filename} ({len(text)} chars)")
+
+    else:
+        raise ValueError(f"Unsupported file type: {doc.file_type}")
+
+    return li_documents
+
+
+# Chunk ids depend only on the document, page and position, so re-indexing the same
+# content overwrites points instead of duplicating them
+def chunk_id(i: int, li_document: LIDocument) -> str:
+    return str(uuid5(UUID(li_document.id_), f"{li_document.metadata.get('page')}:{i}"))
+
+
+def get_splitter() -> SentenceSplitter:
+    return SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, id_func=chunk_id)
 
-            update_document_status(doc.id, "ready")
 
+# Full indexing pipeline for a chatbot
+# Downloads docs from MinIO, parses, chunks, embeds, stores in Qdrant
+# job_id is the IndexingJob created when the task was queued; one is created if omitted.
+# Passing the id of a failed job resumes it from its last checkpoint
+# trace_context (from inject_trace_context) links the job to the request that queued it
+def index_chatbot_documents(
+    chatbot_id: UUID, documents: list, job_id: UUID | None = None, trace_context: dict | None = None,
+) -> int:
+    with tracer.start_as_current_span(
+        "indexing.index_chatbot",
+        context=extract_trace_context(trace_context),
+        attributes={"chatbot.id": str(chatbot_id), "indexing.documents": len(documents)},
+    ) as span:
+        progress = IndexingProgress(chatbot_id, documents, job_id)
+        progress.start()
+        try:
+            chunk_count = _index_chatbot_documents(chatbot_id, documents, progress)
         except Exception as e:
-            logger.error(f"Failed to parse document {doc.id}: {e}")
-            update_document_status(doc.id, "failed")
-            continue
+            logger.error(f"Indexing failed for chatbot {chatbot_id}: {e}")
+            progress.finish(error=str(e))
+            raise
+        progress.finish()
+        span.set_attribute("indexing.chunks", chunk_count)
+        return chunk_count
 
-    if not li_documents:
-        logger.warning(f"No documents to index for chatbot {chatbot_id}")
-        return 0
 
-    # Configure embedding model
-    LISettings.embed_model = get_embed_model()
+def _index_chatbot_documents(chatbot_id: UUID, documents: list, progress: IndexingProgress) -> int:
+    collection_name = get_version_name(chatbot_id, progress.job_id)
+    client = get_qdrant_client()
 
-    # Set up chunking
-    splitter = SentenceSplitter(chunk_size=512, chunk_overlap=50)
+    embed_model = get_embed_model()
+    splitter = get_splitter()
 
-    # Set up Qdrant vector store
+    # The collection is created on the first upsert
     vector_store = QdrantVectorStore(
         client=client,
         collection_name=collection_name,
     )
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
-    # Build index (chunks, embeds, and stores in one go)
-    index = VectorStoreIndex.from_documents(
-        li_documents,
-        storage_context=storage_context,
-        transformations=[splitter],
-    )
+    # Only one document's chunks and one batch of embeddings are held at a time
+    chunk_count = 0
+    unavailable: list[UUID] = []
+    for batch in _batched(_iter_document_nodes(documents, splitter, progress, unavailable), EMBED_BATCH_SIZE):
+        with tracer.start_as_current_span("indexing.embed_and_store", attributes={"indexing.batch_chunks": len(batch)}):
+            _embed_and_store(batch, embed_model, vector_store, progress)
+        chunk_count += len(batch)
+
+    # A storage outage would leave the new version missing documents; the live index keeps
+    # serving and the job fails so it can be resumed once the files can be read again
+    if unavailable:
+        raise RuntimeError(
+            f"{len(unavailable)} of {len(documents)} documents could not be downloaded; the live index was kept"
+        )
+
+    # A rebuild queued after this one has the newer document set, whenever it finishes
+    if _superseded(chatbot_id, progress):
+        _delete_collection(client, collection_name)
+        raise RuntimeError("Superseded by a newer indexing job; this version was discarded")
+
+    # The new version is complete; chat switches to it atomically
+    total = progress.job["chunks_upserted"]  # includes chunks upserted before a resume
+    if not documents:
+        logger.warning(f"No documents to index for chatbot {chatbot_id}")
+        _switch_alias(client, chatbot_id, None)
+        _delete_collection(client, collection_name)
+    elif not total:
+        raise RuntimeError(f"No chunks were indexed from {len(documents)} documents; the live index was kept")
+    else:
+        _switch_alias(client, chatbot_id, collection_name)
+        logger.info(f"Indexed {total} chunks for chatbot {chatbot_id} ({chunk_count} in this run) into {collection_name}")
 
-    # Get chunk count
-    chunk_count = len(index.docstore.docs)
-    logger.info(f"Indexed {chunk_count} chunks for chatbot {chatbot_id}")
+    # Answers cached while the rebuild ran came from the old index
+    invalidate_chatbot_caches(chatbot_id)
 
-    return chunk_count
+    return total
 
 
-# Delete a chatbot's Qdrant collection
-def delete_chatbot_index(chatbot_id: UUID) -> None:
-    collection_name = get_collection_name(chatbot_id)
-    client = get_qdrant_client()
+# Whether another indexing job was queued for the chatbot after this one.
+# Compared by creation time, so it also works for a job whose progress could not be saved.
+def _superseded(chatbot_id: UUID, progress: IndexingProgress) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(IndexingJob.id).filter(
+            IndexingJob.chatbot_id == chatbot_id,
+            IndexingJob.id != progress.job_id,
+            IndexingJob.created_at > progress.job["created_at"],
+        ).first() is not None
+    finally:
+        db.close()
+
+
+# Download, parse and chunk documents one at a time, yielding their chunks
+# A document that fails is marked failed with the reason and contributes nothing; documents that
+# could not be downloaded are also added to unavailable, since a retry may succeed
+# Documents and chunks already upserted by an earlier run of the job are skipped
+def _iter_document_nodes(
+    documents: list, splitter: SentenceSplitter, progress: IndexingProgress, unavailable: list[UUID],
+) -> Iterator[BaseNode]:
+    for doc in documents:
+        if progress.is_ready(doc.id):
+            continue
+        progress.document_started(doc.id)
+        with tracer.start_as_current_span("indexing.parse_document", attributes={
+            "document.id": str(doc.id), "document.file_type": doc.file_type,
+        }):
+            started = time.perf_counter()
+            try:
+                content = get_file(doc.s3_key)
+            except Exception as e:
+                logger.error(f"Failed to download document {doc.id}: {e}")
+                progress.document_failed(doc.id, f"Download failed: {e}")
+                unavailable.append(doc.id)
+                continue
+            downloaded = time.perf_counter()
+            try:
+                parsed = _parse_document(doc, content)
+                parsed_at = time.perf_counter()
+                nodes = splitter.get_nodes_from_documents(parsed)
+                chunked = time.perf_counter()
+            except Exception as e:
+                logger.error(f"Failed to parse document {doc.id}: {e}")
+                progress.document_failed(doc.id, str(e))
+                continue
+
+        progress.record_stage(doc.id, "download", downloaded - started)
+        progress.record_stage(doc.id, "parse", parsed_at - downloaded)
+        progress.record_stage(doc.id, "chunk", chunked - parsed_at)
+        progress.document_chunked(doc.id, len(content), len(parsed), len(nodes))
+        yield from nodes[progress.upserted_chunks(doc.id):]
+
+
+# Group an iterable into lists of at most size items
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Embed a batch of chunks and upsert them into the vector store
+def _embed_and_store(
+    nodes: list[BaseNode], embed_model: BaseEmbedding, vector_store: QdrantVectorStore, progress: IndexingProgress,
+) -> None:
+    counts = Counter(UUID(node.metadata["document_id"]) for node in nodes)
+
+    started = time.perf_counter()
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    for node, embedding in zip(nodes, embed_model.get_text_embedding_batch(texts)):
+        node.embedding = embedding
+    progress.chunks_processed("embed", counts, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    vector_store.add(nodes)
+    progress.chunks_processed("upsert", counts, time.perf_counter() - started)
+
+
+def _delete_collection(client: QdrantClient, collection_name: str) -> None:
     try:
         client.delete_collection(collection_name)
         logger.info(f"Deleted collection: {collection_name}")
     except UnexpectedResponse:
-        pass
\ No newline at end of file
+        pass
+
+
+# Point the chatbot's alias at a version (or remove it) in one atomic alias update
+def _switch_alias(client: QdrantClient, chatbot_id: UUID, version: str | None) -> None:
+    alias = get_collection_name(chatbot_id)
+    operations = []
+    if any(description.alias_name == alias for description in client.get_aliases().aliases):
+        operations.append(rest.DeleteAliasOperation(delete_alias=rest.DeleteAlias(alias_name=alias)))
+    elif client.collection_exists(alias):
+        # A pre-versioning index occupies the alias name; this one switch is not atomic
+        _delete_collection(client, alias)
+    if version:
+        operations.append(rest.CreateAliasOperation(
+            create_alias=rest.CreateAlias(collection_name=version, alias_name=alias),
+        ))
+    if operations:
+        client.update_collection_aliases(change_aliases_operations=operations)
+
+
+# Versioned collections per chatbot, from one listing of the cluster
+def _version_collections(client: QdrantClient) -> dict[UUID, list[str]]:
+    versions = {}
+    for collection in client.get_collections().collections:
+        base, sep, _ = collection.name.partition("__")
+        if sep and base.startswith("chatbot_"):
+            versions.setdefault(UUID(base.removeprefix("chatbot_")), []).append(collection.name)
+    return versions
+
+
+# Drop index versions that chat no longer reads, once the version replacing them has been live
+# for the grace period (so queries that resolved the old version can finish).
+# The latest job's version is kept while it is building or can still be resumed.
+def collect_index_versions(grace_seconds: int | None = None) -> int:
+    grace = settings.index_version_grace_seconds if grace_seconds is None else grace_seconds
+    client = get_qdrant_client()
+    deleted = 0
+    db = SessionLocal()
+    try:
+        for chatbot_id, versions in _version_collections(client).items():
+            keep = {get_live_collection(client, chatbot_id)}
+            latest = get_latest_job(chatbot_id, db)
+            if latest and latest.status != "completed":
+                keep.add(get_version_name(chatbot_id, latest.id))
+            # Versions are only replaced when a job completes, so the last completion bounds their retirement
+            last_completed = db.query(IndexingJob.completed_at).filter(
+                IndexingJob.chatbot_id == chatbot_id,
+                IndexingJob.status == "completed",
+            ).order_by(IndexingJob.completed_at.desc()).limit(1).scalar()
+            if last_completed and (datetime.utcnow() - last_completed).total_seconds() < grace:
+                continue
+            for version in versions:
+                if version not in keep:
+                    _delete_collection(client, version)
+                    deleted += 1
+    finally:
+        db.close()
+    return deleted
+
+
+def _document_filter(document_ids: list[UUID], exclude: bool = False) -> rest.Filter:
+    condition = rest.FieldCondition(key=DOC_ID_KEY, match=rest.MatchAny(any=[str(d) for d in document_ids]))
+    return rest.Filter(must_not=[condition]) if exclude else rest.Filter(must=[condition])
+
+
+# Delete points matching a filter, returning how many there were
+def _delete_points(client: QdrantClient, collection_name: str, points_filter: rest.Filter) -> int:
+    count = client.count(collection_name, count_filter=points_filter, exact=True).count
+    if count:
+        client.delete(collection_name, points_selector=rest.FilterSelector(filter=points_filter))
+    return count
+
+
+# Remove a deleted document's chunks from every index version of the chatbots that used it
+# Collections built before versioning store a generated doc_id and are cleaned up by their next reindex
+def delete_document_vectors(document_id: UUID, chatbot_ids: list[UUID], trace_context: dict | None = None) -> int:
+    with tracer.start_as_current_span(
+        "indexing.delete_document",
+        context=extract_trace_context(trace_context),
+        attributes={"document.id": str(document_id), "indexing.chatbots": len(chatbot_ids)},
+    ) as span:
+        client = get_qdrant_client()
+        versions = _version_collections(client)
+        deleted = 0
+        for chatbot_id in chatbot_ids:
+            for version in versions.get(chatbot_id, []):
+                deleted += _delete_points(client, version, _document_filter([document_id]))
+            invalidate_chatbot_caches(chatbot_id)
+        span.set_attribute("indexing.points_deleted", deleted)
+        logger.info(f"Deleted {deleted} points of document {document_id} from {len(chatbot_ids)} chatbots")
+        return deleted
+
+
+# Reconcile Qdrant with the database: drop the collections of chatbots that no longer exist
+# (or have no documents) and points of documents no longer assigned to their chatbot.
+# Only collections listed before the database is read are touched, and chatbots with an indexing
+# job in flight are left to it, so a chatbot or rebuild that starts during the sweep is not affected.
+def sweep_orphaned_vectors() -> int:
+    client = get_qdrant_client()
+    versions = _version_collections(client)
+    if not versions:
+        return 0
+    db = SessionLocal()
+    try:
+        existing = {row.id for row in db.query(Chatbot.id).filter(Chatbot.id.in_(versions))}
+        assigned = {}
+        for row in db.query(chatbot_documents).filter(chatbot_documents.c.chatbot_id.in_(existing)):
+            assigned.setdefault(row.chatbot_id, []).append(row.document_id)
+        building = {job.chatbot_id for job in db.query(IndexingJob).filter(
+            IndexingJob.chatbot_id.in_(existing),
+            IndexingJob.status.in_(("queued", "running")),
+        ) if not is_resumable(job)}
+    finally:
+        db.close()
+
+    deleted = 0
+    for chatbot_id, names in versions.items():
+        if chatbot_id in building:
+            continue
+        if chatbot_id not in assigned:
+            logger.info(f"Removing index of chatbot {chatbot_id}: {'no documents' if chatbot_id in existing else 'deleted'}")
+            if get_live_collection(client, chatbot_id) in names:
+                _switch_alias(client, chatbot_id, None)
+            for name in names:
+                _delete_collection(client, name)
+            invalidate_chatbot_caches(chatbot_id)
+            continue
+        orphans = _document_filter(assigned[chatbot_id], exclude=True)
+        removed = sum(_delete_points(client, name, orphans) for name in names)
+        if removed:
+            logger.info(f"Removed {removed} orphaned points from chatbot {chatbot_id}")
+            invalidate_chatbot_caches(chatbot_id)
+            deleted += removed
+    return deleted
+
+
+# Every worker runs the loop, but a Redis lock lets only one of them run each task at a time.
+# The lock expires after one interval, so a worker that dies mid-run doesn't block the others.
+def _run_periodically(stop: threading.Event, interval: int, task, name: str) -> None:
+    from app.services.cache import get_redis_client  # cache imports this module
+    while not stop.wait(interval):
+        try:
+            lock = get_redis_client().lock(f"lock:{name}", timeout=interval, blocking=False)
+            if not lock.acquire():
+                continue
+            try:
+                task()
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    pass  # expired while the task ran
+        except Exception as e:
+            logger.warning(f"Index maintenance task {name} failed: {e}")
+
+
+# Start the index version collector and orphan sweeper threads; set the returned event to stop them
+def start_index_workers() -> threading.Event:
+    stop = threading.Event()
+    for interval, task, name in (
+        (VERSION_GC_INTERVAL, collect_index_versions, "index-version-gc"),
+        (ORPHAN_SWEEP_INTERVAL, sweep_orphaned_vectors, "index-orphan-sweep"),
+    ):
+        threading.Thread(target=_run_periodically, args=(stop, interval, task, name), name=name, daemon=True).start()
+    return stop
+
+
+# Delete a chatbot's index: its alias and every version
+def delete_chatbot_index(chatbot_id: UUID, trace_context: dict | None = None) -> None:
+    with tracer.start_as_current_span(
+        "indexing.delete_index",
+        context=extract_trace_context(trace_context),
+        attributes={"chatbot.id": str(chatbot_id)},
+    ):
+        client = get_qdrant_client()
+        _switch_alias(client, chatbot_id, None)
+        for version in _version_collections(client).get(chatbot_id, []):
+            _delete_collection(client, version)
+        invalidate_chatbot_caches(chatbot_id)
@@ -0,0 +1,404 @@
+# Indexing progress for Bouldy
+# A running job keeps its per-document and per-chatbot counters in memory, writes them to the
+# indexing_jobs tables at document boundaries (and at most every FLUSH_INTERVAL seconds while
+# batches are embedded), and publishes every write on Redis for live subscribers
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models import Document, IndexingJob, IndexingJobDocument
+from app.schemas import IndexingDocumentProgress, IndexingJobResponse
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("download", "parse", "chunk", "embed", "upsert")
+TERMINAL_STATUSES = ("completed", "failed")
+FLUSH_INTERVAL = 0.5  # seconds between progress writes within a document
+KEEPALIVE_INTERVAL = 15  # seconds between SSE comments on an idle stream
+POLL_INTERVAL = 1.0  # seconds between database reads when Redis is unavailable
+STALE_AFTER = 300  # seconds without a progress write before a running job is presumed dead
+
+JOB_FIELDS = tuple(name for name in IndexingJobResponse.model_fields if name != "documents")
+DOCUMENT_FIELDS = tuple(IndexingDocumentProgress.model_fields)
+COUNTERS = ("pages_parsed", "chunks_total", "chunks_embedded", "chunks_upserted", "bytes_processed")
+
+
+# Redis pub/sub channel carrying a chatbot's indexing progress
+def progress_channel(chatbot_id) -> str:
+    return f"indexing:{chatbot_id}"
+
+
+# Unsaved job with zeroed counters for a chatbot's documents
+def build_indexing_job(chatbot_id: UUID, documents: list) -> IndexingJob:
+    job = IndexingJob(
+        id=uuid4(),
+        chatbot_id=chatbot_id,
+        status="queued",
+        documents_total=len(documents),
+        documents_done=0,
+        documents_failed=0,
+        bytes_total=sum(doc.file_size or 0 for doc in documents),
+        stage_timings="{}",
+        attempts=0,
+        created_at=datetime.utcnow(),
+        **dict.fromkeys(COUNTERS, 0),
+    )
+    job.documents = [
+        IndexingJobDocument(
+            document_id=doc.id, status="pending", bytes_total=doc.file_size or 0, stage_timings="{}",
+            **dict.fromkeys(COUNTERS, 0),
+        )
+        for doc in documents
+    ]
+    return job
+
+
+# Record a queued job; routers create it up front so progress is visible before the task starts
+def create_indexing_job(chatbot_id: UUID, documents: list, db: Session) -> IndexingJob:
+    job = build_indexing_job(chatbot_id, documents)
+    db.add(job)
+    db.commit()
+    return job
+
+
+# Most recent indexing job for a chatbot
+def get_latest_job(chatbot_id: UUID, db: Session) -> IndexingJob | None:
+    return db.query(IndexingJob).filter(
+        IndexingJob.chatbot_id == chatbot_id,
+    ).order_by(IndexingJob.created_at.desc()).first()
+
+
+# A failed job, or a running one that stopped reporting (worker restarted or evicted), can be resumed
+def is_resumable(job: IndexingJob) -> bool:
+    if job.status == "failed":
+        return True
+    if job.status != "running":
+        return False
+    last_seen = job.updated_at or job.started_at or job.created_at
+    return (datetime.utcnow() - last_seen).total_seconds() > STALE_AFTER
+
+
+def _state(row, fields: tuple) -> dict:
+    state = {name: getattr(row, name) for name in fields}
+    state["stage_timings"] = json.loads(state["stage_timings"] or "{}")
+    return state
+
+
+def job_to_response(job: IndexingJob) -> IndexingJobResponse:
+    return IndexingJobResponse(
+        **_state(job, JOB_FIELDS),
+        documents=[IndexingDocumentProgress(**_state(d, DOCUMENT_FIELDS)) for d in job.documents],
+    )
+
+
+class IndexingProgress:
+    """
+    Live progress of one indexing job.
+    Persistence and publishing are best-effort: a database or Redis failure is logged
+    and the job carries on with in-memory counters.
+    """
+
+    def __init__(self, chatbot_id: UUID, documents: list, job_id: UUID | None = None):
+        self.chatbot_id = chatbot_id
+        self._dirty: set[UUID] = set()
+        self._status_changes: dict[UUID, str] = {}
+        self._last_flush = 0.0
+        self.persisted = True
+
+        db = SessionLocal()
+        try:
+            job = db.get(IndexingJob, job_id) if job_id else None
+            if job is None:
+                job = create_indexing_job(chatbot_id, documents, db)
+            self._load(job)
+        except Exception as e:
+            logger.error(f"Failed to load indexing job for chatbot {chatbot_id}: {e}")
+            db.rollback()
+            self.persisted = False
+            self._load(build_indexing_job(chatbot_id, documents))
+        finally:
+            db.close()
+
+    def _load(self, job: IndexingJob) -> None:
+        self.job = _state(job, JOB_FIELDS)
+        self.documents = {d.document_id: _state(d, DOCUMENT_FIELDS) for d in job.documents}
+
+    @property
+    def job_id(self) -> UUID:
+        return self.job["id"]
+
+    def _document(self, document_id: UUID) -> dict:
+        # Documents added to the chatbot after the job was queued are tracked from first sight
+        if document_id not in self.documents:
+            self.documents[document_id] = {
+                "document_id": document_id, "status": "pending", "bytes_total": 0, "stage_timings": {},
+                "error_message": None, **dict.fromkeys(COUNTERS, 0),
+            }
+            self.job["documents_total"] += 1
+        self._dirty.add(document_id)
+        return self.documents[document_id]
+
+    def _add(self, document_id: UUID, **amounts: int) -> None:
+        doc = self._document(document_id)
+        for field, amount in amounts.items():
+            doc[field] += amount
+            self.job[field] += amount
+
+    def _set_status(self, document_id: UUID, status: str, error: str | None = None) -> None:
+        doc = self._document(document_id)
+        doc["status"] = status
+        doc["error_message"] = error
+        self._status_changes[document_id] = status
+        if status in ("ready", "failed"):
+            self.job["documents_done"] += 1
+            if status == "failed":
+                self.job["documents_failed"] += 1
+
+    # Add seconds spent in a stage to a document and to the job
+    def record_stage(self, document_id: UUID, stage: str, seconds: float) -> None:
+        timings = self._document(document_id)["stage_timings"]
+        timings[stage] = round(timings.get(stage, 0.0) + seconds, 4)
+        self.job["stage_timings"][stage] = round(self.job["stage_timings"].get(stage, 0.0) + seconds, 4)
+
+    def start(self) -> None:
+        if self.job["attempts"]:
+            self._resume()
+        self.job["attempts"] += 1
+        self.job["status"] = "running"
+        self.job["started_at"] = self.job["started_at"] or datetime.utcnow()
+        self.job["completed_at"] = None
+        self.job["error_message"] = None
+        self.flush(force=True)
+
+    # Keep ready documents and each unfinished document's upserted chunk count as checkpoints;
+    # everything else is counted again as the documents are re-parsed
+    def _resume(self) -> None:
+        for document_id, doc in self.documents.items():
+            if doc["status"] == "ready":
+                continue
+            doc.update(
+                status="pending", error_message=None, pages_parsed=0, chunks_total=0, bytes_processed=0,
+                chunks_embedded=doc["chunks_upserted"],
+            )
+            self._dirty.add(document_id)
+            self._status_changes[document_id] = "pending"
+        for field in COUNTERS:
+            self.job[field] = sum(doc[field] for doc in self.documents.values())
+        self.job["documents_done"] = sum(doc["status"] == "ready" for doc in self.documents.values())
+        self.job["documents_failed"] = 0
+        logger.info(
+            f"Resuming indexing job {self.job_id} for chatbot {self.chatbot_id}: "
+            f"{self.job['documents_done']}/{self.job['documents_total']} documents already indexed"
+        )
+
+    # Ready documents are skipped entirely
+    def is_ready(self, document_id: UUID) -> bool:
+        doc = self.documents.get(document_id)
+        return doc is not None and doc["status"] == "ready"
+
+    # Chunks of a document already upserted by an earlier run of this job
+    def upserted_chunks(self, document_id: UUID) -> int:
+        doc = self.documents.get(document_id)
+        return doc["chunks_upserted"] if doc else 0
+
+    def document_started(self, document_id: UUID) -> None:
+        self._set_status(document_id, "processing")
+        self.flush(force=True)
+
+    # A document is fully chunked; it is ready once all of its chunks are upserted
+    def document_chunked(self, document_id: UUID, bytes_processed: int, pages: int, chunks: int) -> None:
+        self._add(document_id, bytes_processed=bytes_processed, pages_parsed=pages, chunks_total=chunks)
+        if self.documents[document_id]["chunks_upserted"] >= chunks:
+            self._set_status(document_id, "ready")
+        self.flush(force=True)
+
+    def document_failed(self, document_id: UUID, reason: str) -> None:
+        self._set_status(document_id, "failed", reason)
+        self.flush(force=True)
+
+    # Chunk counts per document for a batch, with the batch's stage time split by share of chunks
+    def chunks_processed(self, stage: str, counts: dict[UUID, int], seconds: float) -> None:
+        field = "chunks_embedded" if stage == "embed" else "chunks_upserted"
+        total = sum(counts.values())
+        became_ready = False
+        for document_id, count in counts.items():
+            self._add(document_id, **{field: count})
+            self.record_stage(document_id, stage, seconds * count / total)
+            doc = self.documents[document_id]
+            if stage == "upsert" and doc["status"] == "processing" and doc["chunks_upserted"] >= doc["chunks_total"]:
+                self._set_status(document_id, "ready")
+                became_ready = True
+        self.flush(force=became_ready)
+
+    def finish(self, error: str | None = None) -> None:
+        if error:
+            self.job["error_message"] = error
+            for document_id, doc in self.documents.items():
+                if doc["status"] in ("pending", "processing"):
+                    self._set_status(document_id, "failed", f"Indexing job failed: {error}")
+        self.job["status"] = "failed" if error else "completed"
+        self.job["completed_at"] = datetime.utcnow()
+        self.flush(force=True)
+
+    def response(self, document_ids=None) -> IndexingJobResponse:
+        ids = self.documents if document_ids is None else document_ids
+        return IndexingJobResponse(
+            **self.job, documents=[IndexingDocumentProgress(**self.documents[i]) for i in ids],
+        )
+
+    # Write changed counters to the database and publish them; throttled unless forced
+    def flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self.job["updated_at"] = datetime.utcnow()
+        dirty, self._dirty = self._dirty, set()
+        status_changes, self._status_changes = self._status_changes, {}
+
+        if self.persisted:
+            self._write(dirty, status_changes)
+        self._publish(self.response(dirty))
+
+    def _write(self, dirty: set[UUID], status_changes: dict[UUID, str]) -> None:
+        db = SessionLocal()
+        try:
+            job = db.get(IndexingJob, self.job_id)
+            for field in JOB_FIELDS:
+                if field not in ("id", "chatbot_id", "created_at"):
+                    setattr(job, field, self.job[field])
+            job.stage_timings = json.dumps(self.job["stage_timings"])
+
+            rows = {row.document_id: row for row in db.query(IndexingJobDocument).filter(
+                IndexingJobDocument.job_id == self.job_id,
+                IndexingJobDocument.document_id.in_(dirty),
+            )} if dirty else {}
+            for document_id in dirty:
+                row = rows.get(document_id)
+                if row is None:
+                    row = IndexingJobDocument(job_id=self.job_id, document_id=document_id)
+                    db.add(row)
+                for field in DOCUMENT_FIELDS:
+                    setattr(row, field, self.documents[document_id][field])
+                row.stage_timings = json.dumps(self.documents[document_id]["stage_timings"])
+
+            # Document.status mirrors the latest job so existing document listings stay accurate
+            if status_changes:
+                for doc in db.query(Document).filter(Document.id.in_(status_changes)):
+                    doc.status = status_changes[doc.id]
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to save indexing progress for chatbot {self.chatbot_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _publish(self, update: IndexingJobResponse) -> None:
+        from app.services.cache import get_redis_client  # cache imports indexing, which imports this module
+        try:
+            get_redis_client().publish(progress_channel(self.chatbot_id), update.model_dump_json())
+        except Exception as e:
+            logger.warning(f"Failed to publish indexing progress for chatbot {self.chatbot_id}: {e}")
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+# Subscribe to a chatbot's progress channel, or None if Redis is unavailable
+# Subscribe before reading the snapshot so no update falls between the two
+async def subscribe_progress(chatbot_id: UUID):
+    from app.services.cache import get_async_redis_client
+    try:
+        pubsub = get_async_redis_client().pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(progress_channel(chatbot_id))
+        return pubsub
+    except Exception as e:
+        logger.warning(f"Indexing progress subscription failed, falling back to polling: {e}")
+        return None
+
+
+# Server-sent events: a full snapshot, then progress updates until the job finishes
+# Updates carry job-level counters and only the documents that changed. A job whose worker died
+# never publishes its end, so once its updated_at has not moved for STALE_AFTER seconds the stream
+# ends with a "stalled" event carrying the job as last saved; it can then be resumed.
+# Async so an open stream waits on the event loop rather than holding a threadpool thread.
+async def stream_progress_events(chatbot_id: UUID, snapshot: IndexingJobResponse, pubsub) -> AsyncIterator[str]:
+    yield _sse("snapshot", snapshot.model_dump_json())
+    if snapshot.status in TERMINAL_STATUSES:
+        if pubsub is not None:
+            await pubsub.aclose()
+        return
+    if pubsub is None:
+        async for event in _poll_progress_events(chatbot_id, snapshot):
+            yield event
+        return
+
+    try:
+        last_sent = last_progress = time.monotonic()
+        updated_at = snapshot.updated_at
+        while True:
+            message = await pubsub.get_message(timeout=1.0)
+            if message:
+                data = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                yield _sse("progress", data)
+                last_sent = last_progress = time.monotonic()
+                if json.loads(data)["status"] in TERMINAL_STATUSES:
+                    return
+            elif time.monotonic() - last_progress > STALE_AFTER:
+                # Nothing published for a while: the job may have been saved without the update reaching us
+                current = await run_in_threadpool(_read_latest_job, chatbot_id)
+                if current is None:
+                    return
+                if current.updated_at == updated_at:
+                    yield _sse("stalled", current.model_dump_json())
+                    return
+                yield _sse("progress", current.model_dump_json())
+                if current.status in TERMINAL_STATUSES:
+                    return
+                updated_at = current.updated_at
+                last_sent = last_progress = time.monotonic()
+            elif time.monotonic() - last_sent > KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        await pubsub.aclose()
+
+
+def _read_latest_job(chatbot_id: UUID) -> IndexingJobResponse | None:
+    db = SessionLocal()
+    try:
+        job = get_latest_job(chatbot_id, db)
+        return job_to_response(job) if job else None
+    finally:
+        db.close()
+
+
+async def _poll_progress_events(chatbot_id: UUID, snapshot: IndexingJobResponse) -> AsyncIterator[str]:
+    last_payload = snapshot.model_dump_json()
+    last_sent = last_progress = time.monotonic()
+    while True:
+        await asyncio.sleep(POLL_INTERVAL)
+        current = await run_in_threadpool(_read_latest_job, chatbot_id)
+        if current is None:
+            return
+        payload = current.model_dump_json()
+        if payload != last_payload:
+            yield _sse("progress", payload)
+            last_payload, last_sent, last_progress = payload, time.monotonic(), time.monotonic()
+            if current.status in TERMINAL_STATUSES:
+                return
+        elif time.monotonic() - last_progress > STALE_AFTER:
+            yield _sse("stalled", payload)
+            return
+        elif time.monotonic() - last_sent > KEEPALIVE_INTERVAL:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
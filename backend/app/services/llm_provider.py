@@ -6,6 +6,9 @@ from llama_index.core.llms import LLM
 from llama_index.llms.openai import OpenAI
 from llama_index.llms.anthropic import Anthropic
 from llama_index.llms.google_genai import GoogleGenAI
+from opentelemetry import trace
+
+from app.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +16,13 @@ DEFAULT_OLLAMA_URL = "http://host.docker.internal:11434"
 
 
 # Get LLM instance based on provider config
+@traced("llm.get")
 def get_llm(provider: str, model: str, api_key: str | None = None) -> LLM:
     if not provider or not model:
         raise ValueError("LLM provider and model must be configured")
 
+    trace.get_current_span().set_attributes({"llm.provider": provider, "llm.model": model})
+
     logger.info(f"Loading LLM: {provider}/{model}")
 
     if provider == "openai":
@@ -0,0 +1,232 @@
+# Write-behind persistence for chat messages
+# Chat handlers buffer messages, session activity and auto-titles here instead of writing them on the
+# response path. A background thread writes everything buffered in one transaction (a multi-row
+# INSERT, batched UPDATEs and one usage upsert per chatbot) every chat_write_interval_seconds, or
+# sooner once chat_write_batch_size messages are waiting. The buffer is drained on shutdown.
+# A flush that fails leaves the buffer in place to be retried; if the database rejects the data
+# itself, the batch is split until the offending rows are found, and only those are dropped.
+# Once chat_write_max_buffer messages are waiting, new ones are written directly instead.
+# Buffered rows are per worker: until they are flushed, only pending_messages() in this worker sees them.
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import (
+    CHAT_WRITE_BUFFER, CHAT_WRITE_DIRECT, CHAT_WRITE_DROPPED, CHAT_WRITE_FLUSH_SECONDS, CHAT_WRITE_FLUSHES,
+)
+from app.models import ChatMessage, ChatSession
+from app.services.usage import add_chatbot_usage
+
+logger = logging.getLogger(__name__)
+
+DRAIN_ATTEMPTS = 5  # flushes tried on shutdown before giving up on what is still buffered
+DRAIN_RETRY_DELAY = 1.0  # seconds between those attempts
+# Errors caused by the rows themselves rather than the database being unavailable; retrying won't help
+_ROW_ERRORS = (IntegrityError, DataError)
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+_messages: list[dict] = []  # chat_messages rows, plus the chatbot_id each counts against
+_touches: dict[UUID, datetime] = {}  # session_id -> latest activity
+_titles: dict[UUID, str] = {}  # session_id -> title for a session still called "New Chat"
+_lock = threading.Lock()  # guards the buffers
+_flush_lock = threading.Lock()  # one flush at a time, so rows are written in order
+_wake = threading.Event()
+
+
+def _row(chatbot_id: UUID, session_id: UUID, role: str, content: str, sources: list | None) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "session_id": session_id,
+        "role": role,
+        "content": content,
+        "sources": json.dumps(sources) if sources else None,
+        "created_at": datetime.utcnow(),
+        "chatbot_id": chatbot_id,
+    }
+
+
+# Buffer a message; it counts towards the chatbot's usage once written.
+# Returns False, buffering nothing, when the buffer is full; the caller then uses write_message().
+def enqueue_message(chatbot_id: UUID, session_id: UUID, role: str, content: str, sources: list | None) -> bool:
+    row = _row(chatbot_id, session_id, role, content, sources)
+    with _lock:
+        if len(_messages) >= settings.chat_write_max_buffer:
+            depth = None
+        else:
+            _messages.append(row)
+            _touches[session_id] = row["created_at"]
+            depth = len(_messages)
+    if depth is None:
+        _wake.set()
+        return False
+    CHAT_WRITE_BUFFER.set(depth)
+    if depth >= settings.chat_write_batch_size:
+        _wake.set()
+    return True
+
+
+# Write one message straight away, for when the buffer is full. Blocks; raises if the write fails.
+def write_message(chatbot_id: UUID, session_id: UUID, role: str, content: str, sources: list | None) -> None:
+    row = _row(chatbot_id, session_id, role, content, sources)
+    CHAT_WRITE_DIRECT.inc()
+    _write([row], {session_id: row["created_at"]}, {})
+
+
+# Title a session from its first message, unless it has been named in the meantime
+def set_title(session_id: UUID, title: str) -> None:
+    with _lock:
+        _titles.setdefault(session_id, title)
+
+
+# Messages for a session that are buffered but not written yet, oldest first
+def pending_messages(session_id: UUID) -> list[dict]:
+    with _lock:
+        return [dict(m) for m in _messages if m["session_id"] == session_id]
+
+
+# Whether anything for this chatbot (or just this session of it) is waiting to be written
+def has_pending(chatbot_id: UUID, session_id: UUID | None = None) -> bool:
+    with _lock:
+        if session_id is not None and session_id in _titles:
+            return True
+        return any(
+            m["chatbot_id"] == chatbot_id and session_id in (None, m["session_id"]) for m in _messages
+        )
+
+
+def _write(messages: list[dict], touches: dict, titles: dict) -> int:
+    db = SessionLocal()
+    try:
+        # Sessions deleted since their messages were buffered are skipped rather than failing the batch
+        session_ids = {m["session_id"] for m in messages} | set(touches) | set(titles)
+        live = set(db.scalars(select(ChatSession.id).where(ChatSession.id.in_(session_ids))))
+        rows = [m for m in messages if m["session_id"] in live]
+        if len(rows) < len(messages):
+            logger.info(f"Dropped {len(messages) - len(rows)} buffered messages of deleted sessions")
+
+        # Rows committed by an earlier attempt that failed later are skipped, and not counted again
+        inserted = set()
+        if rows:
+            insert = _INSERTS[db.get_bind().dialect.name](ChatMessage)
+            inserted = set(db.scalars(
+                insert.on_conflict_do_nothing(index_elements=["id"]).returning(ChatMessage.id),
+                [{k: v for k, v in m.items() if k != "chatbot_id"} for m in rows],
+            ))
+            for chatbot_id, count in Counter(m["chatbot_id"] for m in rows if m["id"] in inserted).items():
+                add_chatbot_usage(db, chatbot_id, messages=count)
+
+        sessions = ChatSession.__table__
+        touched = [{"sid": sid, "ts": ts} for sid, ts in touches.items() if sid in live]
+        if touched:
+            db.execute(update(sessions).where(sessions.c.id == bindparam("sid")).values(
+                updated_at=bindparam("ts"),
+            ), touched)
+        titled = [{"sid": sid, "new_title": title} for sid, title in titles.items() if sid in live]
+        if titled:
+            db.execute(update(sessions).where(
+                sessions.c.id == bindparam("sid"), sessions.c.title == "New Chat",
+            ).values(title=bindparam("new_title")), titled)
+
+        db.commit()
+        return len(inserted)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# Write a batch, splitting it in half whenever the database rejects the rows themselves, so one bad
+# row can't hold back the rest. Rows rejected on their own are logged and dropped. Other errors
+# propagate and the whole batch is retried; rows already committed by then are skipped by the insert.
+def _write_isolating(messages: list[dict], touches: dict, titles: dict) -> int:
+    try:
+        return _write(messages, touches, titles)
+    except _ROW_ERRORS as e:
+        if not (touches or titles) and len(messages) <= 1:
+            for m in messages:
+                CHAT_WRITE_DROPPED.inc()
+                logger.error(f"Dropped chat message {m['id']} for session {m['session_id']}: {e}")
+            return 0
+    half = len(messages) // 2
+    written = 0
+    for part in (messages[:half], messages[half:]):
+        if part:
+            written += _write_isolating(part, {}, {})
+    if touches or titles:
+        try:
+            _write([], touches, titles)
+        except _ROW_ERRORS as e:
+            logger.error(f"Dropped activity and title updates for {len(touches | titles)} chat sessions: {e}")
+    return written
+
+
+# Write everything buffered so far; returns the number of messages written.
+# Rows stay in the buffer (and visible to pending_messages) until their transaction commits.
+def flush() -> int:
+    with _flush_lock:
+        with _lock:
+            messages, touches, titles = list(_messages), dict(_touches), dict(_titles)
+        if not (messages or touches or titles):
+            return 0
+
+        started = time.perf_counter()
+        try:
+            written = _write_isolating(messages, touches, titles)
+        except Exception as e:
+            CHAT_WRITE_FLUSHES.labels("error").inc()
+            logger.warning(f"Chat message flush failed, will retry: {e}")
+            return 0
+        CHAT_WRITE_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        CHAT_WRITE_FLUSHES.labels("ok").inc()
+
+        with _lock:
+            del _messages[:len(messages)]
+            for sid, ts in touches.items():
+                if _touches.get(sid) == ts:
+                    del _touches[sid]
+            for sid in titles:
+                _titles.pop(sid, None)
+            CHAT_WRITE_BUFFER.set(len(_messages))
+        return written
+
+
+def _flush_periodically(stop: threading.Event) -> None:
+    while not stop.is_set():
+        _wake.wait(settings.chat_write_interval_seconds)
+        _wake.clear()
+        flush()
+
+
+# Flush until nothing is buffered, retrying failed writes; returns False, after logging an error,
+# if messages are still unwritten after DRAIN_ATTEMPTS flushes
+def drain() -> bool:
+    for attempt in range(DRAIN_ATTEMPTS):
+        if attempt:
+            time.sleep(DRAIN_RETRY_DELAY)
+        flush()
+        with _lock:
+            left = len(_messages)
+            if not (_messages or _touches or _titles):
+                return True
+    logger.error(f"Chat message writer gave up after {DRAIN_ATTEMPTS} attempts; {left} messages were not saved")
+    return False
+
+
+# Start the flush thread; set the returned event to stop it, then call drain()
+# so nothing buffered is lost on shutdown
+def start_message_writer() -> threading.Event:
+    stop = threading.Event()
+    threading.Thread(target=_flush_periodically, args=(stop,), name="message-writer", daemon=True).start()
+    return stop
@@ -0,0 +1,64 @@
+# Password hashing for Bouldy
+# bcrypt is slow on purpose, so it runs on a small dedicated executor instead of the event loop or
+# the shared threadpool: a burst of logins queues here rather than starving chat streams of workers.
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from app.config import settings
+from app.metrics import PASSWORD_HASH_QUEUE
+
+_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+class HashQueueFull(Exception):
+    """More password hashes are waiting than settings.password_hash_max_pending allows."""
+
+
+# bcrypt only uses the first 72 bytes
+def _encode(password: str) -> bytes:
+    return password.encode("utf-8")[:72]
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode("utf-8")
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(_encode(password), hashed.encode("utf-8"))
+
+
+# True when a stored hash ("$2b$<cost>$...") was made with a different cost than configured
+def needs_rehash(hashed: str) -> bool:
+    try:
+        return int(hashed.split("$")[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return True
+
+
+async def _run(fn, *args):
+    global _pending
+    with _pending_lock:
+        if settings.password_hash_max_pending and _pending >= settings.password_hash_max_pending:
+            raise HashQueueFull()
+        _pending += 1
+        PASSWORD_HASH_QUEUE.set(_pending)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+            PASSWORD_HASH_QUEUE.set(_pending)
+
+
+# Async versions for request handlers; raise HashQueueFull when the queue is saturated
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _run(verify_password, password, hashed)
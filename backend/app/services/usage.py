@@ -0,0 +1,131 @@
+# Usage counters for Bouldy
+# Session, message, document and storage totals are kept in chatbot_usage and user_usage rows,
+# incremented in the same transaction as the rows they count so dashboard reads are key lookups.
+# reconcile_usage recomputes them from the raw tables to repair any drift.
+import logging
+import threading
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Chatbot, ChatbotUsage, ChatMessage, ChatSession, Document, User, UserUsage
+
+logger = logging.getLogger(__name__)
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+# Add deltas to a counter row, creating it if it does not exist yet
+def _increment(db: Session, model, key: str, key_value, **deltas: int) -> None:
+    deltas = {column: amount for column, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    table = model.__table__
+    insert = _INSERTS[db.get_bind().dialect.name](table).values({key: key_value, **deltas})
+    db.execute(insert.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: table.c[column] + amount for column, amount in deltas.items()},
+    ))
+
+
+# Count sessions and messages created (positive) or deleted (negative) for a chatbot
+def add_chatbot_usage(db: Session, chatbot_id, sessions: int = 0, messages: int = 0) -> None:
+    _increment(db, ChatbotUsage, "chatbot_id", chatbot_id, sessions=sessions, messages=messages)
+
+
+# Count documents and storage bytes uploaded (positive) or deleted (negative) for a user
+def add_user_usage(db: Session, user_id, documents: int = 0, storage_bytes: int = 0) -> None:
+    _increment(db, UserUsage, "user_id", user_id, documents=documents, storage_bytes=storage_bytes)
+
+
+# Live counts as scalar subqueries, for recounting a chatbot or user counter row in one statement
+def _chatbot_counts(chatbot_id) -> dict:
+    return {
+        "sessions": select(func.count()).where(ChatSession.chatbot_id == chatbot_id).scalar_subquery(),
+        "messages": select(func.count(ChatMessage.id)).join(
+            ChatSession, ChatSession.id == ChatMessage.session_id,
+        ).where(ChatSession.chatbot_id == chatbot_id).scalar_subquery(),
+    }
+
+
+def _user_counts(user_id) -> dict:
+    return {
+        "documents": select(func.count()).where(Document.user_id == user_id).scalar_subquery(),
+        "storage_bytes": select(func.coalesce(func.sum(Document.file_size), 0)).where(
+            Document.user_id == user_id,
+        ).scalar_subquery(),
+    }
+
+
+# Recompute every counter from the raw tables and fix rows that drifted; returns rows corrected.
+# Drift is found with grouped scans; each fix is a single UPDATE that recounts in the statement,
+# so increments committed while the scan ran are not lost.
+def reconcile_usage(db: Session) -> int:
+    sessions = dict(db.execute(
+        select(ChatSession.chatbot_id, func.count()).group_by(ChatSession.chatbot_id)
+    ).all())
+    messages = dict(db.execute(
+        select(ChatSession.chatbot_id, func.count(ChatMessage.id))
+        .join(ChatMessage, ChatMessage.session_id == ChatSession.id)
+        .group_by(ChatSession.chatbot_id)
+    ).all())
+    documents = {row.user_id: (row.documents, row.storage_bytes or 0) for row in db.execute(
+        select(Document.user_id, func.count().label("documents"), func.sum(Document.file_size).label("storage_bytes"))
+        .group_by(Document.user_id)
+    )}
+    chatbot_rows = {row.chatbot_id: (row.sessions, row.messages) for row in db.scalars(select(ChatbotUsage))}
+    user_rows = {row.user_id: (row.documents, row.storage_bytes) for row in db.scalars(select(UserUsage))}
+
+    corrected = 0
+    for chatbot_id in db.scalars(select(Chatbot.id)):
+        if chatbot_rows.get(chatbot_id) != (sessions.get(chatbot_id, 0), messages.get(chatbot_id, 0)):
+            _recount(db, ChatbotUsage, ChatbotUsage.chatbot_id, chatbot_id, _chatbot_counts(chatbot_id))
+            corrected += 1
+    for user_id in db.scalars(select(User.id)):
+        if user_rows.get(user_id) != documents.get(user_id, (0, 0)):
+            _recount(db, UserUsage, UserUsage.user_id, user_id, _user_counts(user_id))
+            corrected += 1
+
+    db.commit()
+    if corrected:
+        logger.warning(f"Usage reconciliation corrected {corrected} counter rows")
+    return corrected
+
+
+def _recount(db: Session, model, key_column, key_value, counts: dict) -> None:
+    insert = _INSERTS[db.get_bind().dialect.name](model.__table__).values({key_column.key: key_value})
+    db.execute(insert.on_conflict_do_nothing(index_elements=[key_column.key]))
+    db.execute(update(model).where(key_column == key_value).values(counts))
+
+
+# Background loop that reconciles counters; settings.usage_reconcile_interval_seconds = 0 disables it
+def _reconcile_periodically(stop: threading.Event) -> None:
+    while not stop.wait(settings.usage_reconcile_interval_seconds):
+        db = SessionLocal()
+        try:
+            reconcile_usage(db)
+        except Exception as e:
+            logger.warning(f"Usage reconciliation failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+# Start the reconciliation thread; set the returned event to stop it
+def start_usage_workers() -> threading.Event:
+    stop = threading.Event()
+    if settings.usage_reconcile_interval_seconds > 0:
+        threading.Thread(target=_reconcile_periodically, args=(stop,), name="usage-reconcile", daemon=True).start()
+    return stop
+
+
+# Run once from cron or by hand: python -m app.services.usage
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        print(f"Corrected {reconcile_usage(session)} counter rows")
+    finally:
+        session.close()
@@ -0,0 +1,153 @@
+# Short-TTL cache of authenticated users for Bouldy
+# get_current_user runs on every authenticated request; reusing the resolved user for a few seconds
+# takes the users SELECT off the hot path. Entries live in a per-worker LRU, optionally backed by
+# Redis so workers share fills. Deleting a user invalidates it here, in Redis and in other workers.
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app.config import settings
+from app.metrics import USER_CACHE_LOOKUPS
+from app.models import User
+from app.services.cache import get_async_redis_client, get_redis_client, register_invalidation_handler
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MAX_ENTRIES = 10_000
+INVALIDATION_CHANNEL = "users:invalidate"
+
+_local: OrderedDict[UUID, tuple[float, dict]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def user_key(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+# The cached fields; password_hash is never cached, so reading it off a cached user fails loudly
+def _snapshot(user: User) -> dict:
+    return {"id": str(user.id), "email": user.email, "name": user.name,
+            "created_at": user.created_at.isoformat() if user.created_at else None}
+
+
+# Rebuild a detached User from a snapshot; it can be merged into a session but never re-inserted
+def _to_user(fields: dict) -> User:
+    user = User(
+        id=UUID(fields["id"]), email=fields["email"], name=fields["name"],
+        created_at=datetime.fromisoformat(fields["created_at"]) if fields["created_at"] else None,
+    )
+    make_transient_to_detached(user)
+    return user
+
+
+def _local_get(user_id: UUID) -> dict | None:
+    with _lock:
+        entry = _local.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _local[user_id]
+            return None
+        _local.move_to_end(user_id)
+        return entry[1]
+
+
+def _local_set(user_id: UUID, fields: dict) -> None:
+    with _lock:
+        _local[user_id] = (time.monotonic() + settings.user_cache_ttl_seconds, fields)
+        _local.move_to_end(user_id)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+# Cached user for an ID, or None on a miss (including when the cache is disabled)
+async def get_cached_user(user_id: UUID) -> User | None:
+    if settings.user_cache_ttl_seconds <= 0:
+        return None
+    fields = _local_get(user_id)
+    if fields is not None:
+        USER_CACHE_LOOKUPS.labels("local").inc()
+        return _to_user(fields)
+    if settings.user_cache_redis:
+        try:
+            raw = await get_async_redis_client().get(user_key(user_id))
+            if raw:
+                fields = json.loads(raw)
+                _local_set(user_id, fields)
+                USER_CACHE_LOOKUPS.labels("redis").inc()
+                return _to_user(fields)
+        except Exception as e:
+            logger.warning(f"User cache lookup failed: {e}")
+    USER_CACHE_LOOKUPS.labels("miss").inc()
+    return None
+
+
+# Remember a user just loaded from the database
+async def cache_user(user: User) -> None:
+    if settings.user_cache_ttl_seconds <= 0:
+        return
+    fields = _snapshot(user)
+    _local_set(user.id, fields)
+    if settings.user_cache_redis:
+        try:
+            await get_async_redis_client().setex(user_key(user.id), settings.user_cache_ttl_seconds, json.dumps(fields))
+        except Exception as e:
+            logger.warning(f"User cache store failed: {e}")
+
+
+# Drop a user from this worker, Redis and (through pub/sub) every other worker
+def invalidate_user(user_id: UUID) -> None:
+    with _lock:
+        _local.pop(user_id, None)
+    if not settings.user_cache_redis:
+        return
+    try:
+        r = get_redis_client()
+        r.delete(user_key(user_id))
+        r.publish(INVALIDATION_CHANNEL, str(user_id))
+    except Exception as e:
+        logger.warning(f"User cache invalidation failed: {e}")
+
+
+def _apply_invalidation(data: bytes) -> None:
+    with _lock:
+        _local.pop(UUID(data.decode()), None)
+
+
+def clear_local() -> None:
+    with _lock:
+        _local.clear()
+
+
+register_invalidation_handler(INVALIDATION_CHANNEL, _apply_invalidation, clear_local)
+
+
+# Any ORM delete of a user invalidates it once the deleting transaction commits; invalidating during
+# the flush would let a concurrent request re-cache the user before the row is gone, and would drop
+# entries for deletes that are rolled back. Bulk DELETE statements bypass this and rely on the TTL.
+DELETED_USERS_KEY = "user_cache_deleted_ids"
+
+
+@event.listens_for(User, "after_delete")
+def _on_user_deleted(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(DELETED_USERS_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_deleted_users(session: Session) -> None:
+    for user_id in session.info.pop(DELETED_USERS_KEY, ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_deleted_users(session: Session) -> None:
+    session.info.pop(DELETED_USERS_KEY, None)
@@ -4,6 +4,7 @@ import logging
 import boto3
 from botocore.exceptions import ClientError
 from app.config import settings
+from app.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -29,15 +30,18 @@ def ensure_bucket_exists():
 
 # Upload file to S3
 def upload_file(file_content: bytes, s3_key: str, content_type: str) -> str:
-    s3 = get_s3_client()
-    ensure_bucket_exists()
+    with tracer.start_as_current_span("s3.put_object", attributes={
+        "s3.bucket": settings.minio_bucket, "s3.key": s3_key, "s3.bytes": len(file_content),
+    }):
+        s3 = get_s3_client()
+        ensure_bucket_exists()
 
-    s3.put_object(
-        Bucket=settings.minio_bucket,
-        Key=s3_key,
-        Body=file_content,
-        ContentType=content_type,
-    )
+        s3.put_object(
+            Bucket=settings.minio_bucket,
+            Key=s3_key,
+            Body=file_content,
+            ContentType=content_type,
+        )
 
     logger.info(f"S3 upload: {s3_key} ({len(file_content)} bytes)")
     return s3_key
@@ -45,20 +49,28 @@ def upload_file(file_content: bytes, s3_key: str, content_type: str) -> str:
 
 # Delete file from S3
 def delete_file(s3_key: str):
-    s3 = get_s3_client()
-    try:
-        s3.delete_object(Bucket=settings.minio_bucket, Key=s3_key)
-        logger.info(f"S3 delete: {s3_key}")
-    except Exception as e:
-        logger.error(f"S3 delete failed: {s3_key} — {e}")
+    with tracer.start_as_current_span("s3.delete_object", attributes={
+        "s3.bucket": settings.minio_bucket, "s3.key": s3_key,
+    }):
+        s3 = get_s3_client()
+        try:
+            s3.delete_object(Bucket=settings.minio_bucket, Key=s3_key)
+            logger.info(f"S3 delete: {s3_key}")
+        except Exception as e:
+            logger.error(f"S3 delete failed: {s3_key} — {e}")
 
 
 # Get file from S3
 def get_file(s3_key: str) -> bytes:
-    s3 = get_s3_client()
-    try:
-        response = s3.get_object(Bucket=settings.minio_bucket, Key=s3_key)
-        return response["Body"].read()
-    except Exception as e:
-        logger.error(f"S3 get failed: {s3_key} — {e}")
-        raise
\ No newline at end of file
+    with tracer.start_as_current_span("s3.get_object", attributes={
+        "s3.bucket": settings.minio_bucket, "s3.key": s3_key,
+    }) as span:
+        s3 = get_s3_client()
+        try:
+            response = s3.get_object(Bucket=settings.minio_bucket, Key=s3_key)
+            content = response["Body"].read()
+        except Exception as e:
+            logger.error(f"S3 get failed: {s3_key} — {e}")
+            raise
+        span.set_attribute("s3.bytes", len(content))
+        return content
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+OpenTelemetry tracing for Bouldy.
+Spans cover the API, SQLAlchemy, Qdrant, Redis cache, S3 and LLM calls of a request.
+Set TRACING_EXPORTER to "otlp" (local collector), "file" (JSON lines) or "console";
+when unset, no provider is installed and every span is a no-op.
+"""
+import functools
+import logging
+from contextlib import contextmanager
+
+from opentelemetry import propagate, trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import Status, StatusCode
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("bouldy")
+
+
+def _file_exporter(path: str) -> SpanExporter:
+    """One JSON object per line, so traces can be loaded offline with any JSON tool."""
+    out = open(path, "a", buffering=1)
+    return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+
+def build_tracer_provider(exporter: str) -> TracerProvider:
+    """Create a tracer provider exporting through the given exporter name."""
+    provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": settings.tracing_service_name,
+            "deployment.environment": settings.environment,
+        }),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+    )
+
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    elif exporter == "file":
+        span_exporter = _file_exporter(settings.tracing_file)
+    elif exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unsupported tracing exporter: {exporter}")
+
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    return provider
+
+
+def setup_tracing(*engines) -> None:
+    """Install the global tracer provider and instrument the given SQLAlchemy engines, if tracing is enabled.
+
+    Async engines are instrumented through their sync_engine.
+    """
+    if not settings.tracing_exporter:
+        return
+
+    trace.set_tracer_provider(build_tracer_provider(settings.tracing_exporter))
+
+    if engines:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+        SQLAlchemyInstrumentor().instrument(engines=list(engines))
+
+    logger.info(f"Tracing enabled ({settings.tracing_exporter})")
+
+
+def traced(name: str):
+    """Decorator running the wrapped function inside a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inject_trace_context() -> dict:
+    """Serialize the current trace context so work outside this request can join the trace."""
+    carrier: dict = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+def extract_trace_context(carrier: dict | None) -> Context | None:
+    """Rebuild a context captured with inject_trace_context."""
+    return propagate.extract(carrier) if carrier else None
+
+
+@contextmanager
+def detached_span(name: str, parent: Context, attributes: dict | None = None):
+    """
+    Span for code that is resumed across threads, like a streaming response generator.
+    It is parented explicitly and never made current, since context attached in one
+    resumption can't be detached in another. Wrap yield-free sections in trace.use_span
+    to parent child spans under it.
+    """
+    span = tracer.start_span(name, context=parent, attributes=attributes)
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR, str(e)))
+        raise
+    finally:
+        span.end()
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request, named by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Continue a trace started by the caller (frontend, load balancer) if any
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+        with tracer.start_as_current_span(
+            f"{scope['method']} unmatched",
+            context=propagate.extract(headers),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Streamed bodies are included, so the span covers the full response.
+                # Named by template (/api/chat/{chatbot_id}), never the raw path
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{scope['method']} {route}")
+                    span.set_attribute("http.route", route)
@@ -0,0 +1,6 @@
+"""
+Benchmarks for Bouldy.
+Run from backend/ as modules, e.g. `python -m benchmarks.load_test --help`.
+External services are replaced by the deterministic fakes in benchmarks.fakes,
+so results are reproducible on a laptop or a CI runner.
+"""
@@ -0,0 +1,266 @@
+"""
+Microbenchmarks for semantic-cache lookup as the number of entries grows.
+
+For each cache size N the suite populates one chatbot's cache with N entries, then
+times three lookup scenarios:
+- exact: the query was cached verbatim
+- semantic: the cached words in a different order, so only the semantic tier can match
+- miss: a query with no similar entry, which is the worst case for a scan
+
+Per scenario it reports latency percentiles, Redis round trips and CPU time per lookup.
+Redis is fakeredis unless --redis-url points at a real server (recommended for absolute numbers).
+
+    python -m benchmarks.cache --sizes 1,100,10000,100000 --json cache.json
+
+Implementations are pluggable: subclass CacheImplementation and pass
+`--impl package.module:ClassName`. Round trips are counted for any Redis client
+obtained through app.services.cache.get_redis_client.
+"""
+import argparse
+import importlib
+import logging
+import random
+import time
+from unittest.mock import patch
+from uuid import uuid4
+
+from benchmarks.common import ResourceMonitor, latency_summary, write_results
+from benchmarks.corpus import make_questions
+from benchmarks.fakes import FakeEmbedding, install_fakes, make_redis_factory
+
+SCENARIOS = ("exact", "semantic", "miss")
+POPULATE_BATCH = 1000
+
+
+class CacheImplementation:
+    """A cache under test. Subclasses must keep the get_cached_response contract."""
+
+    name = "base"
+
+    # use_local_tier asks for any in-process tier to be kept; without it every lookup reaches the shared store
+    def __init__(self, use_local_tier: bool = False):
+        self.use_local_tier = use_local_tier
+
+    # Bulk-load entries of (query, response, sources) for one chatbot generation
+    def populate(self, chatbot_id: str, generation: int, entries: list[tuple[str, str, list]]) -> None:
+        raise NotImplementedError
+
+    # Same contract as app.services.cache.get_cached_response
+    def lookup(self, chatbot_id: str, query: str, generation: int) -> dict | None:
+        raise NotImplementedError
+
+    # Drop everything stored for the chatbot
+    def clear(self, chatbot_id: str) -> None:
+        raise NotImplementedError
+
+    # Undo any process-wide setup
+    def close(self) -> None:
+        pass
+
+
+class RedisSemanticCache(CacheImplementation):
+    """The production cache in app.services.cache, with the in-process tier disabled by default."""
+
+    name = "redis"
+
+    def __init__(self, use_local_tier: bool = False):
+        super().__init__(use_local_tier)
+        from app.services import cache
+        self.cache = cache
+        # A zero-byte budget makes every local store a no-op, so lookups always reach Redis
+        self._local = None if use_local_tier else patch.object(cache, "local_cache", cache.LocalCache(0, 0))
+        if self._local:
+            self._local.start()
+
+    def populate(self, chatbot_id, generation, entries):
+        r = self.cache.get_redis_client()
+        for start in range(0, len(entries), POPULATE_BATCH):
+            pipe = r.pipeline(transaction=False)
+            for query, response, sources in entries[start:start + POPULATE_BATCH]:
+                entry = self.cache.encode_entry(query, self.cache.get_query_embedding(query), response, sources)
+                pipe.setex(self.cache.cache_key(chatbot_id, generation, query), self.cache.CACHE_TTL, entry)
+            pipe.execute()
+
+    def lookup(self, chatbot_id, query, generation):
+        return self.cache.get_cached_response(chatbot_id, query, generation)
+
+    def clear(self, chatbot_id):
+        r = self.cache.get_redis_client()
+        keys = list(r.scan_iter(match=f"{self.cache.cache_prefix(chatbot_id)}:*", count=POPULATE_BATCH))
+        for start in range(0, len(keys), POPULATE_BATCH):
+            r.delete(*keys[start:start + POPULATE_BATCH])
+        self.cache.local_cache.clear()
+
+    def close(self):
+        if self._local:
+            self._local.stop()
+
+
+IMPLEMENTATIONS = {"redis": RedisSemanticCache}
+
+
+class RoundTripCounter:
+    """Redis client factory that counts commands; a pipeline execute counts as one round trip."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.count = 0
+
+    def __call__(self):
+        client = self.factory()
+        execute_command = client.execute_command
+        pipeline = client.pipeline
+
+        def counted_command(*args, **kwargs):
+            self.count += 1
+            return execute_command(*args, **kwargs)
+
+        def counted_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            def counted_execute(*exec_args, **exec_kwargs):
+                self.count += 1
+                return execute(*exec_args, **exec_kwargs)
+
+            pipe.execute = counted_execute
+            return pipe
+
+        client.execute_command = counted_command
+        client.pipeline = counted_pipeline
+        return client
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,100,1000,10000", help="comma-separated cache sizes, in entries")
+    parser.add_argument("--lookups", type=int, default=50, help="lookups per scenario and size")
+    parser.add_argument("--time-budget", type=float, default=30.0,
+                        help="stop a scenario after this many seconds (at least 3 lookups still run)")
+    parser.add_argument("--impl", default="redis", help="registered name or package.module:ClassName")
+    parser.add_argument("--local-tier", action="store_true", help="keep the in-process tier enabled")
+    parser.add_argument("--response-chars", type=int, default=1500, help="size of each cached answer")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--redis-url", default=None, help="defaults to fakeredis")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def load_implementation(spec: str) -> type[CacheImplementation]:
+    if spec in IMPLEMENTATIONS:
+        return IMPLEMENTATIONS[spec]
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise SystemExit(f"Unknown implementation: {spec}")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+# N distinct questions with canned answers
+def make_entries(rng: random.Random, count: int, response_chars: int) -> list[tuple[str, str, list]]:
+    seen, entries = set(), []
+    while len(entries) < count:
+        for query in make_questions(rng, count - len(entries)):
+            if query.casefold() in seen:
+                continue
+            seen.add(query.casefold())
+            response = (query + " ") * (response_chars // len(query) + 1)
+            sources = [{"document_id": str(uuid4()), "filename": "doc.txt", "page": None, "score": 0.9}]
+            entries.append((query, response[:response_chars], sources))
+    return entries
+
+
+# Lookup queries for a scenario, drawn from the cached entries where needed
+def scenario_queries(rng: random.Random, scenario: str, entries: list, count: int) -> list[str]:
+    if scenario == "exact":
+        return [rng.choice(entries)[0] for _ in range(count)]
+    if scenario == "semantic":
+        queries = []
+        for _ in range(count):
+            words = rng.choice(entries)[0].split()
+            rng.shuffle(words)
+            queries.append(" ".join(words))
+        return queries
+    # Words outside the corpus vocabulary never resemble a cached question
+    return [f"zyx{rng.randrange(10**9)} qwv{rng.randrange(10**9)} unrelated question" for _ in range(count)]
+
+
+def run_scenario(
+    impl: CacheImplementation, counter: RoundTripCounter, chatbot_id: str, queries: list[str], time_budget: float,
+) -> dict:
+    latencies, hits = [], 0
+    counter.count = 0
+    deadline = time.perf_counter() + time_budget
+    with ResourceMonitor() as monitor:
+        for query in queries:
+            started = time.perf_counter()
+            if impl.lookup(chatbot_id, query, 0):
+                hits += 1
+            latencies.append(time.perf_counter() - started)
+            if len(latencies) >= 3 and time.perf_counter() > deadline:
+                break
+    lookups = len(latencies)
+    return {
+        "lookups": lookups,
+        "hit_rate": round(hits / lookups, 3),
+        "latency": latency_summary(latencies),
+        "round_trips_per_lookup": round(counter.count / lookups, 2),
+        "cpu_ms_per_lookup": round(monitor.result["cpu_s"] * 1000 / lookups, 3),
+        "resources": monitor.result,
+    }
+
+
+def print_report(name: str, rows: list[dict]) -> None:
+    header = f"{'entries':>8} {'scenario':<9} {'hit':>5} {'p50':>10} {'p95':>10} {'p99':>10} {'rt/op':>8} {'cpu/op':>10}"
+    print(f"implementation: {name}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        for scenario, result in row["scenarios"].items():
+            lat = result["latency"]
+            print(
+                f"{row['entries']:>8} {scenario:<9} {result['hit_rate']:>5.2f} {lat['p50_ms']:>8.3f}ms "
+                f"{lat['p95_ms']:>8.3f}ms {lat['p99_ms']:>8.3f}ms {result['round_trips_per_lookup']:>8.1f} "
+                f"{result['cpu_ms_per_lookup']:>8.3f}ms"
+            )
+
+
+def main(argv=None) -> list[dict]:
+    args = parse_args(argv)
+    sizes = [int(n) for n in args.sizes.split(",") if n.strip()]
+    impl_cls = load_implementation(args.impl)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    counter = RoundTripCounter(make_redis_factory(args.redis_url))
+    rng = random.Random(args.seed)
+    rows = []
+    with install_fakes(embed_model=FakeEmbedding(), redis_factory=counter):
+        impl = impl_cls(use_local_tier=args.local_tier)
+        for size in sizes:
+            chatbot_id = str(uuid4())
+            entries = make_entries(rng, size, args.response_chars)
+            with ResourceMonitor() as monitor:
+                impl.populate(chatbot_id, 0, entries)
+            rows.append({
+                "entries": size,
+                "populate": monitor.result,
+                "scenarios": {
+                    scenario: run_scenario(
+                        impl, counter, chatbot_id, scenario_queries(rng, scenario, entries, args.lookups),
+                        args.time_budget,
+                    )
+                    for scenario in SCENARIOS
+                },
+            })
+            impl.clear(chatbot_id)
+        impl.close()
+
+    print_report(impl_cls.name, rows)
+    if args.json_path:
+        params = {k: v for k, v in vars(args).items() if k not in ("json_path", "redis_url")}
+        write_results(args.json_path, "cache", {**params, "implementation": impl_cls.name}, rows)
+        print(f"Results written to {args.json_path}")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Shared measurement and reporting helpers for the benchmark suites.
+Results are written as JSON tagged with the git commit, so runs can be diffed across commits.
+"""
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+# Count, mean and tail percentiles of a list of durations, in milliseconds
+def latency_summary(seconds: list[float]) -> dict:
+    values = sorted(s * 1000 for s in seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p90_ms": round(percentile(values, 90), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+# Current resident set size in MB (falls back to the lifetime peak off Linux)
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1024 / 1024
+    except OSError:
+        return peak_rss_mb()
+
+
+# Lifetime peak RSS of this process in MB
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class ResourceMonitor:
+    """
+    Measures wall time, process CPU time and peak RSS over a block.
+    RSS is sampled on a background thread, so the peak is per block
+    rather than the process lifetime high-water mark.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.result: dict = {}
+        self._stop = threading.Event()
+        self._peak_rss = 0.0
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak_rss = max(self._peak_rss, current_rss_mb())
+
+    def __enter__(self):
+        self._start_rss = current_rss_mb()
+        self._peak_rss = self._start_rss
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self._stop.set()
+        self._thread.join()
+        self._peak_rss = max(self._peak_rss, current_rss_mb())
+        self.result = {
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "cpu_utilization": round(cpu / wall, 3) if wall else 0.0,
+            "rss_start_mb": round(self._start_rss, 1),
+            "rss_peak_mb": round(self._peak_rss, 1),
+        }
+        return False
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Write a benchmark run to JSON with enough metadata to compare runs across commits
+def write_results(path: str, suite: str, params: dict, results) -> None:
+    report = {
+        "suite": suite,
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def setup_database(database_url: str | None, prefix: str) -> tempfile.TemporaryDirectory:
+    """
+    Point the app at database_url, or a fresh SQLite file, and create the tables.
+    Settings are read at import time, so call this before importing any app module.
+    Returns the temporary directory holding the SQLite file; clean it up when done.
+    """
+    tmpdir = tempfile.TemporaryDirectory(prefix=prefix)
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{tmpdir.name}/bench.db"
+
+    import app.models  # noqa: F401 - registers the tables on Base.metadata
+    from app.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        # Let readers proceed while another thread commits; SQLite still allows a single writer
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    return tmpdir
@@ -0,0 +1,146 @@
+"""
+Synthetic corpus and query generation for benchmarks.
+Text is built from a fixed vocabulary with a seeded RNG, so a given seed always
+produces the same documents and questions. Documents can be rendered as TXT, DOCX
+or PDF bytes without extra dependencies.
+"""
+import io
+import random
+import textwrap
+import zipfile
+from xml.sax.saxutils import escape
+
+VOCABULARY = (
+    "account invoice payment refund policy customer order shipping delivery warranty "
+    "product service support ticket priority escalation contract renewal subscription plan "
+    "pricing discount billing cycle trial upgrade downgrade cancellation notice period "
+    "security password login session token access permission role admin audit report "
+    "dashboard export import integration webhook api limit quota storage backup restore "
+    "region latency availability incident outage maintenance release feature roadmap "
+    "employee onboarding benefit holiday leave expense travel laptop equipment training "
+    "compliance privacy retention deletion request consent vendor procurement budget forecast"
+).split()
+
+QUESTION_TEMPLATES = (
+    "What is the {a} {b} for {c}?",
+    "How do I change my {a} {b}?",
+    "When does the {a} {b} apply to {c}?",
+    "Who approves a {a} {b} request?",
+    "Explain the {a} process for {b} and {c}.",
+)
+
+
+# One paragraph of pseudo-prose
+def make_paragraph(rng: random.Random, sentences: int = 5) -> str:
+    out = []
+    for _ in range(sentences):
+        words = rng.choices(VOCABULARY, k=rng.randint(8, 18))
+        out.append(" ".join(words).capitalize() + ".")
+    return " ".join(out)
+
+
+# Plain-text document of roughly target_chars characters
+def make_text(rng: random.Random, target_chars: int) -> str:
+    paragraphs = []
+    size = 0
+    while size < target_chars:
+        paragraph = make_paragraph(rng)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+# Distinct user questions drawn from the corpus vocabulary
+def make_questions(rng: random.Random, count: int) -> list[str]:
+    questions = []
+    for _ in range(count):
+        a, b, c = rng.sample(VOCABULARY, 3)
+        questions.append(rng.choice(QUESTION_TEMPLATES).format(a=a, b=b, c=c))
+    return questions
+
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+
+# Minimal DOCX package with one paragraph per blank-line-separated block
+def make_docx(text: str) -> bytes:
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(p)}</w:t></w:r></w:p>' for p in text.split("\n\n")
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}</w:body></w:document>"
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        z.writestr("_rels/.rels", DOCX_RELS)
+        z.writestr("word/document.xml", document)
+    return buf.getvalue()
+
+
+def _pdf_string(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+# Minimal text PDF (Helvetica, 50 lines per page) that pypdf can extract
+def make_pdf(text: str, lines_per_page: int = 50) -> bytes:
+    lines = []
+    for paragraph in text.split("\n\n"):
+        lines.extend(textwrap.wrap(paragraph, 95) + [""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Objects 1-3 are the catalog, page tree and font; each page adds a page and a content stream
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page_lines in pages:
+        body = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_pdf_string(line)}) Tj T*" for line in page_lines) + " ET"
+        stream = body.encode("latin-1", errors="replace")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{body}\nendstream")
+        page_refs.append(f"{len(objects) + 1} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1", errors="replace"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+# Render text in one of the formats the indexer accepts
+def render_document(text: str, file_type: str) -> bytes:
+    if file_type == "pdf":
+        return make_pdf(text)
+    if file_type == "docx":
+        return make_docx(text)
+    if file_type == "txt":
+        return text.encode()
+    raise ValueError(f"Unsupported file type: {file_type}")
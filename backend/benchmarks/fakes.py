@@ -0,0 +1,174 @@
+"""
+Deterministic stand-ins for Bouldy's external services.
+- FakeLLM: streams canned tokens after a configurable time to first token, at a fixed rate
+- FakeEmbedding: local hashed bag-of-words vectors, so similar questions land close together
+- FakeObjectStore: dict-backed replacement for the S3 helpers in app.storage
+Qdrant runs in local in-memory mode and Redis is fakeredis unless real URLs are given.
+"""
+import hashlib
+import random
+import threading
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import CompletionResponse, CompletionResponseGen, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from benchmarks.corpus import VOCABULARY
+
+# Every module that imported a backend factory by name needs its own patch
+LLM_TARGETS = ("app.routers.chat.get_llm", "app.routers.public.get_llm")
+EMBED_TARGETS = (
+    "app.services.indexing.get_embed_model",
+    "app.services.cache.get_embed_model",
+    "app.routers.chat.get_embed_model",
+)
+QDRANT_TARGETS = ("app.services.indexing.get_qdrant_client", "app.routers.chat.get_qdrant_client")
+REDIS_TARGETS = ("app.services.cache.get_redis_client",)
+STORAGE_TARGETS = {
+    "app.routers.documents.upload_file": "upload_file",
+    "app.routers.documents.delete_file": "delete_file",
+    "app.routers.chatbots.upload_file": "upload_file",
+    "app.routers.chatbots.get_s3_file": "get_file",
+    "app.services.indexing.get_file": "get_file",
+}
+
+
+class FakeLLM(CustomLLM):
+    """LLM returning deterministic text, with configurable time to first token and token rate."""
+
+    ttft: float = 0.2  # seconds before the first token
+    tokens_per_second: float = 50.0  # 0 streams as fast as possible
+    response_tokens: int = 60
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake", context_window=16384, num_output=self.response_tokens)
+
+    def _tokens(self, prompt: str) -> list[str]:
+        rng = random.Random(hashlib.md5(prompt.encode()).digest())
+        return [word + " " for word in rng.choices(VOCABULARY, k=self.response_tokens)]
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        time.sleep(self.ttft + len(tokens) * self._token_delay())
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponseGen:
+        tokens = self._tokens(prompt)
+        delay = self._token_delay()
+
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.ttft)
+            text = ""
+            for i, token in enumerate(tokens):
+                if i and delay:
+                    time.sleep(delay)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Hashed bag-of-words embedding; shared words give high cosine similarity."""
+
+    dim: int = 256
+    latency: float = 0.0  # simulated API round trip per call
+
+    def embed(self, text: str) -> list[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in text.casefold().split():
+            h = int.from_bytes(hashlib.md5(word.strip(".,?!").encode()).digest()[:8], "big")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        if not norm:
+            vec[0], norm = 1.0, 1.0
+        return (vec / norm).tolist()
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self.embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self.embed(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self.embed(text)
+
+
+class FakeObjectStore:
+    """Thread-safe in-memory object store with the app.storage function signatures."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def upload_file(self, file_content: bytes, s3_key: str, content_type: str) -> str:
+        with self._lock:
+            self.objects[s3_key] = file_content
+        return s3_key
+
+    def get_file(self, s3_key: str) -> bytes:
+        with self._lock:
+            return self.objects[s3_key]
+
+    def delete_file(self, s3_key: str):
+        with self._lock:
+            self.objects.pop(s3_key, None)
+
+
+# Local Qdrant: in-memory by default, or a real server for production-like numbers
+def make_qdrant_client(url: str | None = None):
+    from qdrant_client import QdrantClient
+    return QdrantClient(url=url) if url else QdrantClient(location=":memory:")
+
+
+# Redis client factory: fakeredis sharing one server, or a real Redis at url
+def make_redis_factory(url: str | None = None):
+    if url:
+        import redis
+        return lambda: redis.from_url(url)
+
+    import fakeredis
+    server = fakeredis.FakeServer()
+    return lambda: fakeredis.FakeRedis(server=server)
+
+
+def install_fakes(
+    llm: FakeLLM | None = None,
+    embed_model: FakeEmbedding | None = None,
+    qdrant_client=None,
+    redis_factory=None,
+    store: FakeObjectStore | None = None,
+) -> ExitStack:
+    """
+    Patch the app's backend factories with fakes. Close the returned stack to undo.
+    Call after the app modules are imported; anything left as None is not patched.
+    """
+    stack = ExitStack()
+    if llm is not None:
+        for target in LLM_TARGETS:
+            stack.enter_context(patch(target, lambda *args, **kwargs: llm))
+    if embed_model is not None:
+        for target in EMBED_TARGETS:
+            stack.enter_context(patch(target, lambda: embed_model))
+    if qdrant_client is not None:
+        for target in QDRANT_TARGETS:
+            stack.enter_context(patch(target, lambda: qdrant_client))
+    if redis_factory is not None:
+        for target in REDIS_TARGETS:
+            stack.enter_context(patch(target, redis_factory))
+    if store is not None:
+        for target, method in STORAGE_TARGETS.items():
+            stack.enter_context(patch(target, getattr(store, method)))
+    return stack
@@ -0,0 +1,213 @@
+"""
+Indexing pipeline benchmark over a synthetic corpus.
+
+Generates PDF, DOCX and TXT documents of configurable count and size, then for each
+corpus size measures the pipeline stage by stage (parse, chunk, embed, upsert) and
+end to end through index_chatbot_documents. Embeddings come from the local fake
+model and vectors go to in-memory Qdrant (or a real server via --qdrant-url).
+
+    python -m benchmarks.indexing --documents 10,50,200 --document-chars 20000 --json indexing.json
+
+Each stage reports wall and CPU time, peak RSS and chunks/sec.
+"""
+import argparse
+import logging
+import random
+from uuid import uuid4
+
+from benchmarks.common import ResourceMonitor, setup_database, write_results
+from benchmarks.corpus import make_text, render_document
+from benchmarks.fakes import FakeEmbedding, FakeObjectStore, install_fakes, make_qdrant_client, make_redis_factory
+
+FORMATS = ("pdf", "docx", "txt")
+STAGES = ("parse", "chunk", "embed", "upsert")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default="10,50", help="comma-separated corpus sizes, in documents")
+    parser.add_argument("--document-chars", type=int, default=20_000, help="approximate size of each document")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma-separated subset of pdf,docx,txt")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="simulated embedding call latency, seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--qdrant-url", default=None, help="defaults to in-memory local Qdrant")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+# Upload a corpus to the fake store and record it as Document rows owned by user_id
+def make_corpus(store: FakeObjectStore, rng: random.Random, user_id, count: int, chars: int, formats: list[str]) -> list:
+    from app.database import SessionLocal
+    from app.models import Document
+
+    docs = []
+    for i in range(count):
+        file_type = formats[i % len(formats)]
+        doc_id = uuid4()
+        s3_key = f"bench/{doc_id}.{file_type}"
+        content = render_document(make_text(rng, chars), file_type)
+        store.upload_file(content, s3_key, "application/octet-stream")
+        docs.append(Document(
+            id=doc_id, user_id=user_id, filename=f"{doc_id}.{file_type}", original_filename=f"doc-{i}.{file_type}",
+            file_type=file_type, file_size=len(content), s3_key=s3_key,
+        ))
+
+    # Keep attributes loaded so the rows can be read after the session closes, as in the background job
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        db.add_all(docs)
+        db.commit()
+    finally:
+        db.close()
+    return docs
+
+
+# Owner for the benchmark documents
+def make_user():
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        user = User(email=f"bench-{uuid4()}@example.com", password_hash="-", name="Indexing Benchmark")
+        db.add(user)
+        db.commit()
+        return user
+    finally:
+        db.close()
+
+
+# Chatbot row for an end-to-end run, so its indexing job can be recorded
+def make_chatbot(user_id):
+    from app.database import SessionLocal
+    from app.models import Chatbot
+
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        chatbot = Chatbot(user_id=user_id, name="Indexing Benchmark")
+        db.add(chatbot)
+        db.commit()
+        return chatbot
+    finally:
+        db.close()
+
+
+def _stage_result(resources: dict, chunks: int) -> dict:
+    wall = resources["wall_s"]
+    return {**resources, "chunks_per_s": round(chunks / wall, 1) if wall else 0.0}
+
+
+# Run each pipeline stage on its own so time and memory can be attributed
+def run_stages(docs: list, client, embed_model: FakeEmbedding) -> dict:
+    from llama_index.core.schema import MetadataMode
+    from llama_index.vector_stores.qdrant import QdrantVectorStore
+
+    from app.services.indexing import CHUNK_SIZE, _parse_document, get_file, get_splitter
+
+    monitors = {stage: ResourceMonitor() for stage in STAGES}
+    collection_name = f"bench_{uuid4()}"
+    splitter = get_splitter()
+    # Sentence tokenizers load on the first text longer than a chunk; keep that out of the chunk stage
+    splitter.split_text("Warm up the sentence tokenizer. " * CHUNK_SIZE)
+
+    with monitors["parse"]:
+        li_documents = []
+        for doc in docs:
+            li_documents.extend(_parse_document(doc, get_file(doc.s3_key)))
+
+    with monitors["chunk"]:
+        nodes = splitter.get_nodes_from_documents(li_documents)
+
+    with monitors["embed"]:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        for node, embedding in zip(nodes, embed_model.get_text_embedding_batch(texts)):
+            node.embedding = embedding
+
+    with monitors["upsert"]:
+        QdrantVectorStore(client=client, collection_name=collection_name).add(nodes)
+    client.delete_collection(collection_name)
+
+    chunks = len(nodes)
+    return {
+        "pages": len(li_documents),
+        "chunks": chunks,
+        "stages": {stage: _stage_result(monitors[stage].result, chunks) for stage in STAGES},
+    }
+
+
+# The production entry point, including status updates and cache invalidation
+def run_end_to_end(docs: list, client, user_id) -> dict:
+    from app.services.indexing import delete_chatbot_index, get_collection_name, index_chatbot_documents
+
+    chatbot_id = make_chatbot(user_id).id
+    with ResourceMonitor() as monitor:
+        index_chatbot_documents(chatbot_id, docs)
+    # Count stored points (through the chatbot's alias) rather than trusting the return value
+    chunks = client.count(get_collection_name(chatbot_id)).count
+    delete_chatbot_index(chatbot_id)
+    return {"chunks": chunks, **_stage_result(monitor.result, chunks)}
+
+
+def print_report(rows: list[dict]) -> None:
+    header = f"{'docs':>5} {'chunks':>7} " + " ".join(f"{stage:>10}" for stage in (*STAGES, "total")) + \
+             f" {'chunks/s':>9} {'rss peak':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        stages, e2e = row["stages"], row["end_to_end"]
+        peak = max([s["rss_peak_mb"] for s in stages.values()] + [e2e["rss_peak_mb"]])
+        print(
+            f"{row['documents']:>5} {row['chunks']:>7} "
+            + " ".join(f"{stages[stage]['wall_s']:>9.3f}s" for stage in STAGES)
+            + f" {e2e['wall_s']:>9.3f}s {e2e['chunks_per_s']:>9.1f} {peak:>7.1f}MB"
+        )
+
+
+def main(argv=None) -> list[dict]:
+    args = parse_args(argv)
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise SystemExit(f"Unknown formats: {', '.join(sorted(unknown))}")
+    sizes = [int(n) for n in args.documents.split(",") if n.strip()]
+
+    tmpdir = setup_database(args.database_url, "bouldy-indexing-")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    store = FakeObjectStore()
+    client = make_qdrant_client(args.qdrant_url)
+    embed_model = FakeEmbedding(latency=args.embed_latency)
+    fakes = install_fakes(
+        embed_model=embed_model, qdrant_client=client, redis_factory=make_redis_factory(), store=store,
+    )
+
+    rows = []
+    with fakes:
+        user = make_user()
+        for size in sizes:
+            docs = make_corpus(store, rng, user.id, size, args.document_chars, formats)
+            corpus_bytes = sum(len(store.objects[doc.s3_key]) for doc in docs)
+            staged = run_stages(docs, client, embed_model)
+            rows.append({
+                "documents": size,
+                "corpus_mb": round(corpus_bytes / 1024 / 1024, 2),
+                **staged,
+                "end_to_end": run_end_to_end(docs, client, user.id),
+            })
+            for doc in docs:
+                store.delete_file(doc.s3_key)
+
+    print_report(rows)
+    if args.json_path:
+        params = {k: v for k, v in vars(args).items() if k not in ("json_path", "database_url")}
+        write_results(args.json_path, "indexing", params, rows)
+        print(f"Results written to {args.json_path}")
+
+    tmpdir.cleanup()
+    return rows
+
+
+if __name__ == "__main__":
+    main()
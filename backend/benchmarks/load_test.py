@@ -0,0 +1,245 @@
+"""
+End-to-end load test for the chat endpoints.
+
+Boots the real FastAPI app under uvicorn with fake LLM, embedding and storage backends,
+in-memory Qdrant and fakeredis (or real Qdrant/Redis via --qdrant-url/--redis-url),
+seeds a user, documents and an indexed chatbot, then drives chat, stream and public
+traffic and reports throughput, latency percentiles and resource use per endpoint.
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --ttft 0.2 --json load.json
+
+Endpoints run one after another, so CPU and RSS figures belong to a single endpoint.
+The load generator shares the process with the server, so CPU includes client overhead.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import socket
+import threading
+import time
+from uuid import UUID
+
+import httpx
+
+from benchmarks.common import ResourceMonitor, latency_summary, setup_database, write_results
+from benchmarks.corpus import make_questions, make_text
+from benchmarks.fakes import (
+    FakeEmbedding, FakeLLM, FakeObjectStore, install_fakes, make_qdrant_client, make_redis_factory,
+)
+
+ENDPOINTS = ("chat", "stream", "public")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset of chat,stream,public")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="in-flight requests per endpoint")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="fake LLM token rate, 0 for unthrottled")
+    parser.add_argument("--response-tokens", type=int, default=60, help="tokens per fake LLM answer")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="simulated embedding call latency, seconds")
+    parser.add_argument("--documents", type=int, default=5, help="documents indexed for the chatbot")
+    parser.add_argument("--document-chars", type=int, default=20_000, help="approximate size of each document")
+    parser.add_argument("--questions", type=int, default=200, help="distinct questions in the traffic mix")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3,
+                        help="share of requests asking a popular question (exercises the cache)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--qdrant-url", default=None, help="defaults to in-memory local Qdrant")
+    parser.add_argument("--redis-url", default=None, help="defaults to fakeredis")
+    parser.add_argument("--json", dest="json_path", default=None, help="write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class AppServer:
+    """Runs the app under uvicorn on a background thread."""
+
+    def __init__(self, app):
+        import uvicorn
+        self.port = _free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+        return False
+
+
+# Create a user, upload documents, index them and publish the chatbot
+def seed(base_url: str, args, rng: random.Random) -> dict:
+    from app.database import SessionLocal
+    from app.models import Document
+    from app.services.indexing import index_chatbot_documents
+
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        user = client.post("/api/auth/register", json={
+            "email": f"load-{args.seed}@example.com", "password": "loadtest", "name": "Load Test",
+        }).raise_for_status().json()
+        headers = {"X-User-Id": user["id"]}
+
+        doc_ids = []
+        for i in range(args.documents):
+            text = make_text(rng, args.document_chars).encode()
+            res = client.post("/api/documents", headers=headers, files={"file": (f"doc-{i}.txt", text, "text/plain")})
+            doc_ids.append(UUID(res.raise_for_status().json()["id"]))
+
+        bot = client.post("/api/chatbots", headers=headers, json={
+            "name": "Load Test Bot", "llm_provider": "openai", "llm_model": "fake", "api_key": "sk-fake",
+        }).raise_for_status().json()
+        published = client.patch(f"/api/chatbots/{bot['id']}/publish", headers=headers).raise_for_status().json()
+
+    # Index synchronously so traffic never races the background job
+    db = SessionLocal()
+    try:
+        docs = db.query(Document).filter(Document.id.in_(doc_ids)).all()
+        chunks = index_chatbot_documents(UUID(bot["id"]), docs)
+    finally:
+        db.close()
+
+    return {"headers": headers, "chatbot_id": bot["id"], "public_token": published["public_token"], "chunks": chunks}
+
+
+# Pick the next question: popular ones repeat, the rest are spread over the full set
+def question_stream(rng: random.Random, questions: list[str], repeat_ratio: float):
+    popular = questions[: max(1, len(questions) // 20)]
+    while True:
+        yield rng.choice(popular) if rng.random() < repeat_ratio else rng.choice(questions)
+
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, ctx: dict, message: str) -> dict:
+    if endpoint == "chat":
+        method_url, headers = f"/api/chat/{ctx['chatbot_id']}", ctx["headers"]
+    elif endpoint == "stream":
+        method_url, headers = f"/api/chat/{ctx['chatbot_id']}/stream", ctx["headers"]
+    else:
+        method_url, headers = f"/api/public/{ctx['public_token']}/chat", {}
+
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", method_url, headers=headers, json={"message": message}) as res:
+            async for _ in res.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+            ok = res.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return {"ok": ok, "latency": time.perf_counter() - started, "ttfb": first_byte}
+
+
+# Fire `total` requests at one endpoint with at most `concurrency` in flight
+async def run_endpoint(base_url: str, endpoint: str, ctx: dict, messages, total: int, concurrency: int) -> list[dict]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(next(messages))
+    results: list[dict] = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def worker():
+            while not queue.empty():
+                message = queue.get_nowait()
+                results.append(await _one_request(client, endpoint, ctx, message))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def summarize(endpoint: str, results: list[dict], resources: dict) -> dict:
+    ok = [r for r in results if r["ok"]]
+    wall = resources["wall_s"]
+    return {
+        "endpoint": endpoint,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency": latency_summary([r["latency"] for r in ok]),
+        "ttfb": latency_summary([r["ttfb"] for r in ok if r["ttfb"] is not None]),
+        "cpu_ms_per_request": round(resources["cpu_s"] * 1000 / len(results), 3) if results else 0.0,
+        "resources": resources,
+    }
+
+
+def print_report(rows: list[dict]) -> None:
+    header = f"{'endpoint':<8} {'req':>5} {'err':>4} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} " \
+             f"{'ttfb p50':>9} {'cpu/req':>9} {'rss peak':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        lat, ttfb = row["latency"], row["ttfb"]
+        print(
+            f"{row['endpoint']:<8} {row['requests']:>5} {row['errors']:>4} {row['throughput_rps']:>8.2f} "
+            f"{lat.get('p50_ms', 0):>7.1f}ms {lat.get('p95_ms', 0):>7.1f}ms {lat.get('p99_ms', 0):>7.1f}ms "
+            f"{ttfb.get('p50_ms', 0):>7.1f}ms {row['cpu_ms_per_request']:>7.1f}ms "
+            f"{row['resources']['rss_peak_mb']:>7.1f}MB"
+        )
+
+
+def main(argv=None) -> list[dict]:
+    args = parse_args(argv)
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    tmpdir = setup_database(args.database_url, "bouldy-load-")
+    from app.main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    app.state.limiter.enabled = False  # the public limit would otherwise cap the run at 20 req/min
+
+    rng = random.Random(args.seed)
+    fakes = install_fakes(
+        llm=FakeLLM(ttft=args.ttft, tokens_per_second=args.tokens_per_second, response_tokens=args.response_tokens),
+        embed_model=FakeEmbedding(latency=args.embed_latency),
+        qdrant_client=make_qdrant_client(args.qdrant_url),
+        redis_factory=make_redis_factory(args.redis_url),
+        store=FakeObjectStore(),
+    )
+
+    rows = []
+    with fakes, AppServer(app) as server:
+        ctx = seed(server.url, args, rng)
+        print(f"Seeded chatbot {ctx['chatbot_id']} with {args.documents} documents ({ctx['chunks']} chunks)")
+        messages = question_stream(rng, make_questions(rng, args.questions), args.repeat_ratio)
+
+        for endpoint in endpoints:
+            with ResourceMonitor() as monitor:
+                results = asyncio.run(
+                    run_endpoint(server.url, endpoint, ctx, messages, args.requests, args.concurrency),
+                )
+            rows.append(summarize(endpoint, results, monitor.result))
+
+    print_report(rows)
+    if args.json_path:
+        params = {k: v for k, v in vars(args).items() if k not in ("json_path", "database_url", "redis_url")}
+        write_results(args.json_path, "load_test", params, rows)
+        print(f"Results written to {args.json_path}")
+
+    tmpdir.cleanup()
+    return rows
+
+
+if __name__ == "__main__":
+    main()
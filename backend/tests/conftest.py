@@ -1,29 +1,50 @@
 """
 Shared test fixtures for Bouldy backend tests.
 Uses SQLite in-memory database for speed and isolation.
+Sync routes and async routes (through aiosqlite) see the same in-memory database.
 """
 
+from unittest.mock import patch
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.database import Base, get_db
+from app.database import Base, get_async_db, get_async_read_db, get_db, get_read_db
 from app.main import app
 from app.models import User
 
 
-# SQLite in-memory engine — shared across a single test session
-SQLALCHEMY_TEST_URL = "sqlite://"
+# SQLite in-memory engine — shared across a single test session.
+# A named shared-cache database, so the aiosqlite engine's connection sees the same tables;
+# read_uncommitted stops readers on one connection from blocking writers on the other.
+SQLALCHEMY_TEST_URL = "sqlite:///file:bouldy_test?mode=memory&cache=shared&uri=true"
 
 engine = create_engine(
     SQLALCHEMY_TEST_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+async_engine = create_async_engine(
+    SQLALCHEMY_TEST_URL.replace("sqlite://", "sqlite+aiosqlite://"),
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _read_uncommitted(dbapi_connection, _):
+    dbapi_connection.execute("PRAGMA read_uncommitted = 1")
+
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -56,8 +77,16 @@ def client(db):
         finally:
             pass
 
+    async def _override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+
     app.dependency_overrides[get_db] = _override_get_db
-    with TestClient(app) as c:
+    app.dependency_overrides[get_async_db] = _override_get_async_db
+    app.dependency_overrides[get_read_db] = _override_get_db
+    app.dependency_overrides[get_async_read_db] = _override_get_async_db
+    # Buffered chat messages are written to the test database
+    with patch("app.services.message_writer.SessionLocal", TestingSessionLocal), TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
 
@@ -65,7 +94,7 @@ def client(db):
 @pytest.fixture
 def test_user(db) -> User:
     """Create and return a test user."""
-    from app.routers.auth import hash_password
+    from app.services.passwords import hash_password
     user = User(
         email="test@example.com",
         name="Test User",
@@ -80,7 +109,7 @@ def test_user(db) -> User:
 @pytest.fixture
 def test_user_b(db) -> User:
     """Create a second test user for tenant isolation tests."""
-    from app.routers.auth import hash_password
+    from app.services.passwords import hash_password
     user = User(
         email="other@example.com",
         name="Other User",
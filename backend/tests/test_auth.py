@@ -1,10 +1,24 @@
 """
 Unit tests for authentication.
 Covers: registration, login (NextAuth callback), user lookup,
-auth middleware (X-User-Id header), and edge cases.
+auth middleware (X-User-Id header), the user lookup cache, password hashing
+(work factor, rehash on login, hash queue limits), and edge cases.
 """
 
+import asyncio
 import uuid
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from fakeredis import aioredis
+from sqlalchemy import event
+
+from app.config import settings
+from app.metrics import PASSWORD_HASH_QUEUE
+from app.models import User
+from app.services import passwords, user_cache
+from tests.conftest import async_engine
 
 
 # ──────────────────────────────────────────────
@@ -36,6 +50,112 @@ class TestAuthMiddleware:
         assert res.status_code == 401
 
 
+# ──────────────────────────────────────────────
+#  User Cache
+# ──────────────────────────────────────────────
+
+class _UserSelects:
+    """Counts SELECTs on the users table issued through the async engine."""
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+            self.count += 1
+
+
+class TestUserCache:
+    """Tests for the cached user lookup in get_current_user."""
+
+    @pytest.fixture(autouse=True)
+    def _empty_cache(self):
+        user_cache.clear_local()
+        yield
+        user_cache.clear_local()
+
+    def test_repeat_requests_skip_the_database(self, client, test_user):
+        """Only the first request for a user reads the users table."""
+        headers = {"X-User-Id": str(test_user.id)}
+        with _UserSelects() as selects:
+            for _ in range(3):
+                assert client.get("/api/chatbots", headers=headers).status_code == 200
+        assert selects.count == 1
+
+    def test_lookup_ends_its_transaction(self, client, test_user):
+        """A database lookup commits straight away instead of holding its connection for the request."""
+        commits = []
+        on_commit = commits.append
+        event.listen(async_engine.sync_engine, "commit", on_commit)
+        try:
+            with _UserSelects() as selects:
+                client.get("/api/chatbots", headers={"X-User-Id": str(test_user.id)})
+        finally:
+            event.remove(async_engine.sync_engine, "commit", on_commit)
+        assert selects.count == 1
+        assert commits
+
+    def test_disabled_cache_reads_every_time(self, client, test_user, monkeypatch):
+        """A zero TTL turns the cache off."""
+        monkeypatch.setattr(settings, "user_cache_ttl_seconds", 0)
+        headers = {"X-User-Id": str(test_user.id)}
+        with _UserSelects() as selects:
+            client.get("/api/chatbots", headers=headers)
+            client.get("/api/chatbots", headers=headers)
+        assert selects.count == 2
+
+    def test_deleting_user_invalidates(self, client, db, test_user):
+        """An ORM delete of a user drops the cached entry, so the next request gets 401."""
+        headers = {"X-User-Id": str(test_user.id)}
+        assert client.get("/api/chatbots", headers=headers).status_code == 200
+        db.delete(test_user)
+        db.commit()
+        assert client.get("/api/chatbots", headers=headers).status_code == 401
+
+    def test_user_invalidated_only_when_delete_commits(self, client, db, test_user):
+        """Deleting a user invalidates after commit, not at flush, and not at all when rolled back."""
+        headers = {"X-User-Id": str(test_user.id)}
+        client.get("/api/chatbots", headers=headers)
+        db.delete(test_user)
+        db.flush()
+        assert user_cache._local_get(test_user.id) is not None
+        db.rollback()
+        assert user_cache._local_get(test_user.id) is not None
+
+        db.delete(db.get(User, test_user.id))
+        db.commit()
+        assert user_cache._local_get(test_user.id) is None
+
+    def test_redis_backing_shared_between_workers(self, client, test_user, monkeypatch):
+        """With Redis backing, a fill from one worker is served to another without a query."""
+        monkeypatch.setattr(settings, "user_cache_redis", True)
+        server = fakeredis.FakeServer()
+        headers = {"X-User-Id": str(test_user.id)}
+        with patch("app.services.user_cache.get_async_redis_client",
+                   side_effect=lambda: aioredis.FakeRedis(server=server)), \
+             patch("app.services.user_cache.get_redis_client", return_value=fakeredis.FakeRedis(server=server)):
+            client.get("/api/chatbots", headers=headers)
+            user_cache.clear_local()  # a different worker: empty local cache, same Redis
+            with _UserSelects() as selects:
+                assert client.get("/api/chatbots", headers=headers).status_code == 200
+            assert selects.count == 0
+
+            user_cache.invalidate_user(test_user.id)
+            assert not fakeredis.FakeRedis(server=server).exists(user_cache.user_key(test_user.id))
+
+    def test_invalidation_message_clears_local_entry(self, client, test_user):
+        """An invalidation published by another worker removes the local entry."""
+        client.get("/api/chatbots", headers={"X-User-Id": str(test_user.id)})
+        assert user_cache._local_get(test_user.id) is not None
+        user_cache._apply_invalidation(str(test_user.id).encode())
+        assert user_cache._local_get(test_user.id) is None
+
+
 # ──────────────────────────────────────────────
 #  Registration / NextAuth Callback
 # ──────────────────────────────────────────────
@@ -163,6 +283,72 @@ class TestLogin:
         assert res.status_code == 422
 
 
+# ──────────────────────────────────────────────
+#  Password Hashing
+# ──────────────────────────────────────────────
+
+class TestPasswordHashing:
+    """Tests for the bcrypt executor, work factor and rehash on login."""
+
+    def test_work_factor_from_settings(self, monkeypatch):
+        """Hashes use the configured cost, and other costs need a rehash."""
+        monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+        hashed = passwords.hash_password("secret123")
+        assert hashed.startswith("$2b$04$")
+        assert passwords.verify_password("secret123", hashed)
+        assert not passwords.needs_rehash(hashed)
+        monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+        assert passwords.needs_rehash(hashed)
+
+    def test_rehash_on_login(self, client, db, test_user, monkeypatch):
+        """Logging in after the cost changes stores a hash with the new cost."""
+        monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+        res = client.post("/api/auth/login", json={"email": test_user.email, "password": "testpass123"})
+        assert res.status_code == 200
+
+        db.expire_all()
+        stored = db.get(User, test_user.id).password_hash
+        assert stored.startswith("$2b$04$")
+        assert passwords.verify_password("testpass123", stored)
+
+    def test_queue_full_returns_503(self, client, test_user, monkeypatch):
+        """Login backs off with 503 and Retry-After when the hash queue is saturated."""
+        monkeypatch.setattr(settings, "password_hash_max_pending", 1)
+        monkeypatch.setattr(passwords, "_pending", 1)
+        res = client.post("/api/auth/login", json={"email": test_user.email, "password": "testpass123"})
+        assert res.status_code == 503
+        assert res.headers["Retry-After"] == "1"
+
+    def test_rehash_skipped_when_queue_full(self, client, db, test_user, monkeypatch):
+        """A saturated queue after the password check skips the upgrade but still logs the user in."""
+        monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+        original = db.get(User, test_user.id).password_hash
+        with patch("app.routers.auth.hash_password_async", side_effect=passwords.HashQueueFull):
+            res = client.post("/api/auth/login", json={"email": test_user.email, "password": "testpass123"})
+        assert res.status_code == 200
+
+        db.expire_all()
+        assert db.get(User, test_user.id).password_hash == original
+
+    def test_queue_depth_gauge(self, monkeypatch):
+        """The gauge counts hashes in flight and returns to zero afterwards."""
+        monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+        seen = []
+
+        def record(password):
+            seen.append(PASSWORD_HASH_QUEUE._value.get())
+            return password
+
+        monkeypatch.setattr(passwords, "hash_password", record)
+
+        async def run():
+            await asyncio.gather(*(passwords.hash_password_async("x") for _ in range(3)))
+
+        asyncio.run(run())
+        assert max(seen) >= 1
+        assert PASSWORD_HASH_QUEUE._value.get() == 0
+
+
 # ──────────────────────────────────────────────
 #  User Lookup / Me Endpoint
 # ──────────────────────────────────────────────
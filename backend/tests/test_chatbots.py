@@ -1,12 +1,14 @@
 """
 Unit tests for chatbot management.
 Covers: CRUD, publish toggle, avatar upload, key validation,
-document assignment, and tenant isolation.
+document assignment, indexing progress, and tenant isolation.
 External services (S3, Qdrant, LLM providers, Redis) are mocked.
 """
 
+import json
 import uuid
-from unittest.mock import patch, MagicMock
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch, MagicMock
 
 
 
@@ -395,6 +397,158 @@ class TestValidateKey:
         assert data["error"] is not None
 
 
+# ──────────────────────────────────────────────
+#  Cache Stats
+# ──────────────────────────────────────────────
+
+class TestChatbotCacheStats:
+    """Tests for GET /api/chatbots/{id}/cache-stats."""
+
+    @patch("app.routers.chatbots.get_cache_stats")
+    def test_cache_stats(self, mock_stats, client, auth_headers):
+        """Returns the chatbot's cache stats."""
+        from app.services.cache_metrics import summarize
+
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={"name": "Bot"}).json()["id"]
+        stats = summarize({"lookups": 4, "hits:exact": 3, "misses": 1, "tokens_saved": 900})
+        mock_stats.return_value = {bot_id: {**stats, "entries": 2, "bytes": 12000}}
+
+        res = client.get(f"/api/chatbots/{bot_id}/cache-stats", headers=auth_headers)
+        assert res.status_code == 200
+        data = res.json()
+        assert data["hit_rate"] == 0.75
+        assert data["hits"]["exact"] == 3
+        assert data["tokens_saved"] == 900
+        assert data["entries"] == 2
+
+    def test_cache_stats_other_users_bot(self, client, auth_headers, auth_headers_b):
+        """User B cannot read User A's cache stats."""
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={"name": "Bot"}).json()["id"]
+        res = client.get(f"/api/chatbots/{bot_id}/cache-stats", headers=auth_headers_b)
+        assert res.status_code == 404
+
+
+# ──────────────────────────────────────────────
+#  Indexing Progress
+# ──────────────────────────────────────────────
+
+class TestChatbotIndexingProgress:
+    """Tests for GET /api/chatbots/{id}/indexing and its event stream."""
+
+    @patch("app.routers.chatbots.index_chatbot_documents")
+    @patch("app.routers.documents.upload_file")
+    def _create_bot_with_document(self, client, auth_headers, mock_upload, mock_index):
+        """Helper: create a chatbot with one document; returns (bot_id, doc_id, mock_index)."""
+        mock_upload.return_value = "fake-key"
+        doc_id = client.post(
+            "/api/documents", headers=auth_headers,
+            files={"file": ("doc.txt", b"some content", "text/plain")},
+        ).json()["id"]
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={
+            "name": "Indexed Bot", "document_ids": [doc_id],
+        }).json()["id"]
+        return bot_id, doc_id, mock_index
+
+    def _set_job_status(self, db, bot_id, status):
+        """Helper: move the chatbot's latest job to a status."""
+        from app.models import IndexingJob
+        job = db.query(IndexingJob).filter(IndexingJob.chatbot_id == uuid.UUID(bot_id)).one()
+        job.status = status
+        db.commit()
+        return job
+
+    def test_queued_job_visible_before_indexing_starts(self, client, auth_headers):
+        """Creating a chatbot with documents records a queued job and passes its id to the task."""
+        bot_id, doc_id, mock_index = self._create_bot_with_document(client, auth_headers)
+
+        res = client.get(f"/api/chatbots/{bot_id}/indexing", headers=auth_headers)
+        assert res.status_code == 200
+        data = res.json()
+        assert data["status"] == "queued"
+        assert data["documents_total"] == 1
+        assert data["bytes_total"] == len(b"some content")
+        assert data["documents"][0]["document_id"] == doc_id
+        assert data["documents"][0]["status"] == "pending"
+        assert mock_index.call_args.kwargs["job_id"] == uuid.UUID(data["id"])
+
+    def test_no_job_returns_404(self, client, auth_headers):
+        """A chatbot that was never indexed has no progress."""
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={"name": "Empty Bot"}).json()["id"]
+        res = client.get(f"/api/chatbots/{bot_id}/indexing", headers=auth_headers)
+        assert res.status_code == 404
+
+    def test_other_users_progress_hidden(self, client, auth_headers, auth_headers_b):
+        """User B cannot read User A's indexing progress."""
+        bot_id, _, _ = self._create_bot_with_document(client, auth_headers)
+        assert client.get(f"/api/chatbots/{bot_id}/indexing", headers=auth_headers_b).status_code == 404
+        assert client.get(f"/api/chatbots/{bot_id}/indexing/events", headers=auth_headers_b).status_code == 404
+
+    @patch("app.routers.chatbots.index_chatbot_documents")
+    def test_resume_failed_job(self, mock_index, client, auth_headers, db):
+        """A failed job is requeued under the same id so it resumes from its checkpoints."""
+        bot_id, doc_id, _ = self._create_bot_with_document(client, auth_headers)
+        job = self._set_job_status(db, bot_id, "failed")
+
+        res = client.post(f"/api/chatbots/{bot_id}/indexing/resume", headers=auth_headers)
+        assert res.status_code == 200
+        assert res.json()["id"] == str(job.id)
+        assert res.json()["status"] == "queued"
+        assert mock_index.call_args.kwargs["job_id"] == job.id
+        assert [str(d.id) for d in mock_index.call_args.args[1]] == [doc_id]
+
+    def test_resume_active_job_conflicts(self, client, auth_headers, db):
+        """Queued, live running and completed jobs cannot be resumed."""
+        bot_id, _, _ = self._create_bot_with_document(client, auth_headers)
+        for status in ("queued", "running", "completed"):
+            job = self._set_job_status(db, bot_id, status)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            res = client.post(f"/api/chatbots/{bot_id}/indexing/resume", headers=auth_headers)
+            assert res.status_code == 409
+
+    @patch("app.routers.chatbots.index_chatbot_documents")
+    def test_resume_stalled_running_job(self, mock_index, client, auth_headers, db):
+        """A running job that stopped reporting progress is presumed dead and can be resumed."""
+        bot_id, _, _ = self._create_bot_with_document(client, auth_headers)
+        job = self._set_job_status(db, bot_id, "running")
+        job.updated_at = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+
+        res = client.post(f"/api/chatbots/{bot_id}/indexing/resume", headers=auth_headers)
+        assert res.status_code == 200
+        mock_index.assert_called_once()
+
+    @patch("app.routers.chatbots.subscribe_progress", new_callable=AsyncMock)
+    def test_events_finished_job_sends_snapshot_only(self, mock_subscribe, client, auth_headers, db):
+        """A finished job's stream is a single snapshot event."""
+        bot_id, _, _ = self._create_bot_with_document(client, auth_headers)
+        self._set_job_status(db, bot_id, "completed")
+
+        res = client.get(f"/api/chatbots/{bot_id}/indexing/events", headers=auth_headers)
+        assert res.status_code == 200
+        assert res.headers["content-type"].startswith("text/event-stream")
+        assert res.text.count("event: ") == 1
+        assert res.text.startswith("event: snapshot\ndata: ")
+        mock_subscribe.return_value.aclose.assert_awaited_once()
+
+    @patch("app.routers.chatbots.subscribe_progress", new_callable=AsyncMock)
+    def test_events_forward_updates_until_finished(self, mock_subscribe, client, auth_headers, db):
+        """Published updates are forwarded as progress events and the stream ends with the job."""
+        bot_id, _, _ = self._create_bot_with_document(client, auth_headers)
+        job = self._set_job_status(db, bot_id, "running")
+
+        updates = [{"id": str(job.id), "status": "running", "chunks_upserted": 4},
+                   {"id": str(job.id), "status": "completed", "chunks_upserted": 9}]
+        mock_subscribe.return_value.get_message.side_effect = [
+            None, *({"data": json.dumps(u).encode()} for u in updates),
+        ]
+
+        res = client.get(f"/api/chatbots/{bot_id}/indexing/events", headers=auth_headers)
+        events = [block for block in res.text.split("\n\n") if block]
+        assert [e.split("\n")[0] for e in events] == ["event: snapshot", "event: progress", "event: progress"]
+        assert json.loads(events[-1].split("data: ", 1)[1])["status"] == "completed"
+
+
 # ──────────────────────────────────────────────
 #  Tenant Isolation
 # ──────────────────────────────────────────────
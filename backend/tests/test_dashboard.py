@@ -0,0 +1,166 @@
+"""
+Unit tests for the dashboard.
+Covers: aggregate stats, recent activity, chatbot overview,
+query count, tenant isolation, and usage counter maintenance.
+Redis (cache stats) is mocked.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+from app.models import Chatbot, ChatbotUsage, Document, ChatSession, ChatMessage, UserUsage
+from app.services.usage import reconcile_usage
+from tests.conftest import engine
+
+
+def _populate(db, user, bots=2, sessions_per_bot=2, messages_per_session=3):
+    """Helper: chatbots with one document each, sessions and alternating user/assistant messages."""
+    started = datetime(2026, 1, 1)
+    for b in range(bots):
+        doc = Document(
+            user_id=user.id, filename=f"d{b}.txt", original_filename=f"d{b}.txt",
+            file_type="txt", file_size=100, s3_key=f"k{b}",
+        )
+        bot = Chatbot(
+            user_id=user.id, name=f"Bot {b}", public_token=uuid.uuid4().hex,
+            is_public="true" if b == 0 else "false", created_at=started + timedelta(days=b),
+        )
+        bot.documents = [doc]
+        db.add_all([doc, bot])
+        for s in range(sessions_per_bot):
+            session = ChatSession(chatbot=bot, user_id=user.id)
+            db.add(session)
+            for m in range(messages_per_session):
+                db.add(ChatMessage(
+                    session=session, role="user" if m % 2 == 0 else "assistant", content=f"msg {b}-{s}-{m}",
+                    created_at=started + timedelta(days=b, hours=s, minutes=m),
+                ))
+    db.commit()
+    # Rows are inserted directly, bypassing the write paths that maintain the counters
+    reconcile_usage(db)
+
+
+class _QueryCounter:
+    """Counts SELECT statements issued on the test engine."""
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.count += 1
+
+
+# ──────────────────────────────────────────────
+#  Stats
+# ──────────────────────────────────────────────
+
+@patch("app.routers.dashboard.get_cache_stats", side_effect=lambda ids: {})
+class TestDashboard:
+    """Tests for GET /api/dashboard."""
+
+    def test_empty_dashboard(self, mock_stats, client, auth_headers):
+        """A new user sees zeros and empty lists."""
+        res = client.get("/api/dashboard", headers=auth_headers)
+        assert res.status_code == 200
+        data = res.json()
+        assert data["total_chatbots"] == data["total_sessions"] == data["total_messages"] == 0
+        assert data["storage_bytes"] == 0
+        assert data["recent_activity"] == data["chatbot_overview"] == []
+
+    def test_aggregates(self, mock_stats, client, auth_headers, db, test_user):
+        """Totals, per-chatbot counts and recent user messages are reported."""
+        _populate(db, test_user)
+        data = client.get("/api/dashboard", headers=auth_headers).json()
+
+        assert data["total_chatbots"] == 2
+        assert data["published_chatbots"] == 1
+        assert data["total_documents"] == 2
+        assert data["storage_bytes"] == 200
+        assert data["total_sessions"] == 4
+        assert data["total_messages"] == 12
+
+        overview = data["chatbot_overview"]
+        assert [bot["name"] for bot in overview] == ["Bot 1", "Bot 0"]  # newest first
+        assert all(bot["session_count"] == 2 and bot["document_count"] == 1 for bot in overview)
+
+        recent = data["recent_activity"]
+        assert len(recent) == 8
+        assert recent[0]["message"] == "msg 1-1-2"
+        assert recent[0]["chatbot_name"] == "Bot 1"
+
+    def test_query_count_is_constant(self, mock_stats, client, auth_headers, db, test_user):
+        """The number of queries does not grow with chatbots, sessions or messages."""
+        _populate(db, test_user, bots=1, sessions_per_bot=1, messages_per_session=1)
+        with _QueryCounter() as small:
+            client.get("/api/dashboard", headers=auth_headers)
+
+        _populate(db, test_user, bots=5, sessions_per_bot=4, messages_per_session=6)
+        with _QueryCounter() as large:
+            data = client.get("/api/dashboard", headers=auth_headers).json()
+        assert data["total_chatbots"] == 6
+        assert large.count == small.count <= 5
+
+    def test_other_users_data_excluded(self, mock_stats, client, auth_headers, auth_headers_b, db, test_user):
+        """User B's dashboard does not include User A's chatbots or messages."""
+        _populate(db, test_user)
+        data = client.get("/api/dashboard", headers=auth_headers_b).json()
+        assert data["total_chatbots"] == data["total_messages"] == data["total_documents"] == 0
+        assert data["recent_activity"] == []
+
+
+# ──────────────────────────────────────────────
+#  Usage counters
+# ──────────────────────────────────────────────
+
+class TestUsageCounters:
+    """Counter rows follow the write paths and are repaired by reconciliation."""
+
+    def _chatbot(self, client, auth_headers):
+        return client.post("/api/chatbots", json={"name": "Bot"}, headers=auth_headers).json()["id"]
+
+    def test_session_create_and_delete(self, client, auth_headers, db):
+        """Creating and deleting a session moves the chatbot's session count."""
+        chatbot_id = self._chatbot(client, auth_headers)
+        session_id = client.post(f"/api/chatbots/{chatbot_id}/sessions", headers=auth_headers).json()["id"]
+        usage = db.get(ChatbotUsage, uuid.UUID(chatbot_id))
+        assert usage.sessions == 1
+
+        client.delete(f"/api/chatbots/{chatbot_id}/sessions/{session_id}", headers=auth_headers)
+        db.refresh(usage)
+        assert usage.sessions == 0
+
+    @patch("app.routers.documents.upload_file")
+    @patch("app.routers.documents.delete_file")
+    def test_document_upload_and_delete(self, mock_delete, mock_upload, client, auth_headers, db, test_user):
+        """Uploading and deleting a document moves the user's document and storage totals."""
+        res = client.post(
+            "/api/documents", files={"file": ("a.txt", b"hello world", "text/plain")}, headers=auth_headers,
+        )
+        usage = db.get(UserUsage, test_user.id)
+        assert (usage.documents, usage.storage_bytes) == (1, 11)
+
+        client.delete(f"/api/documents/{res.json()['id']}", headers=auth_headers)
+        db.refresh(usage)
+        assert (usage.documents, usage.storage_bytes) == (0, 0)
+
+    def test_reconcile_repairs_drift(self, db, test_user):
+        """Counters that disagree with the raw tables are recomputed; correct ones are left alone."""
+        _populate(db, test_user, bots=2, sessions_per_bot=2, messages_per_session=3)
+        bot = db.query(Chatbot).first()
+        usage = db.get(ChatbotUsage, bot.id)
+        usage.sessions, usage.messages = 99, 0
+        db.commit()
+
+        assert reconcile_usage(db) == 1
+        db.refresh(usage)
+        assert (usage.sessions, usage.messages) == (2, 6)
+        assert reconcile_usage(db) == 0
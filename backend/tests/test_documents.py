@@ -161,6 +161,43 @@ class TestDocumentDelete:
         list_res = client.get("/api/documents", headers=auth_headers)
         assert list_res.json()["total"] == 0
 
+    @patch("app.routers.documents.delete_document_vectors")
+    @patch("app.routers.chatbots.index_chatbot_documents")
+    @patch("app.routers.documents.delete_file")
+    @patch("app.routers.documents.upload_file")
+    def test_delete_removes_vectors_from_chatbots(
+        self, mock_upload, mock_delete, mock_index, mock_vectors, client, auth_headers,
+    ):
+        """Deleting an assigned document queues removal of its chunks from each chatbot that used it."""
+        mock_upload.return_value = "fake-key"
+        doc_id = client.post(
+            "/api/documents", headers=auth_headers,
+            files={"file": ("shared.txt", b"content", "text/plain")},
+        ).json()["id"]
+        bot_ids = [
+            client.post("/api/chatbots", headers=auth_headers, json={"name": name, "document_ids": [doc_id]}).json()["id"]
+            for name in ("Bot A", "Bot B")
+        ]
+
+        res = client.delete(f"/api/documents/{doc_id}", headers=auth_headers)
+        assert res.status_code == 200
+        document_id, chatbot_ids = mock_vectors.call_args.args
+        assert document_id == uuid.UUID(doc_id)
+        assert sorted(map(str, chatbot_ids)) == sorted(bot_ids)
+
+    @patch("app.routers.documents.delete_document_vectors")
+    @patch("app.routers.documents.delete_file")
+    @patch("app.routers.documents.upload_file")
+    def test_delete_unassigned_skips_vectors(self, mock_upload, mock_delete, mock_vectors, client, auth_headers):
+        """A document no chatbot uses has no vectors to remove."""
+        mock_upload.return_value = "fake-key"
+        doc_id = client.post(
+            "/api/documents", headers=auth_headers,
+            files={"file": ("alone.txt", b"content", "text/plain")},
+        ).json()["id"]
+        assert client.delete(f"/api/documents/{doc_id}", headers=auth_headers).status_code == 200
+        mock_vectors.assert_not_called()
+
     def test_delete_nonexistent(self, client, auth_headers):
         """Deleting a non-existent document returns 404."""
         fake_id = str(uuid.uuid4())
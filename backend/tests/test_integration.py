@@ -16,12 +16,13 @@ class TestUserJourney:
 
     @patch("app.routers.chat.cache_response")
     @patch("app.routers.chat.get_cached_response", return_value=None)
+    @patch("app.routers.chat.get_embed_model")
     @patch("app.routers.chat.get_llm")
     @patch("app.routers.chat.load_chatbot_index")
     @patch("app.routers.chatbots.index_chatbot_documents")
     @patch("app.routers.documents.upload_file")
     def test_full_flow(
-        self, mock_upload, mock_index, mock_load_idx, mock_llm,
+        self, mock_upload, mock_index, mock_load_idx, mock_llm, mock_embed,
         mock_cache_get, mock_cache_set, client
     ):
         """Register → upload doc → create chatbot with doc → chat."""
@@ -70,7 +71,7 @@ class TestUserJourney:
         mock_response.source_nodes = [mock_source]
 
         mock_qe = MagicMock()
-        mock_qe.query.return_value = mock_response
+        mock_qe.synthesize.return_value = mock_response
         mock_load_idx.return_value.as_query_engine.return_value = mock_qe
 
         chat_res = client.post(f"/api/chat/{bot_id}", headers=headers, json={
@@ -84,11 +85,12 @@ class TestUserJourney:
 
     @patch("app.routers.chat.cache_response")
     @patch("app.routers.chat.get_cached_response", return_value=None)
+    @patch("app.routers.chat.get_embed_model")
     @patch("app.routers.chat.get_llm")
     @patch("app.routers.chat.load_chatbot_index")
     @patch("app.routers.documents.upload_file")
     def test_multi_session_chat(
-        self, mock_upload, mock_load_idx, mock_llm,
+        self, mock_upload, mock_load_idx, mock_llm, mock_embed,
         mock_cache_get, mock_cache_set, client, auth_headers
     ):
         """Create chatbot, chat in multiple sessions, verify isolation."""
@@ -108,7 +110,7 @@ class TestUserJourney:
         mock_response.__str__ = lambda self: "Answer"
         mock_response.source_nodes = []
         mock_qe = MagicMock()
-        mock_qe.query.return_value = mock_response
+        mock_qe.synthesize.return_value = mock_response
         mock_load_idx.return_value.as_query_engine.return_value = mock_qe
 
         # First chat — creates session 1
@@ -212,6 +214,7 @@ class TestChatbotLifecycle:
 class TestDocumentLifecycle:
     """Full document lifecycle with chatbot assignment."""
 
+    @patch("app.routers.documents.delete_document_vectors")
     @patch("app.routers.chatbots.clear_chatbot_cache")
     @patch("app.routers.chatbots.index_chatbot_documents")
     @patch("app.routers.chatbots.delete_chatbot_index")
@@ -219,7 +222,7 @@ class TestDocumentLifecycle:
     @patch("app.routers.documents.upload_file")
     def test_upload_assign_reassign_delete(
         self, mock_upload, mock_delete_file, mock_delete_idx,
-        mock_index, mock_cache, client, auth_headers
+        mock_index, mock_cache, mock_delete_vectors, client, auth_headers
     ):
         """Upload docs → assign to chatbot → reassign → delete doc."""
         mock_upload.return_value = "fake-key"
@@ -251,8 +254,9 @@ class TestDocumentLifecycle:
         assert update_res.status_code == 200
         assert update_res.json()["document_count"] == 2
 
-        # Delete doc1
+        # Delete doc1; its chunks are removed from the chatbot's index
         client.delete(f"/api/documents/{doc1_id}", headers=auth_headers)
+        assert [str(i) for i in mock_delete_vectors.call_args.args[1]] == [bot_id]
 
         # Verify doc list
         list_res = client.get("/api/documents", headers=auth_headers)
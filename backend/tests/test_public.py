@@ -0,0 +1,80 @@
+"""
+Unit tests for the public chat endpoints.
+Covers: published chatbot info, unpublished and unknown tokens, and streamed answers.
+Qdrant, embeddings, the LLM and Redis are mocked.
+"""
+
+from unittest.mock import MagicMock, patch
+
+from app.models import Chatbot
+
+
+def _make_chatbot(db, user, published=True):
+    """Helper: a chatbot with an LLM configured, optionally published."""
+    bot = Chatbot(
+        user_id=user.id, name="Public Bot", description="Answers questions",
+        llm_provider="openai", llm_model="gpt-4", llm_api_key="sk-test",
+        public_token="tok-123", is_public="true" if published else "false",
+    )
+    db.add(bot)
+    db.commit()
+    return bot
+
+
+# ──────────────────────────────────────────────
+#  Info
+# ──────────────────────────────────────────────
+
+class TestPublicInfo:
+    """Tests for GET /api/public/{token}."""
+
+    def test_published_chatbot(self, client, db, test_user):
+        """A published chatbot's branding is returned without authentication."""
+        _make_chatbot(db, test_user)
+        res = client.get("/api/public/tok-123")
+        assert res.status_code == 200
+        data = res.json()
+        assert data["name"] == "Public Bot"
+        assert data["accent_primary"] == "#715A5A"
+        assert data["has_avatar"] is False
+
+    def test_unpublished_chatbot(self, client, db, test_user):
+        """An unpublished chatbot is not found."""
+        _make_chatbot(db, test_user, published=False)
+        assert client.get("/api/public/tok-123").status_code == 404
+
+    def test_unknown_token(self, client):
+        """An unknown token is not found."""
+        assert client.get("/api/public/nope").status_code == 404
+
+
+# ──────────────────────────────────────────────
+#  Chat
+# ──────────────────────────────────────────────
+
+class TestPublicChat:
+    """Tests for POST /api/public/{token}/chat."""
+
+    @patch("app.routers.public.get_cache_generation", return_value=None)
+    @patch("app.routers.chat.get_embed_model")
+    @patch("app.routers.public.get_llm")
+    @patch("app.routers.public.load_chatbot_index")
+    def test_streams_answer_and_sources(self, mock_index, mock_llm, mock_embed, mock_gen, client, db, test_user):
+        """The answer is streamed token by token, followed by the sources marker."""
+        _make_chatbot(db, test_user)
+        streaming_response = MagicMock()
+        streaming_response.response_gen = iter(["Hel", "lo"])
+        streaming_response.source_nodes = []
+        mock_index.return_value.as_query_engine.return_value.synthesize.return_value = streaming_response
+
+        res = client.post("/api/public/tok-123/chat", json={"message": "hi"})
+        assert res.status_code == 200
+        assert res.text == "Hello\n\n__SOURCES__[]"
+
+    @patch("app.routers.public.get_cache_generation", return_value=None)
+    @patch("app.routers.public.load_chatbot_index", side_effect=ValueError("Chatbot index not found."))
+    def test_missing_index(self, mock_index, mock_gen, client, db, test_user):
+        """A chatbot without an index returns 400."""
+        _make_chatbot(db, test_user)
+        res = client.post("/api/public/tok-123/chat", json={"message": "hi"})
+        assert res.status_code == 400
@@ -1,17 +1,23 @@
 """
 Unit tests for the RAG pipeline.
 Covers: document parsing, indexing helpers, chat endpoints,
-cache service, and evaluation endpoints.
+write-behind message persistence, cache service, and evaluation endpoints.
 All external services (Qdrant, OpenAI, Redis, S3, LLMs) are mocked.
 """
 
+import asyncio
 import uuid
 import json
+from contextlib import nullcontext
 from unittest.mock import patch, MagicMock
 
-from app.models import Chatbot, Document
+import pytest
+
+from app.config import settings
+from app.models import Chatbot, ChatbotUsage, ChatMessage, ChatSession, Document
+from app.services import message_writer
 from app.services.indexing import (
-    parse_pdf_pages, parse_txt, get_collection_name,
+    parse_pdf_pages, parse_txt, get_collection_name, get_version_name, _document_filter,
 )
 
 
@@ -88,6 +94,431 @@ class TestIndexingHelpers:
         b = get_collection_name(uuid.uuid4())
         assert a != b
 
+    def _make_txt_documents(self, db, user, texts):
+        """Helper: a chatbot and TXT documents in the test DB; returns (chatbot, docs, contents)."""
+        chatbot = Chatbot(user_id=user.id, name="Index Bot")
+        docs = [
+            Document(
+                user_id=user.id, filename=f"doc-{i}.txt", original_filename=f"doc-{i}.txt", file_type="txt",
+                file_size=len(text.encode()), s3_key=f"doc-{i}", status="uploaded",
+            )
+            for i, text in enumerate(texts)
+        ]
+        db.add_all([chatbot, *docs])
+        db.commit()
+        return chatbot, docs, {doc.s3_key: text.encode() for doc, text in zip(docs, texts)}
+
+    def _run_indexing(self, db, chatbot, docs, contents, mock_embed, job_id=None, qdrant=None):
+        """
+        Helper: run indexing with storage and Redis mocked; returns (chunks, store, qdrant, redis).
+        Qdrant is mocked unless a client (e.g. in-memory) is passed, in which case store is None.
+        """
+        from app.services.indexing import index_chatbot_documents
+        from tests.conftest import TestingSessionLocal
+
+        if not mock_embed.return_value.get_text_embedding_batch.side_effect:
+            mock_embed.return_value.get_text_embedding_batch.side_effect = lambda batch: [[0.1, 0.2]] * len(batch)
+
+        with patch("app.services.indexing.get_file", side_effect=contents.__getitem__), \
+             patch("app.services.indexing.get_qdrant_client", return_value=qdrant or MagicMock()) as mock_qdrant, \
+             nullcontext() if qdrant else patch("app.services.indexing.QdrantVectorStore") as mock_store, \
+             patch("app.services.indexing_progress.SessionLocal", TestingSessionLocal), \
+             patch("app.services.indexing.SessionLocal", TestingSessionLocal), \
+             patch("app.services.cache.get_redis_client") as mock_redis, \
+             patch("app.services.indexing.invalidate_chatbot_caches"):
+            try:
+                chunks = index_chatbot_documents(chatbot.id, docs, job_id=job_id)
+            except Exception:
+                chunks = None
+        db.expire_all()
+        store = mock_store.return_value if mock_store else None
+        return chunks, store, mock_qdrant.return_value, mock_redis.return_value
+
+    def _index_txt_documents(self, db, user, texts, mock_embed):
+        """Helper: index TXT documents against the test DB; returns (chunks, store, docs, redis)."""
+        chatbot, docs, contents = self._make_txt_documents(db, user, texts)
+        chunks, store, _, redis_client = self._run_indexing(db, chatbot, docs, contents, mock_embed)
+        return chunks, store, docs, redis_client
+
+    @patch("app.services.indexing.EMBED_BATCH_SIZE", 4)
+    @patch("app.services.indexing.get_embed_model")
+    def test_indexing_embeds_in_fixed_batches(self, mock_embed, db, test_user):
+        """Chunks from all documents are embedded and upserted in batches of EMBED_BATCH_SIZE."""
+        paragraph = "Refund policy applies to annual plans. " * 60
+        chunks, store, _, _ = self._index_txt_documents(db, test_user, [paragraph * 3, paragraph * 2], mock_embed)
+
+        batch_sizes = [len(c.args[0]) for c in store.add.call_args_list]
+        assert sum(batch_sizes) == chunks > 4
+        assert all(size == 4 for size in batch_sizes[:-1])
+        assert 0 < batch_sizes[-1] <= 4
+        assert all(node.embedding == [0.1, 0.2] for c in store.add.call_args_list for node in c.args[0])
+
+    @patch("app.services.indexing.EMBED_BATCH_SIZE", 4)
+    @patch("app.services.indexing.get_embed_model")
+    def test_indexing_records_progress(self, mock_embed, db, test_user):
+        """Per-job and per-document counters, timings and statuses are persisted and published."""
+        from app.models import IndexingJob
+
+        paragraph = "Refund policy applies to annual plans. " * 60
+        texts = [paragraph * 3, "Short document."]
+        chunks, _, docs, redis_client = self._index_txt_documents(db, test_user, texts, mock_embed)
+
+        job = db.query(IndexingJob).one()
+        assert job.status == "completed"
+        assert job.documents_total == job.documents_done == 2
+        assert job.chunks_total == job.chunks_embedded == job.chunks_upserted == chunks
+        assert job.pages_parsed == 2
+        assert job.bytes_processed == job.bytes_total == sum(len(t.encode()) for t in texts)
+        assert set(json.loads(job.stage_timings)) == {"download", "parse", "chunk", "embed", "upsert"}
+        assert job.started_at and job.completed_at
+
+        by_doc = {d.document_id: d for d in job.documents}
+        for doc in docs:
+            assert doc.status == "ready"
+            assert by_doc[doc.id].status == "ready"
+            assert by_doc[doc.id].chunks_upserted == by_doc[doc.id].chunks_total > 0
+
+        channel, payload = redis_client.publish.call_args.args
+        assert channel == f"indexing:{job.chatbot_id}"
+        assert json.loads(payload)["status"] == "completed"
+
+    @patch("app.services.indexing.get_embed_model")
+    def test_indexing_skips_unparseable_documents(self, mock_embed, db, test_user):
+        """A document that fails to parse is marked failed with its reason and indexes nothing."""
+        from app.models import IndexingJob
+        from app.services.indexing import _parse_document
+
+        def parse(doc, content):
+            if content == b"corrupt":
+                raise ValueError("corrupt")
+            return _parse_document(doc, content)
+
+        with patch("app.services.indexing._parse_document", side_effect=parse):
+            chunks, store, docs, _ = self._index_txt_documents(db, test_user, ["corrupt", "Short document."], mock_embed)
+        assert chunks == 1
+        assert docs[0].status == "failed"
+
+        job = db.query(IndexingJob).one()
+        assert job.status == "completed"
+        assert job.documents_failed == 1
+        assert job.documents[0].error_message == "corrupt"
+
+    @patch("app.services.indexing.get_embed_model")
+    def test_no_chunks_keeps_live_index(self, mock_embed, db, test_user):
+        """A job whose documents all fail to parse fails instead of removing the live index."""
+        from app.models import IndexingJob
+
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, ["Short document."])
+        with patch("app.services.indexing._parse_document", side_effect=ValueError("corrupt")):
+            chunks, store, qdrant, _ = self._run_indexing(db, chatbot, docs, contents, mock_embed)
+        assert chunks is None
+        store.add.assert_not_called()
+        qdrant.update_collection_aliases.assert_not_called()
+        assert db.query(IndexingJob).one().status == "failed"
+
+    @patch("app.services.indexing.get_embed_model")
+    def test_storage_outage_keeps_live_index(self, mock_embed, db, test_user):
+        """Documents that can't be downloaded fail the job, leave the live index alone, and are retried on resume."""
+        from qdrant_client import QdrantClient
+        from app.models import IndexingJob
+        from app.services.indexing import get_live_collection
+
+        qdrant = QdrantClient(":memory:")
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, ["First document.", "Second document."])
+        self._run_indexing(db, chatbot, docs, contents, mock_embed, qdrant=qdrant)
+        live = get_live_collection(qdrant, chatbot.id)
+
+        partial = {docs[0].s3_key: contents[docs[0].s3_key]}
+        chunks, *_ = self._run_indexing(db, chatbot, docs, partial, mock_embed, qdrant=qdrant)
+        assert chunks is None
+        assert get_live_collection(qdrant, chatbot.id) == live
+        job = db.query(IndexingJob).order_by(IndexingJob.created_at.desc()).first()
+        assert job.status == "failed"
+        assert job.documents_failed == 1
+        assert "could not be downloaded" in job.error_message
+
+        self._run_indexing(db, chatbot, docs, contents, mock_embed, job_id=job.id, qdrant=qdrant)
+        db.refresh(job)
+        assert job.status == "completed"
+        assert get_live_collection(qdrant, chatbot.id) == get_version_name(chatbot.id, job.id)
+
+    @patch("app.services.indexing.get_embed_model")
+    def test_indexing_failure_fails_job(self, mock_embed, db, test_user):
+        """An embedding error fails the job and every unfinished document with the reason."""
+        from app.models import IndexingJob
+
+        with patch("app.services.indexing._embed_and_store", side_effect=RuntimeError("rate limited")):
+            chunks, _, docs, _ = self._index_txt_documents(db, test_user, ["Short document."], mock_embed)
+        assert chunks is None
+
+        job = db.query(IndexingJob).one()
+        assert job.status == "failed"
+        assert job.error_message == "rate limited"
+        assert job.documents[0].status == "failed"
+        assert docs[0].status == "failed"
+
+    @patch("app.services.indexing.EMBED_BATCH_SIZE", 4)
+    @patch("app.services.indexing.get_embed_model")
+    def test_resumed_job_skips_upserted_chunks(self, mock_embed, db, test_user):
+        """A failed job resumes from its checkpoint and only then replaces the previous index."""
+        from app.models import IndexingJob
+
+        paragraph = "Refund policy applies to annual plans. " * 60
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, [paragraph * 6, paragraph * 4])
+
+        calls = []
+        def flaky_embed(batch):
+            calls.append(batch)
+            if len(calls) == 3:
+                raise RuntimeError("rate limited")
+            return [[0.1, 0.2]] * len(batch)
+        mock_embed.return_value.get_text_embedding_batch.side_effect = flaky_embed
+
+        chunks, store, qdrant, _ = self._run_indexing(db, chatbot, docs, contents, mock_embed)
+        assert chunks is None
+        qdrant.delete_collection.assert_not_called()
+        qdrant.update_collection_aliases.assert_not_called()  # the previous index keeps serving
+        first_run = [node.node_id for c in store.add.call_args_list for node in c.args[0]]
+        job = db.query(IndexingJob).one()
+        assert job.status == "failed"
+        assert job.chunks_upserted == len(first_run) == 8
+
+        chunks, store, qdrant, _ = self._run_indexing(db, chatbot, docs, contents, mock_embed, job_id=job.id)
+        second_run = [node.node_id for c in store.add.call_args_list for node in c.args[0]]
+        assert not set(first_run) & set(second_run)
+        assert chunks == len(first_run) + len(second_run)
+
+        job = db.query(IndexingJob).one()
+        assert job.status == "completed"
+        assert job.attempts == 2
+        assert job.error_message is None
+        assert job.chunks_upserted == job.chunks_total == chunks
+        assert all(d.status == "ready" for d in job.documents)
+        # Chat switches to the resumed job's version only once it is complete
+        operation = qdrant.update_collection_aliases.call_args.kwargs["change_aliases_operations"][-1]
+        assert operation.create_alias.collection_name == get_version_name(chatbot.id, job.id)
+
+    @patch("app.services.indexing.get_embed_model")
+    def test_superseded_job_discards_its_version(self, mock_embed, db, test_user):
+        """A job that finishes after a newer one was queued leaves the alias to the newer job."""
+        from qdrant_client import QdrantClient
+        from app.models import IndexingJob
+        from app.services.indexing import get_live_collection
+        from app.services.indexing_progress import create_indexing_job
+
+        qdrant = QdrantClient(":memory:")
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, ["Old document.", "New document."])
+        older = create_indexing_job(chatbot.id, docs[:1], db)
+        newer = create_indexing_job(chatbot.id, docs[1:], db)
+
+        self._run_indexing(db, chatbot, docs[1:], contents, mock_embed, job_id=newer.id, qdrant=qdrant)
+        chunks, *_ = self._run_indexing(db, chatbot, docs[:1], contents, mock_embed, job_id=older.id, qdrant=qdrant)
+        assert chunks is None
+        assert get_live_collection(qdrant, chatbot.id) == get_version_name(chatbot.id, newer.id)
+        assert not qdrant.collection_exists(get_version_name(chatbot.id, older.id))
+        assert "Superseded" in db.get(IndexingJob, older.id).error_message
+
+    def test_progress_stream_ends_when_job_stalls(self, db, test_user):
+        """A job whose worker died stops publishing; the stream ends with a stalled event instead of idling."""
+        from unittest.mock import AsyncMock
+        from app.services import indexing_progress
+        from tests.conftest import TestingSessionLocal
+
+        chatbot, docs, _ = self._make_txt_documents(db, test_user, ["Some document."])
+        job = indexing_progress.create_indexing_job(chatbot.id, docs, db)
+        snapshot = indexing_progress.job_to_response(job)
+        pubsub = MagicMock(get_message=AsyncMock(return_value=None), aclose=AsyncMock())
+
+        async def collect(events):
+            return [event async for event in events]
+
+        with patch.object(indexing_progress, "STALE_AFTER", 0), \
+             patch.object(indexing_progress, "POLL_INTERVAL", 0), \
+             patch.object(indexing_progress, "SessionLocal", TestingSessionLocal):
+            streamed = asyncio.run(collect(indexing_progress.stream_progress_events(chatbot.id, snapshot, pubsub)))
+            polled = asyncio.run(collect(indexing_progress._poll_progress_events(chatbot.id, snapshot)))
+        for events in (streamed, polled):
+            assert events[-1].startswith("event: stalled")
+            assert json.loads(events[-1].split("data: ", 1)[1])["id"] == str(job.id)
+        pubsub.aclose.assert_awaited_once()
+
+    @patch("app.services.indexing.EMBED_BATCH_SIZE", 4)
+    @patch("app.services.indexing.get_embed_model")
+    def test_reindexing_reuses_chunk_ids(self, mock_embed, db, test_user):
+        """The same content gets the same point ids, so a resumed build overwrites rather than duplicates."""
+        paragraph = "Refund policy applies to annual plans. " * 60
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, [paragraph * 2])
+
+        _, store, _, _ = self._run_indexing(db, chatbot, docs, contents, mock_embed)
+        first = [node.node_id for c in store.add.call_args_list for node in c.args[0]]
+        _, store, _, _ = self._run_indexing(db, chatbot, docs, contents, mock_embed)
+        second = [node.node_id for c in store.add.call_args_list for node in c.args[0]]
+        assert first == second
+        assert len(set(first)) == len(first)
+
+    @patch("app.services.indexing.EMBED_BATCH_SIZE", 4)
+    @patch("app.services.indexing.get_embed_model")
+    def test_reindex_keeps_serving_previous_version(self, mock_embed, db, test_user):
+        """The alias moves to a new version only when its build completes; old versions outlive a grace period."""
+        from qdrant_client import QdrantClient
+        from app.models import IndexingJob
+        from app.services.indexing import collect_index_versions, get_live_collection
+        from tests.conftest import TestingSessionLocal
+
+        qdrant = QdrantClient(":memory:")
+        paragraph = "Refund policy applies to annual plans. " * 60
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, [paragraph * 4])
+        first_chunks, *_ = self._run_indexing(db, chatbot, docs, contents, mock_embed, qdrant=qdrant)
+        first = get_version_name(chatbot.id, db.query(IndexingJob).one().id)
+        assert get_live_collection(qdrant, chatbot.id) == first
+        assert qdrant.count(get_collection_name(chatbot.id)).count == first_chunks
+
+        # A second build fails midway: chat keeps reading the first version in full
+        calls = []
+        def flaky_embed(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError("rate limited")
+            return [[0.1, 0.2]] * len(batch)
+        mock_embed.return_value.get_text_embedding_batch.side_effect = flaky_embed
+        self._run_indexing(db, chatbot, docs, contents, mock_embed, qdrant=qdrant)
+        job = db.query(IndexingJob).filter(IndexingJob.status == "failed").one()
+        assert get_live_collection(qdrant, chatbot.id) == first
+        assert qdrant.count(get_collection_name(chatbot.id)).count == first_chunks
+
+        mock_embed.return_value.get_text_embedding_batch.side_effect = lambda batch: [[0.1, 0.2]] * len(batch)
+        self._run_indexing(db, chatbot, docs, contents, mock_embed, job_id=job.id, qdrant=qdrant)
+        second = get_version_name(chatbot.id, job.id)
+        assert get_live_collection(qdrant, chatbot.id) == second
+
+        with patch("app.services.indexing.get_qdrant_client", return_value=qdrant), \
+             patch("app.services.indexing.SessionLocal", TestingSessionLocal):
+            assert collect_index_versions(grace_seconds=3600) == 0
+            assert qdrant.collection_exists(first)
+            assert collect_index_versions(grace_seconds=0) == 1
+        assert not qdrant.collection_exists(first)
+        assert qdrant.count(get_collection_name(chatbot.id)).count == first_chunks
+
+    @patch("app.services.indexing.get_embed_model")
+    def test_document_vectors_removed_and_orphans_swept(self, mock_embed, db, test_user):
+        """Deleting a document removes only its points; the sweep reconciles Qdrant with the database."""
+        from qdrant_client import QdrantClient
+        from app.services.indexing import delete_document_vectors, sweep_orphaned_vectors
+        from tests.conftest import TestingSessionLocal
+
+        qdrant = QdrantClient(":memory:")
+        paragraph = "Refund policy applies to annual plans. " * 60
+        chatbot, docs, contents = self._make_txt_documents(db, test_user, [paragraph * 2, paragraph, "Short."])
+        chatbot.documents = docs
+        db.commit()
+        chunks, *_ = self._run_indexing(db, chatbot, docs, contents, mock_embed, qdrant=qdrant)
+        alias = get_collection_name(chatbot.id)
+
+        def doc_points(doc):
+            return qdrant.count(alias, count_filter=_document_filter([doc.id]), exact=True).count
+
+        removed = doc_points(docs[0])
+        with patch("app.services.indexing.get_qdrant_client", return_value=qdrant), \
+             patch("app.services.indexing.invalidate_chatbot_caches") as mock_invalidate:
+            assert delete_document_vectors(docs[0].id, [chatbot.id]) == removed > 0
+        mock_invalidate.assert_called_once_with(chatbot.id)
+        assert doc_points(docs[0]) == 0
+        assert qdrant.count(alias).count == chunks - removed
+
+        # Unassigning a document leaves orphans for the sweep; so does deleting the chatbot
+        chatbot.documents = [docs[2]]
+        db.commit()
+        with patch("app.services.indexing.get_qdrant_client", return_value=qdrant), \
+             patch("app.services.indexing.SessionLocal", TestingSessionLocal), \
+             patch("app.services.indexing.invalidate_chatbot_caches"):
+            orphaned = doc_points(docs[1])
+            assert sweep_orphaned_vectors() == orphaned > 0
+            assert qdrant.count(alias).count == doc_points(docs[2]) == 1
+            assert sweep_orphaned_vectors() == 0
+
+            db.delete(chatbot)
+            db.commit()
+            sweep_orphaned_vectors()
+        assert qdrant.get_collections().collections == []
+
+    @patch("app.services.indexing.invalidate_chatbot_caches")
+    def test_sweep_spares_builds_in_flight(self, mock_invalidate, db, test_user):
+        """The sweep leaves chatbots with an active job alone and only deletes collections it listed up front."""
+        from qdrant_client import QdrantClient
+        from qdrant_client.http import models as rest
+        from app.services import indexing
+        from app.services.indexing_progress import create_indexing_job
+        from tests.conftest import TestingSessionLocal
+
+        qdrant = QdrantClient(":memory:")
+        params = rest.VectorParams(size=2, distance=rest.Distance.COSINE)
+        building = Chatbot(user_id=test_user.id, name="Building")
+        empty = Chatbot(user_id=test_user.id, name="Empty")
+        db.add_all([building, empty])
+        db.commit()
+        create_indexing_job(building.id, [], db)
+        for chatbot_id in (building.id, empty.id):
+            qdrant.create_collection(get_version_name(chatbot_id, uuid.uuid4()), vectors_config=params)
+        late = get_version_name(empty.id, uuid.uuid4())
+        list_versions = indexing._version_collections
+
+        def snapshot_then_new_build(client):
+            versions = list_versions(client)
+            qdrant.create_collection(late, vectors_config=params)  # a build that starts after the listing
+            return versions
+
+        with patch("app.services.indexing.get_qdrant_client", return_value=qdrant), \
+             patch("app.services.indexing.SessionLocal", TestingSessionLocal), \
+             patch("app.services.indexing._version_collections", side_effect=snapshot_then_new_build):
+            indexing.sweep_orphaned_vectors()
+        names = {c.name for c in qdrant.get_collections().collections}
+        assert names == {late, *indexing._version_collections(qdrant)[building.id]}
+
+    def test_maintenance_runs_on_one_worker(self):
+        """A periodic task is skipped while another worker holds its Redis lock."""
+        from app.services.indexing import _run_periodically
+
+        r = MagicMock()
+        task = MagicMock()
+        stop = MagicMock()
+        with patch("app.services.cache.get_redis_client", return_value=r):
+            r.lock.return_value.acquire.return_value = False
+            stop.wait.side_effect = [False, True]
+            _run_periodically(stop, 60, task, "index-orphan-sweep")
+            task.assert_not_called()
+
+            r.lock.return_value.acquire.return_value = True
+            stop.wait.side_effect = [False, True]
+            _run_periodically(stop, 60, task, "index-orphan-sweep")
+            task.assert_called_once()
+            r.lock.return_value.release.assert_called_once()
+        r.lock.assert_called_with("lock:index-orphan-sweep", timeout=60, blocking=False)
+
+    @patch("app.services.indexing.invalidate_chatbot_caches")
+    def test_delete_index_removes_alias_and_versions(self, mock_invalidate):
+        """Deleting a chatbot's index drops its alias, every version and any pre-versioning collection."""
+        from qdrant_client import QdrantClient
+        from qdrant_client.http import models as rest
+        from app.services.indexing import delete_chatbot_index, get_live_collection, _switch_alias
+
+        qdrant = QdrantClient(":memory:")
+        bot_id, other_id = uuid.uuid4(), uuid.uuid4()
+        params = rest.VectorParams(size=2, distance=rest.Distance.COSINE)
+        qdrant.create_collection(get_collection_name(bot_id), vectors_config=params)  # pre-versioning index
+        assert get_live_collection(qdrant, bot_id) == get_collection_name(bot_id)
+
+        for chatbot_id in (bot_id, other_id):
+            version = get_version_name(chatbot_id, uuid.uuid4())
+            qdrant.create_collection(version, vectors_config=params)
+            _switch_alias(qdrant, chatbot_id, version)
+        qdrant.create_collection(get_version_name(bot_id, uuid.uuid4()), vectors_config=params)
+        assert get_live_collection(qdrant, bot_id).startswith(f"{get_collection_name(bot_id)}__")
+
+        with patch("app.services.indexing.get_qdrant_client", return_value=qdrant):
+            delete_chatbot_index(bot_id)
+        assert get_live_collection(qdrant, bot_id) is None
+        assert [c.name for c in qdrant.get_collections().collections] == [get_live_collection(qdrant, other_id)]
+
 
 # ──────────────────────────────────────────────
 #  Chat Endpoint
@@ -138,9 +569,10 @@ class TestChatEndpoint:
 
     @patch("app.routers.chat.cache_response")
     @patch("app.routers.chat.get_cached_response", return_value=None)
+    @patch("app.routers.chat.get_embed_model")
     @patch("app.routers.chat.get_llm")
     @patch("app.routers.chat.load_chatbot_index")
-    def test_chat_success(self, mock_index, mock_llm, mock_cache_get, mock_cache_set, client, auth_headers):
+    def test_chat_success(self, mock_index, mock_llm, mock_embed, mock_cache_get, mock_cache_set, client, auth_headers):
         """Successful chat returns response with sources and session."""
         # Mock the query engine
         mock_source = MagicMock()
@@ -153,7 +585,7 @@ class TestChatEndpoint:
         mock_response.source_nodes = [mock_source]
 
         mock_query_engine = MagicMock()
-        mock_query_engine.query.return_value = mock_response
+        mock_query_engine.synthesize.return_value = mock_response
         mock_index.return_value.as_query_engine.return_value = mock_query_engine
 
         bot_id = self._create_configured_chatbot(client, auth_headers)
@@ -206,6 +638,154 @@ class TestChatEndpoint:
         assert res.status_code == 404
 
 
+# ──────────────────────────────────────────────
+#  Metrics
+# ──────────────────────────────────────────────
+
+class TestMetrics:
+    """Tests for the Prometheus endpoint and chat stage timings."""
+
+    def _stage_count(self, endpoint, stage):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(
+            "bouldy_chat_stage_duration_seconds_count",
+            {"endpoint": endpoint, "stage": stage, "provider": "openai", "model": "gpt-4"},
+        ) or 0
+
+    def test_metrics_endpoint_labels_route_template(self, client, auth_headers):
+        """Request metrics are labeled by route template, not raw path."""
+        client.get("/api/chatbots", headers=auth_headers)
+
+        res = client.get("/api/metrics")
+        assert res.status_code == 200
+        assert res.headers["content-type"].startswith("text/plain")
+        assert 'route="/api/chatbots"' in res.text
+        assert "bouldy_http_request_duration_seconds_bucket" in res.text
+
+    @patch("app.routers.chat.cache_response")
+    @patch("app.routers.chat.get_cached_response", return_value=None)
+    @patch("app.routers.chat.get_embed_model")
+    @patch("app.routers.chat.get_llm")
+    @patch("app.routers.chat.load_chatbot_index")
+    def test_stream_records_stage_timings(
+        self, mock_index, mock_llm, mock_embed, mock_cache_get, mock_cache_set, client, auth_headers,
+    ):
+        """A streamed chat records every stage, labeled by provider and model."""
+        streaming_response = MagicMock()
+        streaming_response.response_gen = iter(["Hel", "lo"])
+        streaming_response.source_nodes = []
+        mock_index.return_value.as_query_engine.return_value.synthesize.return_value = streaming_response
+
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={
+            "name": "Stream Bot", "llm_provider": "openai", "llm_model": "gpt-4", "api_key": "sk-test",
+        }).json()["id"]
+
+        stages = ("auth", "session_load", "cache_lookup", "query_embedding",
+                  "qdrant_search", "llm_first_token", "generation", "db_persist")
+        before = {stage: self._stage_count("chat_stream", stage) for stage in stages}
+
+        res = client.post(f"/api/chat/{bot_id}/stream", headers=auth_headers, json={"message": "hi"})
+        assert res.status_code == 200
+        assert res.text.startswith("Hello")
+
+        for stage in stages:
+            assert self._stage_count("chat_stream", stage) == before[stage] + 1, stage
+
+
+class TestTracing:
+    """Tests for OpenTelemetry spans and trace propagation."""
+
+    exporter = None
+
+    @classmethod
+    def setup_class(cls):
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        # The global provider can only be installed once per process
+        if TestTracing.exporter is None:
+            TestTracing.exporter = InMemorySpanExporter()
+            provider = TracerProvider()
+            provider.add_span_processor(SimpleSpanProcessor(TestTracing.exporter))
+            trace.set_tracer_provider(provider)
+
+    def setup_method(self):
+        self.exporter.clear()
+
+    def _spans(self):
+        return {span.name: span for span in self.exporter.get_finished_spans()}
+
+    @patch("app.routers.chat.cache_response")
+    @patch("app.routers.chat.get_cached_response", return_value=None)
+    @patch("app.routers.chat.get_embed_model")
+    @patch("app.routers.chat.get_llm")
+    @patch("app.routers.chat.load_chatbot_index")
+    def test_stream_spans_join_request_trace(
+        self, mock_index, mock_llm, mock_embed, mock_cache_get, mock_cache_set, client, auth_headers,
+    ):
+        """Retrieval and the streaming generator are children of the request span."""
+        streaming_response = MagicMock()
+        streaming_response.response_gen = iter(["Hel", "lo"])
+        streaming_response.source_nodes = []
+        mock_index.return_value.as_query_engine.return_value.synthesize.return_value = streaming_response
+
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={
+            "name": "Trace Bot", "llm_provider": "openai", "llm_model": "gpt-4", "api_key": "sk-test",
+        }).json()["id"]
+        self.exporter.clear()
+
+        res = client.post(f"/api/chat/{bot_id}/stream", headers=auth_headers, json={"message": "hi"})
+        assert res.status_code == 200
+
+        spans = self._spans()
+        server = spans["POST /api/chat/{chatbot_id}/stream"]
+        assert server.attributes["http.route"] == "/api/chat/{chatbot_id}/stream"
+        for name in ("chat.retrieve", "embedding.query", "qdrant.search", "chat.stream"):
+            assert spans[name].context.trace_id == server.context.trace_id, name
+        assert spans["chat.retrieve"].parent.span_id == server.context.span_id
+        assert spans["chat.stream"].parent.span_id == server.context.span_id
+        assert spans["chat.stream"].attributes["chat.response_chars"] == 5
+        assert [event.name for event in spans["chat.stream"].events] == ["first_token"]
+
+    @patch("app.services.indexing.invalidate_chatbot_caches")
+    @patch("app.services.indexing.get_qdrant_client")
+    def test_indexing_continues_queued_trace(self, mock_qdrant, mock_invalidate, monkeypatch):
+        """A background indexing job joins the trace of the request that queued it."""
+        from app.services.indexing import index_chatbot_documents
+        from app.tracing import inject_trace_context, tracer
+
+        from tests.conftest import TestingSessionLocal
+        monkeypatch.setattr("app.services.indexing.SessionLocal", TestingSessionLocal)
+
+        with tracer.start_as_current_span("request") as request_span:
+            carrier = inject_trace_context()
+
+        index_chatbot_documents(uuid.uuid4(), [], trace_context=carrier)
+
+        job = self._spans()["indexing.index_chatbot"]
+        assert job.context.trace_id == request_span.get_span_context().trace_id
+        assert job.parent.span_id == request_span.get_span_context().span_id
+        assert job.attributes["indexing.chunks"] == 0
+
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        """The file exporter writes one JSON span per line for offline analysis."""
+        from app.tracing import build_tracer_provider
+
+        path = tmp_path / "traces.jsonl"
+        with patch("app.tracing.settings.tracing_file", str(path)):
+            provider = build_tracer_provider("file")
+        with provider.get_tracer("test").start_as_current_span("outer"):
+            with provider.get_tracer("test").start_as_current_span("inner"):
+                pass
+        provider.shutdown()
+
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [span["name"] for span in spans] == ["inner", "outer"]
+        assert spans[0]["parent_id"] == spans[1]["context"]["span_id"]
+
+
 # ──────────────────────────────────────────────
 #  Chat Helpers
 # ──────────────────────────────────────────────
@@ -243,6 +823,247 @@ class TestChatHelpers:
         assert len(result) <= 101  # boundary + period
         assert result.endswith(".")
 
+    @patch("app.routers.chat.LISettings")
+    @patch("app.routers.chat.QdrantVectorStore")
+    @patch("app.routers.chat.get_embed_model")
+    @patch("app.routers.chat.get_qdrant_client")
+    def test_index_handle_reused_within_generation(self, mock_qdrant, mock_embed, mock_store, mock_settings):
+        """Index handles are reused until the cache generation changes."""
+        from app.routers.chat import load_chatbot_index, get_collection_name
+
+        bot_id = uuid.uuid4()
+        alias = MagicMock(alias_name=get_collection_name(bot_id), collection_name=f"{get_collection_name(bot_id)}__v1")
+        mock_qdrant.return_value.get_aliases.return_value.aliases = [alias]
+
+        with patch("app.routers.chat.VectorStoreIndex") as mock_index_cls:
+            mock_index_cls.from_vector_store.side_effect = lambda store: MagicMock()
+            first = load_chatbot_index(bot_id, 1)
+            assert load_chatbot_index(bot_id, 1) is first
+            assert load_chatbot_index(bot_id, 2) is not first
+            assert mock_index_cls.from_vector_store.call_count == 2
+
+    @patch("app.routers.chat.MAX_INDEX_HANDLES", 2)
+    @patch("app.routers.chat.LISettings")
+    @patch("app.routers.chat.QdrantVectorStore")
+    @patch("app.routers.chat.get_embed_model")
+    @patch("app.routers.chat.get_live_collection", return_value="live")
+    @patch("app.routers.chat.get_qdrant_client")
+    def test_index_handles_bounded_and_invalidated(self, mock_qdrant, mock_live, mock_embed, mock_store, mock_settings):
+        """Only the most recently used handles are kept, and an invalidation message drops a chatbot's handle."""
+        from app.routers.chat import _drop_index_handle, _index_handles, load_chatbot_index
+
+        bots = [uuid.uuid4() for _ in range(3)]
+        with patch("app.routers.chat.VectorStoreIndex") as mock_index_cls:
+            mock_index_cls.from_vector_store.side_effect = lambda store: MagicMock()
+            for bot_id in (bots[0], bots[1], bots[0], bots[2]):
+                load_chatbot_index(bot_id, 1)
+            assert list(_index_handles) == [bots[0], bots[2]]
+
+            _drop_index_handle(f"{bots[0]}:2".encode())
+            assert list(_index_handles) == [bots[2]]
+
+
+# ──────────────────────────────────────────────
+#  Message Writer (write-behind persistence)
+# ──────────────────────────────────────────────
+
+class TestMessageWriter:
+    """Tests for buffered chat message writes."""
+
+    @pytest.fixture(autouse=True)
+    def empty_buffer(self):
+        yield
+        with message_writer._lock:
+            message_writer._messages.clear()
+            message_writer._touches.clear()
+            message_writer._titles.clear()
+
+    def _session(self, db, user, title="New Chat"):
+        bot = Chatbot(user_id=user.id, name="Writer Bot")
+        db.add(bot)
+        db.commit()
+        session = ChatSession(chatbot_id=bot.id, user_id=user.id, title=title)
+        db.add(session)
+        db.commit()
+        return session
+
+    @patch("app.routers.chat.cache_response")
+    @patch("app.routers.chat.get_cached_response", return_value={"response": "Cached answer", "sources": []})
+    def test_chat_turn_written_in_one_flush(self, mock_cache_get, mock_cache_set, client, auth_headers, db):
+        """A chat turn's messages, title and usage are written by the flush, not the request."""
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={
+            "name": "Chat Bot", "llm_provider": "openai", "llm_model": "gpt-4", "api_key": "sk-test",
+        }).json()["id"]
+        res = client.post(f"/api/chat/{bot_id}", headers=auth_headers, json={"message": "cached question"})
+        assert res.status_code == 200
+        message_writer.flush()
+
+        session_id = uuid.UUID(res.json()["session_id"])
+        db.expire_all()
+        messages = db.query(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(
+            ChatMessage.created_at,
+        ).all()
+        assert [(m.role, m.content) for m in messages] == [("user", "cached question"), ("assistant", "Cached answer")]
+        assert db.get(ChatSession, session_id).title == "cached question"
+        usage = db.get(ChatbotUsage, uuid.UUID(bot_id))
+        assert (usage.sessions, usage.messages) == (1, 2)
+
+    def test_history_includes_buffered_messages(self, db, test_user):
+        """Memory context sees messages that are still waiting to be written."""
+        from app.routers.chat import get_chat_history
+        from tests.conftest import TestingAsyncSessionLocal
+
+        session = self._session(db, test_user)
+        message_writer.enqueue_message(session.chatbot_id, session.id, "user", "first", None)
+        message_writer.enqueue_message(session.chatbot_id, session.id, "assistant", "reply", None)
+
+        async def history():
+            async with TestingAsyncSessionLocal() as async_db:
+                return await get_chat_history(session, async_db)
+
+        assert [m.content for m in asyncio.run(history())] == ["first", "reply"]
+
+    def test_failed_flush_keeps_buffer(self, db, test_user):
+        """A flush that fails leaves everything buffered for the next attempt."""
+        from tests.conftest import TestingSessionLocal
+
+        session = self._session(db, test_user)
+        message_writer.enqueue_message(session.chatbot_id, session.id, "user", "hello", None)
+
+        with patch("app.services.message_writer.SessionLocal", side_effect=RuntimeError("db down")):
+            assert message_writer.flush() == 0
+        assert len(message_writer.pending_messages(session.id)) == 1
+
+        with patch("app.services.message_writer.SessionLocal", TestingSessionLocal):
+            assert message_writer.flush() == 1
+        assert message_writer.pending_messages(session.id) == []
+        assert db.query(ChatMessage).filter(ChatMessage.session_id == session.id).count() == 1
+
+    def test_deleted_session_dropped(self, db, test_user):
+        """Messages for a session deleted before the flush are dropped instead of failing the batch."""
+        from tests.conftest import TestingSessionLocal
+
+        session = self._session(db, test_user)
+        message_writer.enqueue_message(session.chatbot_id, uuid.uuid4(), "user", "orphan", None)
+        message_writer.enqueue_message(session.chatbot_id, session.id, "user", "kept", None)
+
+        with patch("app.services.message_writer.SessionLocal", TestingSessionLocal):
+            assert message_writer.flush() == 1
+        assert message_writer._messages == []
+
+    def test_bad_row_isolated(self, db, test_user):
+        """A row the database rejects is dropped on its own; the rest of the batch is written."""
+        from app.metrics import CHAT_WRITE_DROPPED
+        from tests.conftest import TestingSessionLocal
+
+        session = self._session(db, test_user)
+        for content in ("one", "two", "three"):
+            message_writer.enqueue_message(session.chatbot_id, session.id, "user", content, None)
+        message_writer._messages[1]["role"] = None  # violates NOT NULL
+        dropped = CHAT_WRITE_DROPPED._value.get()
+
+        with patch("app.services.message_writer.SessionLocal", TestingSessionLocal):
+            assert message_writer.flush() == 2
+        assert message_writer._messages == []
+        assert CHAT_WRITE_DROPPED._value.get() == dropped + 1
+        contents = {m.content for m in db.query(ChatMessage).filter(ChatMessage.session_id == session.id)}
+        assert contents == {"one", "three"}
+        db.expire_all()
+        assert db.get(ChatbotUsage, session.chatbot_id).messages == 2
+
+    def test_retry_skips_rows_already_written(self, db, test_user):
+        """Rows committed before a retried flush failed are neither written twice nor counted as dropped."""
+        from app.metrics import CHAT_WRITE_DROPPED
+        from tests.conftest import TestingSessionLocal
+
+        session = self._session(db, test_user)
+        for content in ("one", "two"):
+            message_writer.enqueue_message(session.chatbot_id, session.id, "user", content, None)
+        with patch("app.services.message_writer.SessionLocal", TestingSessionLocal):
+            message_writer._write(message_writer._messages[:1], {}, {})  # an earlier attempt got this far
+            dropped = CHAT_WRITE_DROPPED._value.get()
+            assert message_writer.flush() == 1
+        assert CHAT_WRITE_DROPPED._value.get() == dropped
+        assert db.query(ChatMessage).filter(ChatMessage.session_id == session.id).count() == 2
+        db.expire_all()
+        assert db.get(ChatbotUsage, session.chatbot_id).messages == 2
+
+    @patch("app.routers.chat.cache_response")
+    @patch("app.routers.chat.get_cached_response", return_value={"response": "Cached answer", "sources": []})
+    def test_full_buffer_writes_directly(self, mock_cache_get, mock_cache_set, client, auth_headers, db,
+                                         monkeypatch):
+        """With the buffer full, a chat turn is written during the request instead of buffered."""
+        monkeypatch.setattr(settings, "chat_write_max_buffer", 0)
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={
+            "name": "Chat Bot", "llm_provider": "openai", "llm_model": "gpt-4", "api_key": "sk-test",
+        }).json()["id"]
+        res = client.post(f"/api/chat/{bot_id}", headers=auth_headers, json={"message": "cached question"})
+        assert res.status_code == 200
+
+        assert message_writer._messages == []
+        session_id = uuid.UUID(res.json()["session_id"])
+        assert db.query(ChatMessage).filter(ChatMessage.session_id == session_id).count() == 2
+
+    def test_drain_retries_then_gives_up(self, db, test_user, monkeypatch, caplog):
+        """Shutdown retries failed flushes, and logs an error if messages are still unwritten."""
+        from tests.conftest import TestingSessionLocal
+
+        monkeypatch.setattr(message_writer, "DRAIN_RETRY_DELAY", 0)
+        session = self._session(db, test_user)
+        message_writer.enqueue_message(session.chatbot_id, session.id, "user", "hello", None)
+
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("db down")
+            return TestingSessionLocal()
+
+        with patch("app.services.message_writer.SessionLocal", side_effect=flaky):
+            assert message_writer.drain()
+        assert len(calls) == 2
+        assert db.query(ChatMessage).filter(ChatMessage.session_id == session.id).count() == 1
+
+        message_writer.enqueue_message(session.chatbot_id, session.id, "user", "lost", None)
+        with patch("app.services.message_writer.SessionLocal", side_effect=RuntimeError("db down")):
+            assert not message_writer.drain()
+        assert "1 messages were not saved" in caplog.text
+
+    @patch("app.routers.chat.cache_response")
+    @patch("app.routers.chat.get_cached_response", return_value={"response": "Cached answer", "sources": []})
+    def test_session_reads_include_buffered_messages(self, mock_cache_get, mock_cache_set, client, auth_headers):
+        """Session listings, details and message pages show a chat turn before its flush is due."""
+        bot_id = client.post("/api/chatbots", headers=auth_headers, json={
+            "name": "Chat Bot", "llm_provider": "openai", "llm_model": "gpt-4", "api_key": "sk-test",
+        }).json()["id"]
+        session_id = client.post(f"/api/chat/{bot_id}", headers=auth_headers,
+                                 json={"message": "cached question"}).json()["session_id"]
+        assert message_writer.has_pending(uuid.UUID(bot_id), uuid.UUID(session_id))
+
+        detail = client.get(f"/api/chatbots/{bot_id}/sessions/{session_id}", headers=auth_headers).json()
+        assert detail["message_count"] == 2
+        assert detail["title"] == "cached question"
+        assert [m["content"] for m in detail["messages"]] == ["cached question", "Cached answer"]
+
+        client.post(f"/api/chat/{bot_id}", headers=auth_headers, json={"message": "second chat"})
+        listing = client.get(f"/api/chatbots/{bot_id}/sessions", headers=auth_headers).json()
+        assert [s["message_count"] for s in listing["sessions"]] == [2, 2]
+        assert listing["sessions"][0]["title"] == "second chat"
+        page = client.get(f"/api/chatbots/{bot_id}/sessions/{session_id}/messages", headers=auth_headers).json()
+        assert len(page["messages"]) == 2
+
+    def test_renamed_session_keeps_title(self, db, test_user):
+        """An auto-title never overwrites a session the user has renamed."""
+        from tests.conftest import TestingSessionLocal
+
+        session = self._session(db, test_user, title="Renamed")
+        message_writer.set_title(session.id, "first message")
+        with patch("app.services.message_writer.SessionLocal", TestingSessionLocal):
+            message_writer.flush()
+        db.expire_all()
+        assert db.get(ChatSession, session.id).title == "Renamed"
+
 
 # ──────────────────────────────────────────────
 #  Cache Service
@@ -251,6 +1072,13 @@ class TestChatHelpers:
 class TestCacheService:
     """Tests for Redis-based semantic cache (mocked)."""
 
+    def setup_method(self):
+        from app.services.cache import local_cache, _generations
+        from app.services import cache_metrics
+        local_cache.clear()
+        _generations.clear()
+        cache_metrics._pending.clear()
+
     @patch("app.services.cache.get_redis_client")
     @patch("app.services.cache.get_query_embedding", return_value=[0.1] * 128)
     def test_cache_miss(self, mock_embed, mock_redis, ):
@@ -258,6 +1086,7 @@ class TestCacheService:
         from app.services.cache import get_cached_response
 
         mock_r = MagicMock()
+        mock_r.get.return_value = None
         mock_r.keys.return_value = []
         mock_redis.return_value = mock_r
 
@@ -274,17 +1103,66 @@ class TestCacheService:
             "embedding": [1.0] * 128,
             "response": "Cached answer",
             "sources": [],
-        })
+        }).encode()
 
         mock_r = MagicMock()
         mock_r.keys.return_value = ["cache:bot-123:abc"]
         mock_r.get.return_value = cached_data
         mock_redis.return_value = mock_r
 
-        result = get_cached_response("bot-123", "some question")
+        result = get_cached_response("bot-123", "some question", 0)
         assert result is not None
         assert result["response"] == "Cached answer"
 
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding")
+    def test_exact_hit_skips_embedding(self, mock_embed, mock_redis):
+        """Exact-match hit is served by a single GET without embedding the query."""
+        from app.services.cache import get_cached_response, cache_key
+
+        mock_r = MagicMock()
+        mock_r.get.return_value = json.dumps({
+            "embedding": [1.0] * 128,
+            "response": "Exact answer",
+            "sources": [],
+        }).encode()
+        mock_redis.return_value = mock_r
+
+        result = get_cached_response("bot-123", "  What IS   this? ", 0)
+        assert result["response"] == "Exact answer"
+        mock_r.get.assert_called_once_with(cache_key("bot-123", 0, "what is this?"))
+        mock_embed.assert_not_called()
+        mock_r.keys.assert_not_called()
+
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding", return_value=[1.0] * 128)
+    def test_semantic_hit_after_exact_miss(self, mock_embed, mock_redis):
+        """Semantic search runs only when the exact-match tier misses."""
+        from app.services.cache import get_cached_response
+
+        cached_data = json.dumps({
+            "embedding": [1.0] * 128,
+            "response": "Similar answer",
+            "sources": [],
+        }).encode()
+
+        mock_r = MagicMock()
+        mock_r.get.side_effect = [None, cached_data]
+        mock_r.keys.return_value = ["cache:bot-123:abc"]
+        mock_redis.return_value = mock_r
+
+        result = get_cached_response("bot-123", "a reworded question", 0)
+        assert result["response"] == "Similar answer"
+        mock_embed.assert_called_once()
+
+    def test_cache_key_normalization(self):
+        """Case and whitespace differences map to the same cache key."""
+        from app.services.cache import cache_key
+
+        assert cache_key("bot-123", 0, "Hello   World") == cache_key("bot-123", 0, "hello world\n")
+        assert cache_key("bot-123", 0, "hello") != cache_key("bot-456", 0, "hello")
+        assert cache_key("bot-123", 0, "hello") != cache_key("bot-123", 1, "hello")
+
     @patch("app.services.cache.get_redis_client")
     @patch("app.services.cache.get_query_embedding", return_value=[0.1] * 128)
     def test_cache_store(self, mock_embed, mock_redis):
@@ -299,15 +1177,254 @@ class TestCacheService:
 
     @patch("app.services.cache.get_redis_client")
     def test_clear_cache(self, mock_redis):
-        """Clearing cache deletes all keys for a chatbot."""
-        from app.services.cache import clear_chatbot_cache
+        """Clearing cache bumps the generation instead of scanning and deleting keys."""
+        from app.services.cache import clear_chatbot_cache, get_cache_generation
 
         mock_r = MagicMock()
-        mock_r.keys.return_value = ["cache:bot-123:a", "cache:bot-123:b"]
+        mock_r.incr.return_value = 3
         mock_redis.return_value = mock_r
 
         clear_chatbot_cache("bot-123")
-        mock_r.delete.assert_called_once_with("cache:bot-123:a", "cache:bot-123:b")
+        mock_r.incr.assert_called_once_with("cache:bot-123:generation")
+        mock_r.keys.assert_not_called()
+        mock_r.delete.assert_not_called()
+        assert get_cache_generation("bot-123") == 3
+
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding", return_value=[0.1] * 128)
+    def test_cache_store_pinned_generation(self, mock_embed, mock_redis):
+        """A response from a request that started before a reindex is stored under its old generation."""
+        from app.services.cache import cache_response, cache_key
+
+        mock_r = MagicMock()
+        mock_r.get.return_value = b"5"
+        mock_redis.return_value = mock_r
+
+        cache_response("bot-123", "question", "stale answer", [], generation=4)
+        assert mock_r.setex.call_args[0][0] == cache_key("bot-123", 4, "question")
+
+    @patch("app.services.cache.get_redis_client")
+    def test_generation_lookup(self, mock_redis):
+        """Generation is read from Redis once, then served locally; None when Redis is down."""
+        from app.services.cache import get_cache_generation
+
+        mock_r = MagicMock()
+        mock_r.get.return_value = b"7"
+        mock_redis.return_value = mock_r
+
+        assert get_cache_generation("bot-123") == 7
+        assert get_cache_generation("bot-123") == 7
+        mock_r.get.assert_called_once_with("cache:bot-123:generation")
+
+        mock_redis.side_effect = Exception("Redis down")
+        assert get_cache_generation("bot-456") is None
+
+    @patch("app.services.cache.L1_MAX_GENERATIONS", 2)
+    @patch("app.services.cache.get_redis_client")
+    def test_generation_lookup_bounded(self, mock_redis):
+        """Only the most recently used generations are remembered; older ones are read again."""
+        from app.services.cache import _generations, get_cache_generation
+
+        mock_r = MagicMock()
+        mock_r.get.return_value = b"1"
+        mock_redis.return_value = mock_r
+
+        for chatbot_id in ("bot-a", "bot-b", "bot-a", "bot-c"):
+            get_cache_generation(chatbot_id)
+
+        assert list(_generations) == ["bot-a", "bot-c"]
+        assert mock_r.get.call_count == 3
+
+    def test_invalidation_message_updates_generation(self):
+        """Pub/sub messages from other workers move this worker to the new generation."""
+        from app.services.cache import (
+            _apply_invalidation, get_cache_generation, local_cache, cache_key,
+        )
+
+        local_cache.set(cache_key("bot-123", 2, "q"), {"response": "a", "sources": []})
+        _apply_invalidation(b"bot-123:3")
+
+        assert local_cache.get(cache_key("bot-123", 2, "q")) is None
+        assert get_cache_generation("bot-123") == 3
+
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding", return_value=[0.1] * 128)
+    def test_local_hit_skips_redis(self, mock_embed, mock_redis):
+        """A response cached by this worker is served without touching Redis."""
+        from app.services.cache import cache_response, get_cached_response
+
+        mock_r = MagicMock()
+        mock_r.get.return_value = None
+        mock_redis.return_value = mock_r
+        cache_response("bot-123", "question", "answer", [])
+        mock_redis.reset_mock()
+
+        result = get_cached_response("bot-123", "Question ")
+        assert result["response"] == "answer"
+        mock_redis.assert_not_called()
+
+    @patch("app.services.cache.get_redis_client")
+    def test_clear_cache_invalidates_workers(self, mock_redis):
+        """Clearing drops local entries and notifies other workers over pub/sub."""
+        from app.services.cache import (
+            clear_chatbot_cache, local_cache, cache_key, INVALIDATION_CHANNEL,
+        )
+
+        mock_r = MagicMock()
+        mock_r.incr.return_value = 1
+        mock_redis.return_value = mock_r
+        local_cache.set(cache_key("bot-123", 0, "q"), {"response": "a", "sources": []})
+        local_cache.set(cache_key("bot-456", 0, "q"), {"response": "b", "sources": []})
+
+        clear_chatbot_cache("bot-123")
+        assert local_cache.get(cache_key("bot-123", 0, "q")) is None
+        assert local_cache.get(cache_key("bot-456", 0, "q")) is not None
+        mock_r.publish.assert_called_once_with(INVALIDATION_CHANNEL, "bot-123:1")
+
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding", return_value=[0.0123456789 * (i % 7) for i in range(1536)])
+    def test_cache_store_binary(self, mock_embed, mock_redis):
+        """Stored entries use the compact binary format and decode back."""
+        from app.services.cache import (
+            cache_response, decode_embedding, decode_payload, CACHE_FORMAT_VERSION,
+        )
+
+        mock_r = MagicMock()
+        mock_redis.return_value = mock_r
+        sources = [{"text": "chunk", "score": 0.9, "filename": "doc.pdf"}]
+
+        cache_response("bot-123", "question", "answer", sources)
+        raw = mock_r.setex.call_args[0][2]
+
+        assert raw[0] == CACHE_FORMAT_VERSION
+        assert len(raw) * 3 < len(json.dumps(mock_embed.return_value))
+        assert decode_embedding(raw).shape == (1536,)
+        assert decode_payload(raw) == {"response": "answer", "sources": sources}
+
+    @patch("app.services.cache.get_query_embedding", return_value=[0.5] * 128)
+    def test_stats_count_entries_without_scanning(self, mock_embed):
+        """Entry and byte totals are kept per generation on store, and overwrites aren't double-counted."""
+        import fakeredis
+        from app.services.cache import cache_key, cache_response, get_cache_stats
+
+        r = fakeredis.FakeRedis()
+        with patch("app.services.cache.get_redis_client", return_value=r):
+            cache_response("bot-stats", "first", "a", [], generation=0)
+            cache_response("bot-stats", "second", "b", [], generation=0)
+            cache_response("bot-stats", "Second ", "bb", [], generation=0)
+            cache_response("bot-stats", "old generation", "c", [], generation=1)
+            r.set("cache:bot-stats:generation", 0)
+            r.scan_iter = MagicMock(side_effect=AssertionError("stats must not scan"))
+
+            stats = get_cache_stats(["bot-stats"])["bot-stats"]
+        assert stats["entries"] == 2
+        assert stats["bytes"] == r.strlen(cache_key("bot-stats", 0, "first")) + r.strlen(cache_key("bot-stats", 0, "second"))
+
+    def test_stats_read_generations_in_one_round_trip(self):
+        """Generations not known locally are fetched together with one MGET, not one GET per chatbot."""
+        import fakeredis
+        from app.services.cache import generation_size_key, get_cache_stats
+
+        r = fakeredis.FakeRedis()
+        r.set("cache:bot-a:generation", 2)
+        r.hset(generation_size_key("bot-a", 2), mapping={"entries": 3, "bytes": 30})
+        r.get = MagicMock(side_effect=AssertionError("one GET per chatbot"))
+        with patch("app.services.cache.get_redis_client", return_value=r):
+            stats = get_cache_stats(["bot-a", "bot-b"])
+        assert (stats["bot-a"]["entries"], stats["bot-a"]["bytes"]) == (3, 30)
+        assert stats["bot-b"]["entries"] == 0
+
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding", return_value=[1.0] * 128)
+    def test_semantic_hit_binary_entry(self, mock_embed, mock_redis):
+        """Semantic tier matches against binary entries."""
+        from app.services.cache import get_cached_response, encode_entry
+
+        mock_r = MagicMock()
+        mock_r.get.side_effect = [None, encode_entry("q", [1.0] * 128, "Binary answer", [])]
+        mock_r.keys.return_value = [b"cache:bot-123:abc"]
+        mock_redis.return_value = mock_r
+
+        result = get_cached_response("bot-123", "another question", 0)
+        assert result["response"] == "Binary answer"
+
+    def test_unknown_format_version_ignored(self):
+        """Entries written by a newer format version are treated as misses."""
+        from app.services.cache import encode_entry, decode_embedding, decode_payload
+
+        raw = bytearray(encode_entry("q", [1.0] * 8, "a", []))
+        raw[0] = 99
+        assert decode_embedding(bytes(raw)) is None
+        assert decode_payload(bytes(raw)) is None
+
+    @patch("app.services.cache.get_redis_client")
+    @patch("app.services.cache.get_query_embedding", return_value=[1.0] * 128)
+    def test_lookup_metrics(self, mock_embed, mock_redis):
+        """Lookups are counted per tier, with latency, similarity and token savings."""
+        from app.services.cache import get_cached_response, encode_entry
+        from app.services import cache_metrics
+
+        mock_r = MagicMock()
+        mock_r.get.side_effect = [None, encode_entry("q", [0.0] * 127 + [1.0], "a" * 400, [])]
+        mock_r.keys.return_value = [b"cache:bot-123:0:abc"]
+        mock_redis.return_value = mock_r
+        assert get_cached_response("bot-123", "question", 0) is None
+
+        mock_r.get.side_effect = None
+        mock_r.get.return_value = encode_entry("q", [1.0] * 128, "a" * 400, [])
+        assert get_cached_response("bot-123", "question", 0) is not None
+        assert get_cached_response("bot-123", "question", 0) is not None
+
+        stats = cache_metrics.summarize(cache_metrics._pending["bot-123"])
+        assert stats["lookups"] == 3
+        assert stats["misses"] == 1
+        assert stats["hits"] == {"local": 1, "exact": 1, "semantic": 0}
+        assert stats["tokens_saved"] == 200
+        assert sum(stats["latency_ms"]["buckets"].values()) == 3
+        assert stats["similarity"]["0.5"] == 1
+
+    def test_metrics_flush(self):
+        """Flushing pushes pending deltas to the chatbot's Redis hash and resets them."""
+        from app.services import cache_metrics
+
+        cache_metrics.record_store("bot-123", 2048)
+        mock_r = MagicMock()
+        pipe = mock_r.pipeline.return_value
+
+        cache_metrics.flush(mock_r)
+        pipe.hincrbyfloat.assert_any_call("cache:bot-123:stats", "bytes_stored", 2048)
+        pipe.execute.assert_called_once()
+        assert not cache_metrics._pending
+
+    def test_metric_buckets(self):
+        """Values land in the first bucket whose upper bound covers them."""
+        from app.services.cache_metrics import bucket_for, LATENCY_BUCKETS_MS
+
+        assert bucket_for(0.4, LATENCY_BUCKETS_MS) == "1"
+        assert bucket_for(30, LATENCY_BUCKETS_MS) == "50"
+        assert bucket_for(10_000, LATENCY_BUCKETS_MS) == "+Inf"
+
+    def test_local_cache_evicts_by_bytes(self):
+        """Least recently used entries are evicted once the byte budget is exceeded."""
+        from app.services.cache import LocalCache
+
+        lru = LocalCache(max_bytes=300, ttl=60)
+        for key in ("a", "b", "c"):
+            lru.set(key, {"response": "x" * 60, "sources": []})
+        lru.get("a")
+        lru.set("d", {"response": "x" * 60, "sources": []})
+
+        assert lru.get("b") is None
+        assert lru.get("a") is not None
+        assert lru.get("d") is not None
+
+    def test_local_cache_expires(self):
+        """Entries older than the TTL are not served."""
+        from app.services.cache import LocalCache
+
+        lru = LocalCache(max_bytes=1024, ttl=0)
+        lru.set("a", {"response": "x", "sources": []})
+        assert lru.get("a") is None
 
     @patch("app.services.cache.get_redis_client")
     def test_cache_failure_graceful(self, mock_redis):
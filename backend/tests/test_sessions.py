@@ -0,0 +1,170 @@
+"""
+Unit tests for chat sessions.
+Covers: CRUD, keyset pagination of sessions and messages,
+message counts, cursor validation, and tenant isolation.
+"""
+
+from datetime import datetime, timedelta
+
+from app.models import Chatbot, ChatSession, ChatMessage
+
+
+def _make_chatbot(db, user):
+    """Helper: a chatbot owned by user."""
+    bot = Chatbot(user_id=user.id, name="Bot")
+    db.add(bot)
+    db.commit()
+    return bot
+
+
+def _make_sessions(db, bot, user, count, messages_per_session=0):
+    """Helper: sessions with distinct updated_at, newest last, each with a few messages."""
+    started = datetime(2026, 1, 1)
+    sessions = []
+    for s in range(count):
+        session = ChatSession(
+            chatbot_id=bot.id, user_id=user.id, title=f"S{s}",
+            created_at=started, updated_at=started + timedelta(minutes=s),
+        )
+        for m in range(messages_per_session):
+            session.messages.append(ChatMessage(role="user", content=f"m{m}", created_at=started + timedelta(seconds=m)))
+        sessions.append(session)
+    db.add_all(sessions)
+    db.commit()
+    return sessions
+
+
+def _url(bot, suffix=""):
+    return f"/api/chatbots/{bot.id}/sessions{suffix}"
+
+
+# ──────────────────────────────────────────────
+#  List
+# ──────────────────────────────────────────────
+
+class TestSessionList:
+    """Tests for GET /api/chatbots/{id}/sessions."""
+
+    def test_list_pages_through_all_sessions(self, client, auth_headers, db, test_user):
+        """Following next_cursor visits every session exactly once, newest first; only page one is counted."""
+        bot = _make_chatbot(db, test_user)
+        _make_sessions(db, bot, test_user, 7)
+
+        titles, cursor = [], None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            data = client.get(_url(bot), params=params, headers=auth_headers).json()
+            assert data["total"] == (None if cursor else 7)
+            titles += [s["title"] for s in data["sessions"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert titles == [f"S{s}" for s in reversed(range(7))]
+
+    def test_ties_on_updated_at_are_not_skipped(self, client, auth_headers, db, test_user):
+        """Sessions sharing an updated_at are split across pages by id."""
+        bot = _make_chatbot(db, test_user)
+        sessions = _make_sessions(db, bot, test_user, 5)
+        for session in sessions:
+            session.updated_at = datetime(2026, 1, 1)
+        db.commit()
+
+        first = client.get(_url(bot), params={"limit": 2}, headers=auth_headers).json()
+        rest = client.get(_url(bot), params={"limit": 10, "cursor": first["next_cursor"]}, headers=auth_headers).json()
+        ids = [s["id"] for s in first["sessions"] + rest["sessions"]]
+        assert sorted(ids) == sorted(str(s.id) for s in sessions)
+        assert rest["next_cursor"] is None
+
+    def test_message_count(self, client, auth_headers, db, test_user):
+        """Each listed session reports its message count."""
+        bot = _make_chatbot(db, test_user)
+        _make_sessions(db, bot, test_user, 2, messages_per_session=3)
+        data = client.get(_url(bot), headers=auth_headers).json()
+        assert [s["message_count"] for s in data["sessions"]] == [3, 3]
+
+    def test_listed_from_primary(self, client, auth_headers, db, test_user):
+        """The listing never goes to a replica, which could still be missing a session created just before."""
+        from app.database import get_async_read_db
+        from app.main import app
+
+        async def lagging_replica():
+            raise AssertionError("list_sessions read from a replica")
+            yield
+
+        bot = _make_chatbot(db, test_user)
+        _make_sessions(db, bot, test_user, 1)
+        app.dependency_overrides[get_async_read_db] = lagging_replica
+        res = client.get(_url(bot), headers=auth_headers)
+        assert res.status_code == 200
+        assert res.json()["total"] == 1
+
+    def test_invalid_cursor(self, client, auth_headers, db, test_user):
+        """A malformed cursor is rejected with 400."""
+        bot = _make_chatbot(db, test_user)
+        res = client.get(_url(bot), params={"cursor": "not-a-cursor"}, headers=auth_headers)
+        assert res.status_code == 400
+
+    def test_other_users_chatbot(self, client, auth_headers_b, db, test_user):
+        """User B cannot list sessions of User A's chatbot."""
+        bot = _make_chatbot(db, test_user)
+        _make_sessions(db, bot, test_user, 1)
+        assert client.get(_url(bot), headers=auth_headers_b).status_code == 404
+
+
+# ──────────────────────────────────────────────
+#  Detail & Messages
+# ──────────────────────────────────────────────
+
+class TestSessionMessages:
+    """Tests for GET /api/chatbots/{id}/sessions/{sid} and /messages."""
+
+    def test_detail_returns_newest_page(self, client, auth_headers, db, test_user):
+        """Detail carries the full count and the newest messages in chronological order."""
+        bot = _make_chatbot(db, test_user)
+        session = _make_sessions(db, bot, test_user, 1, messages_per_session=5)[0]
+        data = client.get(_url(bot, f"/{session.id}"), params={"limit": 2}, headers=auth_headers).json()
+        assert data["message_count"] == 5
+        assert [m["content"] for m in data["messages"]] == ["m3", "m4"]
+        assert data["next_cursor"]
+
+    def test_messages_page_backwards(self, client, auth_headers, db, test_user):
+        """Following next_cursor on /messages walks back to the first message."""
+        bot = _make_chatbot(db, test_user)
+        session = _make_sessions(db, bot, test_user, 1, messages_per_session=5)[0]
+        detail = client.get(_url(bot, f"/{session.id}"), params={"limit": 2}, headers=auth_headers).json()
+
+        pages, cursor = [detail["messages"]], detail["next_cursor"]
+        while cursor:
+            data = client.get(
+                _url(bot, f"/{session.id}/messages"), params={"limit": 2, "cursor": cursor}, headers=auth_headers,
+            ).json()
+            pages.insert(0, data["messages"])
+            cursor = data["next_cursor"]
+        assert [m["content"] for page in pages for m in page] == [f"m{m}" for m in range(5)]
+
+    def test_messages_other_user(self, client, auth_headers_b, db, test_user):
+        """User B cannot read User A's messages."""
+        bot = _make_chatbot(db, test_user)
+        session = _make_sessions(db, bot, test_user, 1, messages_per_session=1)[0]
+        res = client.get(_url(bot, f"/{session.id}/messages"), headers=auth_headers_b)
+        assert res.status_code == 404
+
+
+# ──────────────────────────────────────────────
+#  Create / Update / Delete
+# ──────────────────────────────────────────────
+
+class TestSessionCrud:
+    """Tests for session create, rename and delete."""
+
+    def test_create_rename_delete(self, client, auth_headers, db, test_user):
+        """A session can be created, renamed and deleted."""
+        bot = _make_chatbot(db, test_user)
+        created = client.post(_url(bot), headers=auth_headers).json()
+        assert created["message_count"] == 0
+
+        renamed = client.patch(_url(bot, f"/{created['id']}"), json={"title": "Renamed"}, headers=auth_headers)
+        assert renamed.json()["title"] == "Renamed"
+
+        assert client.delete(_url(bot, f"/{created['id']}"), headers=auth_headers).status_code == 200
+        assert client.get(_url(bot, f"/{created['id']}"), headers=auth_headers).status_code == 404
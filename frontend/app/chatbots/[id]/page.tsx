@@ -8,11 +8,12 @@ import {
     Bot, User, Loader2, Plus, MessageSquare, Trash2, PanelLeftClose, PanelLeft,
 } from "lucide-react";
 import {
-    getChatbot, getSessions, getSessionDetail, deleteSession,
-    ChatbotDetail, ChatSession,
+    getChatbot, getSessions, getSessionDetail, getSessionMessages, deleteSession,
+    ChatbotDetail, ChatSession, ChatMessageData,
 } from "@/lib/api";
 import { getSession } from "next-auth/react";
 import ExportPanel from "@/components/ui/ExportPanel";
+import IndexingProgress from "@/components/chatbot/IndexingProgress";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -32,6 +33,15 @@ interface Message {
     loading?: boolean;
 }
 
+function toMessage(m: ChatMessageData): Message {
+    return {
+        id: m.id,
+        role: m.role as "user" | "assistant",
+        content: m.content,
+        sources: m.sources ? JSON.parse(m.sources) : undefined,
+    };
+}
+
 export default function ChatbotPage() {
     const router = useRouter();
     const params = useParams();
@@ -51,6 +61,13 @@ export default function ChatbotPage() {
     const [sidebarOpen, setSidebarOpen] = useState(true);
     const [loadingSessions, setLoadingSessions] = useState(true);
 
+    // Sessions and messages are paged; the cursors point at the next older page
+    const [sessionsCursor, setSessionsCursor] = useState<string | null>(null);
+    const [loadingMoreSessions, setLoadingMoreSessions] = useState(false);
+    const [messagesCursor, setMessagesCursor] = useState<string | null>(null);
+    const [loadingOlderMessages, setLoadingOlderMessages] = useState(false);
+    const keepScrollRef = useRef(false);
+
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const inputRef = useRef<HTMLTextAreaElement>(null);
 
@@ -87,6 +104,7 @@ export default function ChatbotPage() {
                 ]);
                 setChatbot(botData);
                 setSessions(sessData.sessions);
+                setSessionsCursor(sessData.next_cursor);
             } catch {
                 router.push("/chatbots");
             } finally {
@@ -102,27 +120,56 @@ export default function ChatbotPage() {
         async function loadMessages() {
             try {
                 const detail = await getSessionDetail(chatbotId, activeSessionId!);
-                const loaded: Message[] = detail.messages.map((m) => ({
-                    id: m.id,
-                    role: m.role as "user" | "assistant",
-                    content: m.content,
-                    sources: m.sources ? JSON.parse(m.sources) : undefined,
-                }));
-                setMessages(loaded);
+                setMessages(detail.messages.map(toMessage));
+                setMessagesCursor(detail.next_cursor);
             } catch {
                 setMessages([]);
+                setMessagesCursor(null);
             }
         }
         loadMessages();
     }, [activeSessionId, chatbotId]);
 
     useEffect(() => {
+        // Older messages are prepended above the reader, so don't jump to the bottom for them
+        if (keepScrollRef.current) {
+            keepScrollRef.current = false;
+            return;
+        }
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
     }, [messages]);
 
+    const handleLoadMoreSessions = async () => {
+        if (!sessionsCursor || loadingMoreSessions) return;
+        setLoadingMoreSessions(true);
+        try {
+            const page = await getSessions(chatbotId, sessionsCursor);
+            setSessions((prev) => [...prev, ...page.sessions.filter((s) => !prev.some((p) => p.id === s.id))]);
+            setSessionsCursor(page.next_cursor);
+        } catch { /* keep the cursor so the user can retry */ }
+        finally {
+            setLoadingMoreSessions(false);
+        }
+    };
+
+    const handleLoadOlderMessages = async () => {
+        if (!activeSessionId || !messagesCursor || loadingOlderMessages) return;
+        setLoadingOlderMessages(true);
+        try {
+            const page = await getSessionMessages(chatbotId, activeSessionId, messagesCursor);
+            keepScrollRef.current = true;
+            setMessages((prev) => [...page.messages.map(toMessage), ...prev]);
+            setMessagesCursor(page.next_cursor);
+        } catch { /* keep the cursor so the user can retry */ }
+        finally {
+            setLoadingOlderMessages(false);
+        }
+    };
+
     const handleNewChat = () => {
         setActiveSessionId(null);
         setMessages([]);
+        setMessagesCursor(null);
         inputRef.current?.focus();
     };
 
@@ -313,6 +360,17 @@ export default function ChatbotPage() {
                                     </div>
                                 ))
                             )}
+                            {sessionsCursor && (
+                                <button
+                                    onClick={handleLoadMoreSessions}
+                                    disabled={loadingMoreSessions}
+                                    className="flex items-center justify-center gap-1.5 w-full py-2 text-[11px] cursor-pointer transition-all hover:brightness-125"
+                                    style={{ color: "#D3DAD9", opacity: 0.5 }}
+                                >
+                                    {loadingMoreSessions && <Loader2 className="w-3 h-3 animate-spin" />}
+                                    Load older chats
+                                </button>
+                            )}
                         </div>
                     </div>
                 )}
@@ -368,6 +426,8 @@ export default function ChatbotPage() {
                         </div>
                     </div>
 
+                    <IndexingProgress chatbotId={chatbotId} primary={primary} secondary={secondary} />
+
                     {/* Messages Area */}
                     <div className="flex-1 overflow-y-auto px-6 py-6">
                         <div className="max-w-3xl mx-auto space-y-6">
@@ -385,6 +445,20 @@ export default function ChatbotPage() {
                                 </div>
                             )}
 
+                            {messagesCursor && (
+                                <div className="flex justify-center">
+                                    <button
+                                        onClick={handleLoadOlderMessages}
+                                        disabled={loadingOlderMessages}
+                                        className="flex items-center gap-1.5 px-3 py-1.5 rounded-lg text-[11px] cursor-pointer transition-all hover:brightness-110"
+                                        style={{ backgroundColor: secondary, color: "#D3DAD9", opacity: 0.6 }}
+                                    >
+                                        {loadingOlderMessages && <Loader2 className="w-3 h-3 animate-spin" />}
+                                        Load earlier messages
+                                    </button>
+                                </div>
+                            )}
+
                             {/* Messages */}
                             {messages.map((msg) => (
                                 <div key={msg.id} className={`flex gap-3 ${msg.role === "user" ? "justify-end" : "justify-start"}`}>
@@ -6,7 +6,7 @@ import DashboardLayout from "@/components/layout/DashboardLayout";
 import ProviderIcon from "@/components/ui/ProviderIcon";
 import {
   Bot, FileText, MessageSquare, HardDrive, Plus, ArrowRight,
-  Globe, Upload, Loader2, MessagesSquare,
+  Globe, Upload, Loader2, MessagesSquare, Zap,
 } from "lucide-react";
 import { getSession } from "next-auth/react";
 
@@ -42,6 +42,12 @@ interface DashboardData {
     is_public: string;
     accent_primary: string;
   }[];
+  cache: {
+    lookups: number;
+    hits: number;
+    hit_rate: number;
+    tokens_saved: number;
+  };
 }
 
 function formatBytes(bytes: number): string {
@@ -156,7 +162,7 @@ export default function DashboardPage() {
           </div>
 
           {/* Sub stats */}
-          <div className="grid grid-cols-2 gap-4 mb-8">
+          <div className="grid grid-cols-3 gap-4 mb-8">
             <div
               className="rounded-xl px-5 py-4 flex items-center justify-between"
               style={{ backgroundColor: "#2D2B33", border: "1px solid #715A5A30" }}
@@ -177,6 +183,17 @@ export default function DashboardPage() {
               </div>
               <span className="text-sm font-bold" style={{ color: "#D3DAD9" }}>{formatBytes(d.storage_bytes)}</span>
             </div>
+            <div
+              className="rounded-xl px-5 py-4 flex items-center justify-between"
+              style={{ backgroundColor: "#2D2B33", border: "1px solid #715A5A30" }}
+              title={`${d.cache.hits} of ${d.cache.lookups} answers served from cache · ~${d.cache.tokens_saved.toLocaleString()} tokens saved`}
+            >
+              <div className="flex items-center gap-3">
+                <Zap className="w-4 h-4" style={{ color: "#eab308" }} />
+                <span className="text-sm" style={{ color: "#D3DAD9" }}>Cache Hit Rate</span>
+              </div>
+              <span className="text-sm font-bold" style={{ color: "#D3DAD9" }}>{Math.round(d.cache.hit_rate * 100)}%</span>
+            </div>
           </div>
 
           <div className="grid grid-cols-1 lg:grid-cols-5 gap-6">
@@ -0,0 +1,69 @@
+"use client";
+
+import { useEffect, useState } from "react";
+import { AlertCircle, Loader2 } from "lucide-react";
+import { streamIndexingProgress, IndexingJob } from "@/lib/api";
+
+interface IndexingProgressProps {
+  chatbotId: string;
+  primary: string;
+  secondary: string;
+}
+
+// Live banner for the chatbot's indexing job, fed by the server-sent progress stream.
+// Hidden when there is no job or the latest one completed; a stalled job is shown like a failed one.
+export default function IndexingProgress({ chatbotId, primary, secondary }: IndexingProgressProps) {
+  const [job, setJob] = useState<IndexingJob | null>(null);
+
+  useEffect(() => {
+    const controller = new AbortController();
+    streamIndexingProgress(chatbotId, setJob, controller.signal).catch(() => {
+      /* aborted on unmount, or the stream dropped; the banner keeps its last state */
+    });
+    return () => controller.abort();
+  }, [chatbotId]);
+
+  if (!job || job.status === "completed") return null;
+
+  if (job.status === "failed" || job.stalled) {
+    return (
+      <div
+        className="flex items-center gap-2 px-6 py-2 text-xs flex-shrink-0"
+        style={{ backgroundColor: "#ef444415", borderBottom: "1px solid #ef444430", color: "#ef4444" }}
+      >
+        <AlertCircle className="w-3.5 h-3.5 flex-shrink-0" />
+        <span className="truncate">
+          {job.stalled
+            ? "Indexing stopped responding and can be resumed"
+            : `Indexing failed${job.error_message ? `: ${job.error_message}` : ""}`}. Answers may miss some documents.
+        </span>
+      </div>
+    );
+  }
+
+  // Chunk counts are only known once documents are parsed, so documents drive the bar until then
+  const fraction = job.chunks_total > 0
+    ? job.chunks_upserted / job.chunks_total
+    : job.documents_total > 0 ? job.documents_done / job.documents_total : 0;
+
+  return (
+    <div className="px-6 py-2 flex-shrink-0" style={{ backgroundColor: secondary, borderBottom: `1px solid ${primary}20` }}>
+      <div className="flex items-center gap-2 text-xs" style={{ color: "#D3DAD9" }}>
+        <Loader2 className="w-3.5 h-3.5 animate-spin flex-shrink-0" style={{ color: primary }} />
+        <span style={{ opacity: 0.7 }}>
+          {job.status === "queued" ? "Waiting to index documents" : "Indexing documents"}
+        </span>
+        <span className="ml-auto" style={{ opacity: 0.4 }}>
+          {job.documents_done}/{job.documents_total} documents
+          {job.chunks_total > 0 && ` · ${job.chunks_upserted}/${job.chunks_total} chunks`}
+        </span>
+      </div>
+      <div className="mt-1.5 h-1 rounded-full overflow-hidden" style={{ backgroundColor: primary + "20" }}>
+        <div
+          className="h-full rounded-full transition-all"
+          style={{ width: `${Math.round(fraction * 100)}%`, backgroundColor: primary }}
+        />
+      </div>
+    </div>
+  );
+}
@@ -75,11 +75,56 @@ export interface ChatMessageData {
 
 export interface ChatSessionDetail extends ChatSession {
   messages: ChatMessageData[];
+  next_cursor: string | null;
 }
 
 export interface ChatSessionListResponse {
   sessions: ChatSession[];
-  total: number;
+  total: number | null; // only counted on the first page
+  next_cursor: string | null;
+}
+
+export interface ChatMessageListResponse {
+  messages: ChatMessageData[];
+  next_cursor: string | null;
+}
+
+export interface IndexingDocumentProgress {
+  document_id: string;
+  status: "pending" | "processing" | "ready" | "failed";
+  pages_parsed: number;
+  chunks_total: number;
+  chunks_embedded: number;
+  chunks_upserted: number;
+  bytes_total: number;
+  bytes_processed: number;
+  stage_timings: Record<string, number>;
+  error_message: string | null;
+}
+
+export interface IndexingJob {
+  id: string;
+  chatbot_id: string;
+  status: "queued" | "running" | "completed" | "failed";
+  documents_total: number;
+  documents_done: number;
+  documents_failed: number;
+  pages_parsed: number;
+  chunks_total: number;
+  chunks_embedded: number;
+  chunks_upserted: number;
+  bytes_total: number;
+  bytes_processed: number;
+  stage_timings: Record<string, number>;
+  error_message: string | null;
+  attempts: number;
+  created_at: string;
+  started_at: string | null;
+  updated_at: string | null;
+  completed_at: string | null;
+  documents: IndexingDocumentProgress[];
+  // Set client-side when the progress stream ends with a "stalled" event
+  stalled?: boolean;
 }
 
 // Auth helper
@@ -209,10 +254,65 @@ export async function deleteChatbot(id: string): Promise<void> {
   }
 }
 
+// Indexing progress APIs
+// Follow the latest indexing job over server-sent events until it finishes or signal aborts.
+// EventSource can't send the auth header, so the stream is read with fetch.
+// Progress events carry job totals and only the documents that changed; they are merged into the snapshot.
+export async function streamIndexingProgress(
+  chatbotId: string,
+  onUpdate: (job: IndexingJob) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  const headers = await getAuthHeaders();
+  const res = await fetch(`${API_URL}/api/chatbots/${chatbotId}/indexing/events`, { headers, signal });
+
+  if (res.status === 404) return;
+  if (!res.ok || !res.body) {
+    throw new Error("Failed to follow indexing progress");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let job: IndexingJob | null = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      const data = block.split("\n").find((line) => line.startsWith("data: "))?.slice(6);
+      if (!data) continue; // keepalive comment
+
+      const update: IndexingJob = JSON.parse(data);
+      if (block.startsWith("event: stalled")) {
+        // The worker stopped reporting; the stream ends here with the job as last saved
+        job = { ...update, stalled: true };
+      } else if (job === null || block.startsWith("event: snapshot")) {
+        job = update;
+      } else {
+        const changed = new Map(update.documents.map((d) => [d.document_id, d]));
+        const documents = job.documents.map((d) => changed.get(d.document_id) ?? d);
+        for (const d of update.documents) {
+          if (!job.documents.some((existing) => existing.document_id === d.document_id)) documents.push(d);
+        }
+        job = { ...job, ...update, documents };
+      }
+      onUpdate(job);
+    }
+  }
+}
+
 // Session APIs
-export async function getSessions(chatbotId: string): Promise<ChatSessionListResponse> {
+export async function getSessions(chatbotId: string, cursor?: string): Promise<ChatSessionListResponse> {
   const headers = await getAuthHeaders();
-  const res = await fetch(`${API_URL}/api/chatbots/${chatbotId}/sessions`, { headers });
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+  const res = await fetch(`${API_URL}/api/chatbots/${chatbotId}/sessions${query}`, { headers });
 
   if (!res.ok) {
     throw new Error("Failed to fetch sessions");
@@ -232,6 +332,24 @@ export async function getSessionDetail(chatbotId: string, sessionId: string): Pr
   return res.json();
 }
 
+export async function getSessionMessages(
+  chatbotId: string,
+  sessionId: string,
+  cursor: string
+): Promise<ChatMessageListResponse> {
+  const headers = await getAuthHeaders();
+  const res = await fetch(
+    `${API_URL}/api/chatbots/${chatbotId}/sessions/${sessionId}/messages?cursor=${encodeURIComponent(cursor)}`,
+    { headers }
+  );
+
+  if (!res.ok) {
+    throw new Error("Failed to fetch messages");
+  }
+
+  return res.json();
+}
+
 export async function updateSession(chatbotId: string, sessionId: string, title: string): Promise<ChatSession> {
   const headers = await getAuthHeaders();
   const res = await fetch(`${API_URL}/api/chatbots/${chatbotId}/sessions/${sessionId}`, {